@@ -1,9 +1,19 @@
-from typing import List, Dict
+import queue
+import threading
+from contextlib import ExitStack
+from typing import Any, Callable, Iterator, List, Dict, Literal, Optional
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+import jiter
 from pydantic import BaseModel, Field
 from openai import OpenAI
 import os
 import logging
 from dotenv import load_dotenv
+from artifact_store import ArtifactStore
+from llm_cache import cached_parse, llm_cache, token_usage
+from token_budget import TokenLedger, estimate_prompt_tokens, estimate_tokens
+from scheduler import BATCH, in_lane, priority, scheduler
+from tracing import in_context, record_usage, span
 
 load_dotenv()
 
@@ -16,10 +26,14 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+# Retries are left to the shared scheduler
 client = OpenAI(base_url="https://openrouter.ai/api/v1",
-                api_key=os.environ.get("OPENAI_API_KEY"),)
+                api_key=os.environ.get("OPENAI_API_KEY"), max_retries=0)
 model = "gpt-4o"
 
+# Above this many estimated review tokens (prompt + echoed post) the review is done per section
+REVIEW_TOKEN_BUDGET = 16000
+
 # --------------------------------------------------------------
 # Step 1: Define the data models
 # --------------------------------------------------------------
@@ -32,6 +46,9 @@ class SubTask(BaseModel):
     description: str = Field(description="What this section should cover")
     style_guide: str = Field(description="Writing style for this section")
     target_length: int = Field(description="Target word count for this section")
+    depends_on: List[str] = Field(
+        description="section_type of earlier sections this section must build on; empty if it can be written independently"
+    )
 
 
 class OrchestratorPlan(BaseModel):
@@ -66,6 +83,32 @@ class ReviewFeedback(BaseModel):
     final_version: str = Field(description="Complete, polished blog post")
 
 
+class SectionReview(BaseModel):
+    """Per-section review used when the whole post does not fit the review budget"""
+
+    suggested_edit: str = Field(description="Suggested edit for this section")
+    polished_content: str = Field(description="Polished version of this section")
+
+
+class CohesionReview(BaseModel):
+    """Cohesion score of the post, judged from its outline"""
+
+    cohesion_score: float = Field(description="How well sections flow together (0-1)")
+
+
+class StreamEvent(BaseModel):
+    """Incremental output of BlogOrchestrator.write_blog_stream"""
+
+    kind: Literal["section_delta", "section_done", "review_delta", "review_done"]
+    section: Optional[str] = Field(default=None, description="Section the event belongs to")
+    text: str = Field(default="", description="Newly generated text")
+    result: Optional[Any] = Field(default=None, description="Parsed SectionContent or ReviewFeedback on *_done events")
+
+
+class StreamStopped(Exception):
+    """The consumer of write_blog_stream stopped iterating before the sections were written"""
+
+
 # --------------------------------------------------------------
 # Step 2: Define prompts
 # --------------------------------------------------------------
@@ -102,6 +145,9 @@ Section Type: {section_type}
 Section Goal: {description}
 Style Guide: {style_guide}
 
+Sections this one builds on:
+{previous_sections}
+
 Return your response in this format:
 
 # Content
@@ -129,18 +175,100 @@ For suggested edits, focus on improving transitions and maintaining consistent t
 The final version should incorporate your suggested improvements into a polished, cohesive blog post.
 """
 
+SECTION_REVIEWER_PROMPT = """
+Review one section of a blog post for cohesion and flow:
+
+Topic: {topic}
+Target Audience: {audience}
+
+Outline of the full post:
+{outline}
+
+Section to review:
+=== {section_type} ===
+{content}
+
+Suggest an edit that improves the transitions into and out of this section and keeps the tone consistent with the outline, then return the polished section incorporating it.
+"""
+
+COHESION_PROMPT = """
+Judge how well this blog post's sections flow together from its outline:
+
+Topic: {topic}
+Target Audience: {audience}
+
+Outline:
+{outline}
+
+Return a cohesion score between 0.0 and 1.0, with 1.0 being perfect cohesion.
+"""
+
 # --------------------------------------------------------------
 # Step 3: Implement orchestrator
 # --------------------------------------------------------------
 
 
 class BlogOrchestrator:
-    def __init__(self):
+    def __init__(
+        self,
+        max_in_flight: int = 4,
+        dependency_aware: bool = False,
+        review_token_budget: int = REVIEW_TOKEN_BUDGET,
+        artifacts: Optional[ArtifactStore] = None,
+    ):
+        """
+        Args:
+            max_in_flight: How many sections may be written concurrently
+            dependency_aware: Hold a section back until the sections in its
+                `depends_on` are written, and give it their content as context
+            review_token_budget: Estimated review tokens above which the post
+                is reviewed section by section
+            artifacts: Store of earlier plans, sections and reviews; write_blog
+                reuses every artifact whose inputs are unchanged
+        """
         self.sections_content = {}
+        self.max_in_flight = max_in_flight
+        self.dependency_aware = dependency_aware
+        self.review_token_budget = review_token_budget
+        self.ledger = TokenLedger(model)
+        self.artifacts = artifacts if artifacts is not None else ArtifactStore()
+        self.artifact_hits = 0
+        self.artifact_misses = 0
+        self._artifact_lock = threading.Lock()
+
+    def reuse(self, kind: str, inputs: Dict, response_format, compute: Callable, **attributes):
+        """Return the stored artifact for `inputs`, computing and storing it on a miss
+
+        The lookup and any computation are traced as a `blog.<kind>` span carrying `attributes`.
+        """
+        with span(f"blog.{kind}", **attributes) as current:
+            key = self.artifacts.make_key(kind, {**inputs, "model": model})
+            artifact = self.artifacts.get(key, response_format)
+            current.set(artifact_hit=artifact is not None)
+            with self._artifact_lock:
+                if artifact is not None:
+                    self.artifact_hits += 1
+                else:
+                    self.artifact_misses += 1
+            if artifact is not None:
+                logger.info(f"Reusing stored {kind}")
+                return artifact
+            artifact = compute()
+            self.artifacts.put(key, kind, artifact)
+            return artifact
+
+    def artifact_stats(self) -> Dict:
+        total = self.artifact_hits + self.artifact_misses
+        return {
+            "hits": self.artifact_hits,
+            "misses": self.artifact_misses,
+            "hit_ratio": self.artifact_hits / total if total else 0.0,
+        }
 
     def get_plan(self, topic: str, target_length: int, style: str) -> OrchestratorPlan:
         """Get orchestrator's blog structure plan"""
-        completion = client.beta.chat.completions.parse(
+        return cached_parse(
+            client,
             model=model,
             messages=[
                 {
@@ -151,95 +279,388 @@ class BlogOrchestrator:
                 }
             ],
             response_format=OrchestratorPlan,
+            on_usage=self.ledger.recorder("plan"),
         )
-        return completion.choices[0].message.parsed
 
-    def write_section(self, topic: str, section: SubTask) -> SectionContent:
-        """Worker: Write a specific blog section with context from previous sections.
+    def section_messages(
+        self, topic: str, section: SubTask, context: Optional[Dict[str, SectionContent]] = None
+    ) -> List[Dict]:
+        """Worker prompt for one section"""
+        # Create context from the sections this one depends on
+        previous_sections = "\n\n".join(
+            [
+                f"=== {section_type} ===\n{content.content}"
+                for section_type, content in (context or {}).items()
+            ]
+        )
+        return [
+            {
+                "role": "system",
+                "content": WORKER_PROMPT.format(
+                    topic=topic,
+                    section_type=section.section_type,
+                    description=section.description,
+                    style_guide=section.style_guide,
+                    target_length=section.target_length,
+                    previous_sections=previous_sections
+                    if previous_sections
+                    else "None, this section stands on its own.",
+                ),
+            }
+        ]
+
+    def write_section(
+        self, topic: str, section: SubTask, context: Optional[Dict[str, SectionContent]] = None
+    ) -> SectionContent:
+        """Worker: Write a specific blog section with context from the sections it builds on.
 
         Args:
             topic: The main blog topic
             section: SubTask containing section details
+            context: Already written sections this one depends on
 
         Returns:
             SectionContent: The written content and key points
         """
-        # Create context from previously written sections
-        previous_sections = "\n\n".join(
-            [
-                f"=== {section_type} ===\n{content.content}"
-                for section_type, content in self.sections_content.items()
-            ]
-        )
-
-        completion = client.beta.chat.completions.parse(
+        return cached_parse(
+            client,
             model=model,
-            messages=[
-                {
-                    "role": "system",
-                    "content": WORKER_PROMPT.format(
-                        topic=topic,
-                        section_type=section.section_type,
-                        description=section.description,
-                        style_guide=section.style_guide,
-                        target_length=section.target_length,
-                        previous_sections=previous_sections
-                        if previous_sections
-                        else "This is the first section.",
-                    ),
-                }
-            ],
+            messages=self.section_messages(topic, section, context),
             response_format=SectionContent,
+            on_usage=self.ledger.recorder("sections"),
         )
-        return completion.choices[0].message.parsed
 
-    def review_post(self, topic: str, plan: OrchestratorPlan) -> ReviewFeedback:
-        """Reviewer: Analyze and improve overall cohesion"""
+    def write_section_incremental(
+        self, topic: str, section: SubTask, context: Optional[Dict[str, SectionContent]] = None
+    ) -> SectionContent:
+        """write_section, reusing the stored section unless its task, prompt or context changed"""
+        inputs = {
+            "topic": topic,
+            "section": section.model_dump(),
+            "template": WORKER_PROMPT,
+            # A rewritten dependency dirties every section built on it
+            "context": {name: content.model_dump() for name, content in (context or {}).items()},
+        }
+        return self.reuse(
+            "section", inputs, SectionContent, lambda: self.write_section(topic, section, context),
+            section=section.section_type,
+        )
+
+    def write_sections(
+        self, topic: str, plan: OrchestratorPlan, writer: Optional[Callable] = None
+    ) -> Dict[str, SectionContent]:
+        """Write the plan's sections concurrently, at most `max_in_flight` at a time.
+
+        Results are reassembled in plan order. With `dependency_aware`, a section is
+        only submitted once the earlier sections it depends on are written.
+        `writer` replaces write_section, e.g. to stream the sections.
+        """
+        writer = writer or self.write_section
+        order = [section.section_type for section in plan.sections]
+        written = {}
+
+        def dependencies(index: int, section: SubTask) -> List[str]:
+            if not self.dependency_aware:
+                return []
+            # Only earlier sections count, so a bad plan cannot deadlock on a cycle
+            return [name for name in section.depends_on if name in order[:index]]
+
+        pending = list(enumerate(plan.sections))
+        with ThreadPoolExecutor(max_workers=self.max_in_flight) as executor:
+            running = {}
+            while pending or running:
+                for item in list(pending):
+                    index, section = item
+                    needed = dependencies(index, section)
+                    if all(name in written for name in needed):
+                        pending.remove(item)
+                        logger.info(f"Writing section: {section.section_type}")
+                        context = {name: written[name] for name in needed}
+                        # in_context keeps the section's spans under the caller's
+                        running[executor.submit(in_context(writer), topic, section, context)] = section
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    section = running.pop(future)
+                    written[section.section_type] = future.result()
+
+        return {section_type: written[section_type] for section_type in order}
+
+    def review_messages(self, topic: str, plan: OrchestratorPlan) -> List[Dict]:
+        """Reviewer prompt over every written section"""
         sections_text = "\n\n".join(
             [
                 f"=== {section_type} ===\n{content.content}"
                 for section_type, content in self.sections_content.items()
             ]
         )
+        return [
+            {
+                "role": "system",
+                "content": REVIEWER_PROMPT.format(
+                    topic=topic,
+                    audience=plan.target_audience,
+                    sections=sections_text,
+                ),
+            }
+        ]
+
+    def review_fits_budget(self, topic: str, plan: OrchestratorPlan) -> bool:
+        """Whether a single-call review (prompt plus the echoed final_version) fits the budget"""
+        prompt_tokens = estimate_prompt_tokens(self.review_messages(topic, plan), model)
+        # The reviewer echoes the whole post back as final_version
+        output_tokens = sum(estimate_tokens(content.content, model) for content in self.sections_content.values())
+        estimate = prompt_tokens + output_tokens
+        logger.info(f"Estimated review size: {estimate} tokens (budget {self.review_token_budget})")
+        return estimate <= self.review_token_budget
 
-        completion = client.beta.chat.completions.parse(
+    def review_post(self, topic: str, plan: OrchestratorPlan) -> ReviewFeedback:
+        """Reviewer: Analyze and improve overall cohesion"""
+        if not self.review_fits_budget(topic, plan):
+            return self.review_by_section(topic, plan)
+        return cached_parse(
+            client,
+            model=model,
+            messages=self.review_messages(topic, plan),
+            response_format=ReviewFeedback,
+            on_usage=self.ledger.recorder("review"),
+        )
+
+    def outline(self) -> str:
+        """Compact view of the post: section names and their key points"""
+        return "\n".join(
+            f"- {section_type}: {'; '.join(content.key_points)}"
+            for section_type, content in self.sections_content.items()
+        )
+
+    def review_by_section(self, topic: str, plan: OrchestratorPlan) -> ReviewFeedback:
+        """Hierarchical review: polish each section against the outline, score cohesion from the outline.
+
+        Each call only carries one section plus the outline, so prompt and output
+        size no longer grow with the length of the whole post.
+        """
+        logger.info("Review exceeds the token budget, reviewing section by section")
+        outline = self.outline()
+
+        def review_section(item) -> SectionReview:
+            section_type, content = item
+            return cached_parse(
+                client,
+                model=model,
+                messages=[
+                    {
+                        "role": "system",
+                        "content": SECTION_REVIEWER_PROMPT.format(
+                            topic=topic,
+                            audience=plan.target_audience,
+                            outline=outline,
+                            section_type=section_type,
+                            content=content.content,
+                        ),
+                    }
+                ],
+                response_format=SectionReview,
+                on_usage=self.ledger.recorder("review"),
+            )
+
+        with ThreadPoolExecutor(max_workers=self.max_in_flight) as executor:
+            reviews = list(executor.map(in_context(review_section), self.sections_content.items()))
+
+        cohesion = cached_parse(
+            client,
             model=model,
             messages=[
                 {
                     "role": "system",
-                    "content": REVIEWER_PROMPT.format(
-                        topic=topic,
-                        audience=plan.target_audience,
-                        sections=sections_text,
-                    ),
+                    "content": COHESION_PROMPT.format(topic=topic, audience=plan.target_audience, outline=outline),
                 }
             ],
-            response_format=ReviewFeedback,
+            response_format=CohesionReview,
+            on_usage=self.ledger.recorder("review"),
         )
-        return completion.choices[0].message.parsed
+
+        return ReviewFeedback(
+            cohesion_score=cohesion.cohesion_score,
+            suggested_edits=[
+                SuggestedEdits(section_name=section_type, suggested_edit=review.suggested_edit)
+                for section_type, review in zip(self.sections_content, reviews)
+            ],
+            final_version="\n\n".join(review.polished_content for review in reviews),
+        )
+
+    def stream_parse(self, messages: List[Dict], response_format, field: str, stage: str) -> Iterator[tuple]:
+        """Stream a structured-output call.
+
+        Yields ("delta", text) as the string `field` grows, then ("done", parsed)
+        once the whole response has been parsed. Cached responses are replayed as a
+        single delta.
+        """
+        key = llm_cache.make_key(model, messages, response_format)
+        cached = llm_cache.get(key, response_format)
+        if cached is not None:
+            yield "delta", getattr(cached, field)
+            yield "done", cached
+            return
+
+        def open_stream():
+            manager = client.beta.chat.completions.stream(model=model, messages=messages, response_format=response_format)
+            return manager, manager.__enter__()
+
+        emitted = 0
+        with span("llm.stream", model=model, response_format=response_format.__name__) as current, ExitStack() as stack:
+            # Opening the stream is retried like any request; a half-consumed stream cannot be replayed
+            manager, stream = scheduler.call("openrouter", open_stream)
+            stack.push(manager.__exit__)
+            for event in stream:
+                if event.type != "content.delta":
+                    continue
+                # Partial parse that keeps the unterminated string being generated
+                partial = jiter.from_json(event.snapshot.encode("utf-8"), partial_mode="trailing-strings")
+                text = partial.get(field) if isinstance(partial, dict) else None
+                if isinstance(text, str) and len(text) > emitted:
+                    yield "delta", text[emitted:]
+                    emitted = len(text)
+            final = stream.get_final_completion()
+            parsed = final.choices[0].message.parsed
+            record_usage(current, final.usage)
+        if final.usage is not None:
+            token_usage.record_usage(response_format.__name__, final.usage)
+            self.ledger.recorder(stage)(final.usage)
+
+        # None when the model refused or the stream was cut off; not worth remembering
+        if parsed is not None:
+            llm_cache.put(key, parsed)
+        yield "done", parsed
 
     def write_blog(
-        self, topic: str, target_length: int = 1000, style: str = "informative"
+        self,
+        topic: str,
+        target_length: int = 1000,
+        style: str = "informative",
+        plan: Optional[OrchestratorPlan] = None,
     ) -> Dict:
-        """Process the entire blog writing task"""
+        """Process the entire blog writing task.
+
+        Plan, sections and review are reused from the artifact store when their
+        inputs are unchanged, so a rerun only rewrites the dirty sections and the
+        review. Pass an edited `plan` (e.g. the previous result's "structure" with
+        one description changed) to skip planning and rewrite just that section.
+        """
         logger.info(f"Starting blog writing process for: {topic}")
+        # Blog generation yields to interactive requests sharing the rate limits
+        with span("blog.write", target_length=target_length), priority(BATCH):
+            self.ledger = TokenLedger(model)
+            self.artifact_hits = self.artifact_misses = 0
+
+            # Get blog structure plan
+            if plan is None:
+                plan = self.reuse(
+                    "plan",
+                    {"topic": topic, "target_length": target_length, "style": style, "template": ORCHESTRATOR_PROMPT},
+                    OrchestratorPlan,
+                    lambda: self.get_plan(topic, target_length, style),
+                )
+            logger.info(f"Blog structure planned: {len(plan.sections)} sections")
+            logger.info(f"Blog structure planned: {plan.model_dump_json(indent=2)}")
+
+            # Write the sections concurrently, keeping plan order
+            self.sections_content = self.write_sections(topic, plan, writer=self.write_section_incremental)
+
+            # Review and polish
+            logger.info("Reviewing full blog post")
+            review = self.reuse(
+                "review",
+                {
+                    "topic": topic,
+                    "audience": plan.target_audience,
+                    "sections": {name: content.model_dump() for name, content in self.sections_content.items()},
+                    "templates": [REVIEWER_PROMPT, SECTION_REVIEWER_PROMPT, COHESION_PROMPT],
+                    "budget": self.review_token_budget,
+                },
+                ReviewFeedback,
+                lambda: self.review_post(topic, plan),
+            )
+
+            usage = self.ledger.summary()
+            artifacts = self.artifact_stats()
+            logger.info(f"Token usage: {usage['total']}")
+            logger.info(
+                f"Reused {artifacts['hits']} of {artifacts['hits'] + artifacts['misses']} artifact(s) "
+                f"(hit ratio {artifacts['hit_ratio']:.0%})"
+            )
+            return {
+                "structure": plan,
+                "sections": self.sections_content,
+                "review": review,
+                "usage": usage,
+                "artifacts": artifacts,
+            }
+
+    def write_blog_stream(
+        self, topic: str, target_length: int = 1000, style: str = "informative"
+    ) -> Iterator[StreamEvent]:
+        """Like write_blog, but yields section text and the polished post as tokens arrive.
 
-        # Get blog structure plan
-        plan = self.get_plan(topic, target_length, style)
+        Sections are still written concurrently, so deltas of different sections
+        interleave; each carries its section name. The structured fields
+        (key_points, cohesion_score, suggested_edits) arrive on the *_done events.
+        """
+        logger.info(f"Starting streamed blog writing process for: {topic}")
+        self.ledger = TokenLedger(model)
+        with priority(BATCH):
+            plan = self.get_plan(topic, target_length, style)
         logger.info(f"Blog structure planned: {len(plan.sections)} sections")
-        logger.info(f"Blog structure planned: {plan.model_dump_json(indent=2)}")
 
-        # Write each section
-        for section in plan.sections:
-            logger.info(f"Writing section: {section.section_type}")
-            content = self.write_section(topic, section)
-            self.sections_content[section.section_type] = content
+        events = queue.Queue()
+        finished = object()
+        # Set when the consumer stops iterating, so the writer thread stops calling the API
+        stopped = threading.Event()
+
+        def stream_section(topic: str, section: SubTask, context: Optional[Dict[str, SectionContent]]) -> SectionContent:
+            if stopped.is_set():
+                raise StreamStopped(section.section_type)
+            with span("blog.section", section=section.section_type):
+                for kind, value in self.stream_parse(self.section_messages(topic, section, context), SectionContent, "content", "sections"):
+                    if stopped.is_set():
+                        # Leaving the loop closes the stream; later sections are never submitted
+                        raise StreamStopped(section.section_type)
+                    if kind == "delta":
+                        events.put(StreamEvent(kind="section_delta", section=section.section_type, text=value))
+                    else:
+                        events.put(StreamEvent(kind="section_done", section=section.section_type, result=value))
+                        return value
+
+        def run_sections():
+            try:
+                self.sections_content = self.write_sections(topic, plan, writer=stream_section)
+            except Exception as e:
+                events.put(e)
+            finally:
+                events.put(finished)
+
+        with priority(BATCH):
+            run_sections = in_context(run_sections)
+        threading.Thread(target=run_sections, daemon=True).start()
+        try:
+            while (event := events.get()) is not finished:
+                if isinstance(event, Exception):
+                    raise event
+                yield event
+        finally:
+            stopped.set()
 
-        # Review and polish
         logger.info("Reviewing full blog post")
-        review = self.review_post(topic, plan)
-
-        return {"structure": plan, "sections": self.sections_content, "review": review}
+        with priority(BATCH):
+            # Per-section reviews run concurrently, so there is no single final_version to stream
+            review = None if self.review_fits_budget(topic, plan) else self.review_by_section(topic, plan)
+        if review is not None:
+            yield StreamEvent(kind="review_done", result=review)
+            return
+        review_stream = self.stream_parse(self.review_messages(topic, plan), ReviewFeedback, "final_version", "review")
+        for kind, value in in_lane(BATCH, review_stream):
+            if kind == "delta":
+                yield StreamEvent(kind="review_delta", text=value)
+            else:
+                yield StreamEvent(kind="review_done", result=value)
 
 
 # --------------------------------------------------------------
@@ -247,7 +668,7 @@ class BlogOrchestrator:
 # --------------------------------------------------------------
 
 if __name__ == "__main__":
-    orchestrator = BlogOrchestrator()
+    orchestrator = BlogOrchestrator(max_in_flight=4)
 
     # Example: Technical blog post
     topic = "The impact of AI on software development"
@@ -262,4 +683,14 @@ if __name__ == "__main__":
     if result["review"].suggested_edits:
         for edit in result["review"].suggested_edits:
             print(f"Section: {edit.section_name}")
-            print(f"Suggested Edit: {edit.suggested_edit}")
\ No newline at end of file
+            print(f"Suggested Edit: {edit.suggested_edit}")
+
+# --------------------------------------------------------------
+# Step 5: Example usage with streaming
+# --------------------------------------------------------------
+
+# for event in BlogOrchestrator().write_blog_stream(topic="The impact of AI on software development"):
+#     if event.kind == "review_delta":
+#         print(event.text, end="", flush=True)
+#     elif event.kind == "review_done":
+#         print("\nCohesion Score:", event.result.cohesion_score)
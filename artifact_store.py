@@ -0,0 +1,70 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import Optional, Type
+from pydantic import BaseModel
+
+
+logger = logging.getLogger(__name__)
+
+ARTIFACT_PATH = os.environ.get("BLOG_ARTIFACT_PATH", ".blog_artifacts.sqlite3")
+
+
+class ArtifactStore:
+    """Content-addressed SQLite store of generated artifacts (plans, sections, reviews).
+
+    An artifact is keyed on a hash of everything it was generated from, so a rerun
+    with the same inputs finds it and a changed input simply misses. Unlike the LLM
+    cache there is no TTL or size eviction: artifacts are the output, not a shortcut.
+    """
+
+    def __init__(self, path: Optional[str] = ARTIFACT_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        # Only used without a path, e.g. for one-off runs and tests
+        self._memory = {}
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS artifacts ("
+                "key TEXT PRIMARY KEY, kind TEXT NOT NULL, value TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._db.commit()
+
+    @staticmethod
+    def make_key(kind: str, inputs: dict) -> str:
+        """Stable hash of the artifact kind and the JSON-serializable inputs it depends on"""
+        payload = json.dumps({"kind": kind, "inputs": inputs}, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str, response_format: Type[BaseModel]) -> Optional[BaseModel]:
+        with self._lock:
+            value = self._memory.get(key)
+            if value is None and self._db is not None:
+                row = self._db.execute("SELECT value FROM artifacts WHERE key = ?", (key,)).fetchone()
+                value = row[0] if row else None
+        return response_format.model_validate_json(value) if value is not None else None
+
+    def put(self, key: str, kind: str, value: BaseModel):
+        serialized = value.model_dump_json()
+        with self._lock:
+            if self._db is None:
+                self._memory[key] = serialized
+            else:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO artifacts (key, kind, value, created_at) VALUES (?, ?, ?, ?)",
+                    (key, kind, serialized, time.time()),
+                )
+                self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM artifacts")
+                self._db.commit()
@@ -0,0 +1,112 @@
+"""Micro-benchmark: per-event Calendar setup cost with and without CalendarClientPool.
+
+Runs fully offline. A throwaway service-account key is written to a temp file so the
+credential parse is real, the discovery document is the static one bundled with
+google-api-python-client, and `events().insert` is answered by RequestMockBuilder.
+
+Run from the project root:
+    python -m benchmarks.bench_calendar_client --events 200
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from google.oauth2 import service_account
+from googleapiclient.discovery import build
+from googleapiclient.http import RequestMockBuilder
+
+from calendar_client import CalendarClientPool
+
+SCOPES = ['https://www.googleapis.com/auth/calendar']
+INSERT_RESPONSE = (None, json.dumps({"id": "stub123", "htmlLink": "https://calendar.example/stub123"}))
+
+
+def write_service_account_file(directory: str) -> str:
+    """Write a service-account JSON with a freshly generated key"""
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    ).decode()
+    path = os.path.join(directory, "service_account.json")
+    with open(path, "w") as f:
+        json.dump(
+            {
+                "type": "service_account",
+                "project_id": "bench",
+                "private_key_id": "bench",
+                "private_key": pem,
+                "client_email": "bench@bench.iam.gserviceaccount.com",
+                "client_id": "1",
+                "token_uri": "https://oauth2.googleapis.com/token",
+            },
+            f,
+        )
+    return path
+
+
+def load_credentials(path: str):
+    """Load credentials and mark them valid so the stub never hits the token endpoint"""
+    credentials = service_account.Credentials.from_service_account_file(path, scopes=SCOPES)
+    credentials.token = "stub-token"
+    credentials.expiry = datetime.now(timezone.utc).replace(tzinfo=None) + timedelta(hours=1)
+    return credentials
+
+
+def build_stub_service(credentials):
+    request_builder = RequestMockBuilder({"calendar.events.insert": INSERT_RESPONSE})
+    return build('calendar', 'v3', credentials=credentials, requestBuilder=request_builder, cache_discovery=False)
+
+
+def event_body(i: int) -> dict:
+    start = datetime(2025, 6, 3, 14, 0) + timedelta(days=i)
+    return {
+        "summary": f"Event {i}",
+        "start": {"dateTime": start.isoformat(), "timeZone": "America/Toronto"},
+        "end": {"dateTime": (start + timedelta(hours=1)).isoformat(), "timeZone": "America/Toronto"},
+    }
+
+
+def per_event_setup(path: str, events: int) -> float:
+    """The original pattern: load credentials and build the service for every event"""
+    started = time.perf_counter()
+    for i in range(events):
+        service = build_stub_service(load_credentials(path))
+        service.events().insert(calendarId="primary", body=event_body(i)).execute()
+    return time.perf_counter() - started
+
+
+def pooled(path: str, events: int) -> float:
+    pool = CalendarClientPool(
+        path, SCOPES, service_builder=build_stub_service, credentials_loader=lambda: load_credentials(path)
+    )
+    started = time.perf_counter()
+    for i in range(events):
+        pool.service().events().insert(calendarId="primary", body=event_body(i)).execute()
+    return time.perf_counter() - started
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--events", type=int, default=200)
+    args = arg_parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = write_service_account_file(directory)
+        baseline = per_event_setup(path, args.events)
+        reused = pooled(path, args.events)
+
+    print(f"events:             {args.events}")
+    print(f"per-event setup:    {baseline * 1000 / args.events:8.3f} ms/event")
+    print(f"pooled service:     {reused * 1000 / args.events:8.3f} ms/event")
+    print(f"overhead removed:   {(baseline - reused) * 1000 / args.events:8.3f} ms/event ({baseline / reused:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
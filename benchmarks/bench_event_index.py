@@ -0,0 +1,92 @@
+"""Benchmark: per-write cost of the SQLite EventIndex against the old pandas CSV rewrite.
+
+For each index size the store is pre-filled, then `--writes` appends and `--writes`
+in-place updates are timed. The pandas baseline re-reads and rewrites the whole CSV
+per write, exactly like the old add_to_db/update_to_db; it is skipped above
+`--pandas-max` records because it is O(N) per write.
+
+Run from the project root:
+    python -m benchmarks.bench_event_index --sizes 10000 100000 1000000
+"""
+import argparse
+import csv
+import os
+import tempfile
+import time
+
+from event_index import EventIndex
+
+DESCRIPTION = "Created new event with the name 'Team Meeting' with Calendar_ID=p3omdijoqei2dv3r1lmos4op98 starting at 2025-06-03 14:00 with participant(s) Alice, Bob"
+
+
+def write_csv(path: str, size: int):
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["ids", "description"])
+        writer.writerows((f"id{i}", DESCRIPTION) for i in range(1, size + 1))
+
+
+def bench_sqlite(directory: str, size: int, writes: int) -> dict:
+    csv_path = os.path.join(directory, "df_db.csv")
+    write_csv(csv_path, size)
+
+    started = time.perf_counter()
+    index = EventIndex(os.path.join(directory, "event_index.sqlite3"), legacy_csv_path=csv_path)
+    migrate = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for _ in range(writes):
+        index.append(DESCRIPTION)
+    append = (time.perf_counter() - started) / writes
+
+    started = time.perf_counter()
+    for i in range(writes):
+        index.update(f"id{size // 2 + i}", DESCRIPTION + " (moved)")
+    update = (time.perf_counter() - started) / writes
+
+    assert len(index) == size + writes
+    index.close()
+    return {"migrate": migrate, "append": append, "update": update}
+
+
+def bench_pandas(directory: str, size: int, writes: int) -> dict:
+    import pandas as pd
+
+    path = os.path.join(directory, "pandas_df_db.csv")
+    write_csv(path, size)
+
+    started = time.perf_counter()
+    for _ in range(writes):
+        df_db = pd.read_csv(path)
+        df_db.loc[len(df_db)] = {"ids": f"id{len(df_db)+1}", "description": DESCRIPTION}
+        df_db.to_csv(path, index=False)
+    append = (time.perf_counter() - started) / writes
+
+    started = time.perf_counter()
+    for i in range(writes):
+        df_db = pd.read_csv(path)
+        df_db.loc[df_db["ids"] == f"id{size // 2 + i}", "description"] = DESCRIPTION + " (moved)"
+        df_db.to_csv(path, index=False)
+    update = (time.perf_counter() - started) / writes
+    return {"append": append, "update": update}
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    arg_parser.add_argument("--writes", type=int, default=50)
+    arg_parser.add_argument("--pandas-max", type=int, default=100_000)
+    args = arg_parser.parse_args()
+
+    print(f"{'records':>10} {'store':>7} {'append ms':>10} {'update ms':>10} {'migrate s':>10}")
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            result = bench_sqlite(directory, size, args.writes)
+            print(f"{size:>10} {'sqlite':>7} {result['append'] * 1000:>10.3f} {result['update'] * 1000:>10.3f} {result['migrate']:>10.2f}")
+            if size <= args.pandas_max:
+                result = bench_pandas(directory, size, args.writes)
+                print(f"{size:>10} {'pandas':>7} {result['append'] * 1000:>10.3f} {result['update'] * 1000:>10.3f} {'-':>10}")
+
+
+if __name__ == "__main__":
+    main()
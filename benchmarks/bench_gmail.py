@@ -0,0 +1,82 @@
+"""Load test: Gmail intake throughput against the fake Gmail service.
+
+Every Gmail round trip (a list page, a single get or a whole batch request)
+costs `--gmail-ms`. For each message count it times the old one-get-per-message
+loop and `iter_unread_emails` at each `--batch-sizes` value, and prints the
+messages per second and round trips of each. The scheduler's Gmail quota is
+lifted unless --rate-limits is given, so the numbers show the batching alone.
+
+Run from the project root:
+    python -m benchmarks.bench_gmail
+    python -m benchmarks.bench_gmail --messages 100 1000 --batch-sizes 1 10 50 100 --gmail-ms 80
+"""
+import argparse
+import logging
+import os
+import time
+
+
+def make_emails(count: int) -> list[str]:
+    return [f"Meeting number {number} with Alice tomorrow at {9 + number % 8}am to go over item {number}."
+            for number in range(count)]
+
+
+def run_per_message(service, gmail_reader) -> int:
+    """The pre-batching loop: list, then one get per message"""
+    fetched = 0
+    for message_id in gmail_reader.list_message_ids(service):
+        response = service.users().messages().get(userId='me', id=message_id).execute()
+        gmail_reader.parse_message(response)
+        fetched += 1
+    return fetched
+
+
+def run_batched(service, gmail_reader, batch_size: int) -> int:
+    return sum(1 for _ in gmail_reader.iter_unread_emails(batch_size=batch_size, service=service))
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--messages", type=int, nargs="+", default=[100, 500])
+    arg_parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 10, 50, 100])
+    arg_parser.add_argument("--gmail-ms", type=float, default=50.0, help="Latency of one Gmail round trip")
+    arg_parser.add_argument("--rate-limits", action="store_true", help="Keep the scheduler's Gmail quota")
+    args = arg_parser.parse_args()
+    if not args.rate_limits:
+        # Read by the scheduler when gmail_reader imports it
+        os.environ["RATE_LIMIT_GMAIL"] = "inf"
+
+    import gmail_reader
+    from benchmarks.fakes import FakeGmailService, Latency
+
+    # gmail_reader logs every batch at INFO; only the table matters here
+    logging.getLogger().setLevel(logging.WARNING)
+
+    class CountingLatency(Latency):
+        def __init__(self, gmail_ms: float):
+            super().__init__(gmail_ms=gmail_ms)
+            self.round_trips = 0
+
+        def sleep(self, backend: str):
+            self.round_trips += 1
+            super().sleep(backend)
+
+    print(f"{'messages':>9} {'mode':>14} {'round trips':>12} {'elapsed s':>10} {'msgs/s':>9}")
+    for count in args.messages:
+        emails = make_emails(count)
+        modes = [("per message", None)] + [(f"batch {size}", size) for size in args.batch_sizes]
+        for name, batch_size in modes:
+            latency = CountingLatency(args.gmail_ms)
+            service = FakeGmailService(latency, emails)
+            started = time.perf_counter()
+            if batch_size is None:
+                fetched = run_per_message(service, gmail_reader)
+            else:
+                fetched = run_batched(service, gmail_reader, batch_size)
+            elapsed = time.perf_counter() - started
+            assert fetched == count, f"{name}: fetched {fetched} of {count} messages"
+            print(f"{count:>9} {name:>14} {latency.round_trips:>12} {elapsed:>10.2f} {count / elapsed:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Load test: sequential email processing against the staged Pipeline, with stub backends.
+
+Every backend is a sleep of the configured latency: Gmail fetch per email, the
+routing and extraction LLM calls, and the Calendar call plus the journal append.
+The sequential run is the old per-email loop; the pipelined run uses the same
+stage layout as `calendar-modifier.py --pipeline`. Per-stage throughput, peak
+queue depth and utilization are printed for the pipelined run.
+
+Run from the project root:
+    python -m benchmarks.bench_pipeline --emails 200
+    python -m benchmarks.bench_pipeline --emails 200 --llm-ms 800 --route-workers 8 --extract-workers 8
+"""
+import argparse
+import time
+
+from pipeline import QUEUE_SIZE, Pipeline, Stage
+
+
+def stub(latency_ms: float):
+    def call(item):
+        time.sleep(latency_ms / 1000)
+        return item
+    return call
+
+
+def emails(count: int, fetch_ms: float):
+    fetch = stub(fetch_ms)
+    for number in range(count):
+        yield fetch(number)
+
+
+def run_sequential(args) -> float:
+    route, extract, apply = stub(args.llm_ms), stub(args.llm_ms), stub(args.calendar_ms)
+    started = time.perf_counter()
+    for email in emails(args.emails, args.fetch_ms):
+        apply(extract(route(email)))
+    return time.perf_counter() - started
+
+
+def run_pipelined(args) -> dict:
+    pipeline = Pipeline([
+        Stage("route", stub(args.llm_ms), workers=args.route_workers, queue_size=args.queue_size),
+        Stage("extract", stub(args.llm_ms), workers=args.extract_workers, queue_size=args.queue_size),
+        Stage("apply", stub(args.calendar_ms), workers=args.apply_workers, queue_size=args.queue_size),
+    ])
+    return pipeline.run(emails(args.emails, args.fetch_ms))
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--emails", type=int, default=100)
+    arg_parser.add_argument("--fetch-ms", type=float, default=20)
+    arg_parser.add_argument("--llm-ms", type=float, default=400)
+    arg_parser.add_argument("--calendar-ms", type=float, default=150)
+    arg_parser.add_argument("--route-workers", type=int, default=4)
+    arg_parser.add_argument("--extract-workers", type=int, default=4)
+    arg_parser.add_argument("--apply-workers", type=int, default=2)
+    arg_parser.add_argument("--queue-size", type=int, default=QUEUE_SIZE)
+    arg_parser.add_argument("--skip-sequential", action="store_true")
+    args = arg_parser.parse_args()
+
+    if not args.skip_sequential:
+        elapsed = run_sequential(args)
+        print(f"sequential: {args.emails} emails in {elapsed:.2f}s ({args.emails / elapsed:.2f}/s)")
+
+    metrics = run_pipelined(args)
+    elapsed = metrics["elapsed_s"]
+    print(f"pipelined:  {args.emails} emails in {elapsed:.2f}s ({args.emails / elapsed:.2f}/s)")
+    print(f"{'stage':>8} {'workers':>8} {'done':>6} {'per s':>7} {'max queue':>10} {'util':>6}")
+    for name, stage in metrics["stages"].items():
+        print(
+            f"{name:>8} {stage['workers']:>8} {stage['processed']:>6} {stage['throughput_per_s']:>7.2f} "
+            f"{stage['max_queue_depth']:>10} {stage['utilization']:>6.0%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
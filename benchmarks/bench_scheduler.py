@@ -0,0 +1,216 @@
+"""Load test: the shared scheduler against a local OpenAI-compatible server that injects throttling.
+
+The server answers /chat/completions with a fixed structured output. It admits
+`--server-rps` requests per second (token bucket), answers the rest with 429 and
+a Retry-After header, and fails `--error-rate` of the admitted ones with 503.
+The same burst of concurrent requests is sent three ways: the bare OpenAI client
+with its retries off, the client with its built-in retries (the default of 2),
+and through the scheduler with SDK retries off. For each mode it prints
+successes, failures, the 429s the server sent and p50/p95 latency. A batch-lane
+flood with a few interactive requests mixed in shows the priority lanes.
+
+Run from the project root:
+    python -m benchmarks.bench_scheduler
+    python -m benchmarks.bench_scheduler --requests 200 --concurrency 32 --server-rps 20 --error-rate 0.1
+"""
+import argparse
+import json
+import logging
+import random
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from openai import OpenAI
+from pydantic import BaseModel
+
+from scheduler import BATCH, INTERACTIVE, Scheduler, priority
+
+
+class Ping(BaseModel):
+    ok: bool
+
+
+class ThrottlingServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, rps: float, error_rate: float, latency_ms: float, seed: int):
+        super().__init__(("127.0.0.1", 0), ThrottlingHandler)
+        self.rps = rps
+        self.error_rate = error_rate
+        self.latency_ms = latency_ms
+        self.tokens = rps
+        self.updated = time.monotonic()
+        self.random = random.Random(seed)
+        self.throttled = 0
+        self.failed = 0
+        self.served = 0
+        self.lock = threading.Lock()
+
+    def admit(self) -> str:
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.rps, self.tokens + (now - self.updated) * self.rps)
+            self.updated = now
+            if self.tokens < 1:
+                self.throttled += 1
+                return "throttle"
+            self.tokens -= 1
+            if self.random.random() < self.error_rate:
+                self.failed += 1
+                return "fail"
+            self.served += 1
+            return "ok"
+
+
+class ThrottlingHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def reply(self, status: int, body: dict, headers: dict = None):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        outcome = self.server.admit()
+        if outcome == "throttle":
+            wait = 1 / self.server.rps
+            self.reply(429, {"error": {"message": "Rate limit exceeded", "code": 429}}, {"Retry-After": f"{wait:.3f}"})
+            return
+        time.sleep(self.server.latency_ms / 1000)
+        if outcome == "fail":
+            self.reply(503, {"error": {"message": "Upstream unavailable", "code": 503}})
+            return
+        self.reply(200, {
+            "id": "chatcmpl-local",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": "local",
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": json.dumps({"ok": True})},
+                "finish_reason": "stop",
+            }],
+            "usage": {"prompt_tokens": 10, "completion_tokens": 3, "total_tokens": 13},
+        })
+
+
+def parse(client: OpenAI, number: int):
+    return client.beta.chat.completions.parse(
+        model="local", messages=[{"role": "user", "content": f"ping {number}"}], response_format=Ping
+    )
+
+
+def run_mode(name: str, send, requests: int, concurrency: int, server: ThrottlingServer) -> dict:
+    throttled_before = server.throttled
+    latencies, failures = [], 0
+    lock = threading.Lock()
+
+    def one(number: int):
+        nonlocal failures
+        started = time.perf_counter()
+        try:
+            send(number)
+            with lock:
+                latencies.append(time.perf_counter() - started)
+        except Exception:
+            with lock:
+                failures += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(one, range(requests)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "mode": name,
+        "ok": len(latencies),
+        "failed": failures,
+        "server_429s": server.throttled - throttled_before,
+        "elapsed_s": elapsed,
+        "p50_ms": statistics.median(latencies) * 1000 if latencies else 0.0,
+        "p95_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000 if latencies else 0.0,
+    }
+
+
+def run_lanes(client: OpenAI, scheduler: Scheduler, requests: int, concurrency: int) -> dict:
+    """Flood the batch lane, then time interactive requests submitted behind it"""
+    waits = {BATCH: [], INTERACTIVE: []}
+    lock = threading.Lock()
+
+    def one(item):
+        number, lane = item
+        started = time.perf_counter()
+        with priority(lane):
+            try:
+                scheduler.call("openrouter", lambda: parse(client, number))
+            except Exception:
+                return
+        with lock:
+            waits[lane].append(time.perf_counter() - started)
+
+    # Every fifth request after the first batch wave is interactive
+    items = [(number, INTERACTIVE if number > concurrency and number % 5 == 0 else BATCH) for number in range(requests)]
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(one, items))
+    return {lane: statistics.median(values) * 1000 if values else 0.0 for lane, values in waits.items()}
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--requests", type=int, default=100)
+    arg_parser.add_argument("--concurrency", type=int, default=16)
+    arg_parser.add_argument("--server-rps", type=float, default=20)
+    arg_parser.add_argument("--error-rate", type=float, default=0.05)
+    arg_parser.add_argument("--latency-ms", type=float, default=20)
+    arg_parser.add_argument("--client-rps", type=float, default=18, help="Scheduler rate limit for the server")
+    arg_parser.add_argument("--seed", type=int, default=0)
+    args = arg_parser.parse_args()
+    # Each retry logs a warning; the summary below is what matters here
+    logging.getLogger("scheduler").setLevel(logging.ERROR)
+
+    server = ThrottlingServer(args.server_rps, args.error_rate, args.latency_ms, args.seed)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    bare = OpenAI(base_url=base_url, api_key="local", max_retries=0)
+    sdk_retries = OpenAI(base_url=base_url, api_key="local")
+
+    def fresh_scheduler() -> Scheduler:
+        return Scheduler({"openrouter": (args.client_rps, args.client_rps)}, base_delay=0.05, max_delay=2.0)
+
+    scheduler = fresh_scheduler()
+    results = []
+    for name, send in [
+        ("bare", lambda number: parse(bare, number)),
+        ("sdk retries", lambda number: parse(sdk_retries, number)),
+        ("scheduler", lambda number: scheduler.call("openrouter", lambda: parse(bare, number))),
+    ]:
+        # Let the server's bucket refill between modes
+        time.sleep(1.5)
+        results.append(run_mode(name, send, args.requests, args.concurrency, server))
+
+    print(f"{'mode':>12} {'ok':>5} {'failed':>7} {'429s':>6} {'elapsed s':>10} {'p50 ms':>8} {'p95 ms':>8}")
+    for result in results:
+        print(
+            f"{result['mode']:>12} {result['ok']:>5} {result['failed']:>7} {result['server_429s']:>6} "
+            f"{result['elapsed_s']:>10.2f} {result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f}"
+        )
+    print(f"scheduler: {scheduler.stats()['openrouter']}")
+
+    time.sleep(1.5)
+    lanes = run_lanes(bare, fresh_scheduler(), args.requests, args.concurrency)
+    print(f"median latency by lane: interactive {lanes[INTERACTIVE]:.1f} ms, batch {lanes[BATCH]:.1f} ms")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
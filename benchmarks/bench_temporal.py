@@ -0,0 +1,113 @@
+"""Benchmark: local temporal resolver against LLM extraction of date, start time and duration.
+
+Each fixture case has the request text, the "now" it was written at and the expected
+date/start_time/duration. The resolver is timed over `--repeats` runs; cases it does
+not fully resolve count as fallbacks (the LLM path handles them), resolved ones are
+checked for accuracy. With `--llm` the same cases also go through the NewEventDetails
+extraction of calendar-modifier.py (needs OPENAI_API_KEY; bypasses the LLM cache).
+
+Run from the project root:
+    python -m benchmarks.bench_temporal
+    python -m benchmarks.bench_temporal --llm
+"""
+import argparse
+import importlib.util
+import json
+import os
+import statistics
+import time
+from datetime import datetime
+
+from dateutil import parser
+
+from temporal import resolve
+
+DEFAULT_CASES = os.path.join(os.path.dirname(__file__), "fixtures", "temporal_cases.jsonl")
+
+
+def load_cases(path: str) -> list[dict]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def expected_window(case: dict) -> tuple[datetime, int]:
+    return parser.parse(f"{case['date']} {case['start_time']}"), case["duration_minutes"]
+
+
+def bench_resolver(cases: list[dict], repeats: int) -> dict:
+    latencies = []
+    resolved = correct = 0
+    wrong = []
+    for case in cases:
+        now = datetime.fromisoformat(case["now"])
+        started = time.perf_counter()
+        for _ in range(repeats):
+            timing = resolve(case["text"], now)
+        latencies.append((time.perf_counter() - started) / repeats)
+        if not timing.complete:
+            continue
+        resolved += 1
+        if (parser.parse(f"{timing.date} {timing.start_time}"), timing.duration_minutes) == expected_window(case):
+            correct += 1
+        else:
+            wrong.append((case["text"], timing.date, timing.start_time, timing.duration_minutes))
+    return {"latencies": latencies, "resolved": resolved, "correct": correct, "wrong": wrong}
+
+
+def bench_llm(cases: list[dict]) -> dict:
+    spec = importlib.util.spec_from_file_location("calendar_modifier", "calendar-modifier.py")
+    calendar_modifier = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(calendar_modifier)
+
+    latencies = []
+    correct = 0
+    wrong = []
+    for case in cases:
+        started = time.perf_counter()
+        completion = calendar_modifier.client.beta.chat.completions.parse(
+            model=calendar_modifier.model,
+            messages=calendar_modifier.new_event_messages(case["text"], today=datetime.fromisoformat(case["now"])),
+            response_format=calendar_modifier.NewEventDetails,
+        )
+        latencies.append(time.perf_counter() - started)
+        details = completion.choices[0].message.parsed
+        try:
+            start_time, _ = calendar_modifier.event_window(details)
+            got = (start_time.replace(tzinfo=None), details.duration_minutes)
+        except (ValueError, OverflowError):
+            got = None
+        if got == expected_window(case):
+            correct += 1
+        else:
+            wrong.append((case["text"], details.date, details.start_time, details.duration_minutes))
+    return {"latencies": latencies, "resolved": len(cases), "correct": correct, "wrong": wrong}
+
+
+def report(name: str, result: dict, cases: int):
+    latencies = sorted(result["latencies"])
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    accuracy = result["correct"] / result["resolved"] if result["resolved"] else 0.0
+    print(
+        f"{name:>9} {statistics.median(latencies) * 1000:>10.3f} {p95 * 1000:>10.3f} "
+        f"{result['resolved']:>5}/{cases:<4} {accuracy:>9.1%}"
+    )
+    for text, date, start_time, duration in result["wrong"]:
+        print(f"{'':>9} wrong: {text!r} -> {date} {start_time} {duration}min")
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--cases", default=DEFAULT_CASES)
+    arg_parser.add_argument("--repeats", type=int, default=200)
+    arg_parser.add_argument("--llm", action="store_true", help="also run the LLM extraction path")
+    args = arg_parser.parse_args()
+
+    cases = load_cases(args.cases)
+    print(f"{'path':>9} {'p50 ms':>10} {'p95 ms':>10} {'resolved':>10} {'accuracy':>9}")
+    report("resolver", bench_resolver(cases, args.repeats), len(cases))
+    if args.llm:
+        report("llm", bench_llm(cases), len(cases))
+
+
+if __name__ == "__main__":
+    main()
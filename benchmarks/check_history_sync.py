@@ -0,0 +1,78 @@
+"""Check: gmail_reader.HistorySync against the fake Gmail service.
+
+Walks the incremental intake through its cases and asserts, at each poll, the
+message ids yielded, the metadata and full fetches made and the full resyncs:
+
+    first poll       no checkpoint, one full is:unread scan
+    new mail         only the added messages are listed; one read in the meantime
+                     is fetched as metadata but never in full
+    quiet poll       nothing listed, nothing fetched
+    resume           a new HistorySync from the checkpoint sees only later mail
+    retry            retry_ids are looked at again
+    expired history  history().list answers 404, one full resync, then incremental again
+    failed part      a message answering 429 inside a batch is fetched again on its own
+
+Run from the project root:
+    python -m benchmarks.check_history_sync
+"""
+import argparse
+import logging
+import os
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.parse_args()
+    os.environ["RATE_LIMIT_GMAIL"] = "inf"
+
+    from benchmarks.fakes import FakeGmailService, Latency
+    from gmail_reader import HistorySync
+
+    logging.getLogger().setLevel(logging.ERROR)
+    service = FakeGmailService(Latency(), ["Lunch with Anna tomorrow at 1pm", "Newsletter", "Call Bob friday 3pm"])
+    messages = service._messages
+    handled = set()
+
+    def skip(chunk: list[str]) -> set[str]:
+        # Stands in for the worker's ledger: handled messages are never fetched again
+        return handled & set(chunk)
+
+    def poll(sync: HistorySync, name: str, expected_ids: list[str], metadata: int, full: int, full_syncs: int,
+             retry_ids=None):
+        before = dict(messages.fetched)
+        ids = [email.id for email in sync.poll(skip=skip, retry_ids=retry_ids)]
+        handled.update(ids)
+        fetched = {kind: messages.fetched[kind] - before[kind] for kind in before}
+        assert ids == expected_ids, f"{name}: yielded {ids}, expected {expected_ids}"
+        assert fetched == {"full": full, "metadata": metadata}, f"{name}: fetched {fetched}"
+        assert sync.full_syncs == full_syncs, f"{name}: {sync.full_syncs} full syncs, expected {full_syncs}"
+        print(f"ok  {name:<16} ids={ids} fetched={fetched} full_syncs={sync.full_syncs} history_id={sync.history_id}")
+
+    sync = HistorySync(service=service)
+    poll(sync, "first poll", ["m0", "m1", "m2"], metadata=0, full=3, full_syncs=1)
+    assert sync.history_id == "3", sync.history_id
+
+    service.add("Coffee with Dan monday 9am")
+    messages.read.add(service.add("Review tuesday 10am"))
+    poll(sync, "new mail", ["m3"], metadata=2, full=1, full_syncs=1)
+    poll(sync, "quiet poll", [], metadata=0, full=0, full_syncs=1)
+
+    resumed = HistorySync(sync.history_id, service=service)
+    service.add("Interview with Eve wednesday 11am")
+    poll(resumed, "resume", ["m5"], metadata=1, full=1, full_syncs=0)
+
+    handled.discard("m3")
+    poll(resumed, "retry", ["m3"], metadata=1, full=1, full_syncs=0, retry_ids=["m3"])
+
+    service.expire_history()
+    service.add("Standup with Finn thursday 9am")
+    poll(resumed, "expired history", ["m6"], metadata=0, full=1, full_syncs=1)
+    service.add("Dinner with Gil saturday 7pm")
+    poll(resumed, "after resync", ["m7"], metadata=1, full=1, full_syncs=1)
+    service.fail_in_batch(service.add("Retro with Hal friday 4pm"))
+    poll(resumed, "failed part", ["m8"], metadata=2, full=1, full_syncs=1)
+    print("all checks passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""Evaluate the local event pre-classifier on a labelled corpus.
+
+Prints recall/precision and the share of LLM gate calls saved for the configured
+threshold, a sweep over reject thresholds, and the most aggressive threshold
+that still meets `--min-recall` on the corpus.
+
+Run from the project root:
+    python -m benchmarks.eval_event_classifier
+    python -m benchmarks.eval_event_classifier --corpus my_labelled_mail.jsonl --reject-below 0.2
+"""
+import argparse
+import os
+
+from event_classifier import REJECT_BELOW, EventPreClassifier, evaluate, load_corpus, tune
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(__file__), "fixtures", "calendar_corpus.jsonl")
+SWEEP = [0.02, 0.05, 0.1, 0.2, 0.3, 0.4, 0.5]
+
+
+def print_row(label: str, result: dict):
+    print(
+        f"{label:>22} {result['reject_recall']:>7.3f} {result['reject_precision']:>9.3f} "
+        f"{result['missed_events']:>7} {result['llm_calls_saved']:>7.1%}"
+    )
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--corpus", default=DEFAULT_CORPUS)
+    arg_parser.add_argument("--reject-below", type=float, default=REJECT_BELOW)
+    arg_parser.add_argument("--min-recall", type=float, default=1.0)
+    args = arg_parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    events = sum(1 for _, is_event in corpus if is_event)
+    print(f"{len(corpus)} examples, {events} events")
+    print(f"{'threshold':>22} {'recall':>7} {'rej prec':>9} {'missed':>7} {'saved':>7}")
+
+    print_row(f"reject < {args.reject_below:g}", evaluate(EventPreClassifier(args.reject_below), corpus))
+    for reject_below in SWEEP:
+        print_row(f"reject < {reject_below:g}", evaluate(EventPreClassifier(reject_below), corpus))
+
+    tuned = tune(corpus, args.min_recall)
+    print_row(f"tuned < {tuned.reject_below:.3f}", evaluate(tuned, corpus))
+
+
+if __name__ == "__main__":
+    main()
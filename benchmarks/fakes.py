@@ -0,0 +1,434 @@
+"""Deterministic stand-ins for the OpenAI, Google Calendar and Gmail clients.
+
+Each fake answers the calls the agents make with a plausible, repeatable result
+and sleeps for an injected latency first, so a replay measures the agents' own
+overhead plus a backend cost you choose. Structured outputs are built from the
+request text (dates and times through the local temporal resolver), keyed on the
+response_format class name; usage carries estimated prompt/completion tokens, and
+cached_tokens counts the leading messages (with the schema) seen in an earlier
+request, like a provider's prefix cache at message granularity.
+"""
+import asyncio
+import base64
+import hashlib
+import random
+import re
+import threading
+import time
+import types
+from datetime import datetime, timedelta
+from typing import Optional
+
+from googleapiclient.errors import HttpError
+
+from temporal import resolve
+from token_budget import estimate_prompt_tokens, estimate_tokens
+
+MODIFY_WORDS = re.compile(r"\b(move|moved|reschedule|push|postpone|change|shift|bring forward)\b", re.I)
+EVENT_WORDS = re.compile(
+    r"\b(meeting|meet|call|sync|lunch|dinner|coffee|review|interview|standup|appointment|schedule|catch up)\b", re.I
+)
+PARTICIPANTS = re.compile(r"\bwith ((?:[A-Z][a-z]+)(?:(?:, | and | & )[A-Z][a-z]+)*)")
+
+
+class Latency:
+    """Injected per-call latency in milliseconds, with seeded uniform jitter (0.2 = +/-20%)"""
+
+    def __init__(self, llm_ms: float = 0.0, calendar_ms: float = 0.0, gmail_ms: float = 0.0,
+                 jitter: float = 0.0, seed: int = 0):
+        self.ms = {"llm": llm_ms, "calendar": calendar_ms, "gmail": gmail_ms}
+        self.jitter = jitter
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def seconds(self, backend: str) -> float:
+        """One draw of the backend's latency"""
+        base = self.ms[backend]
+        if base <= 0:
+            return 0.0
+        with self._lock:
+            factor = 1 + self.jitter * self._random.uniform(-1, 1)
+        return base * factor / 1000
+
+    def sleep(self, backend: str):
+        delay = self.seconds(backend)
+        if delay:
+            time.sleep(delay)
+
+
+def _digest(text: str) -> int:
+    return int(hashlib.sha256(text.encode("utf-8")).hexdigest()[:8], 16)
+
+
+def _participants(text: str) -> list[str]:
+    match = PARTICIPANTS.search(text)
+    return re.split(r", | and | & ", match.group(1)) if match else []
+
+
+def _subject(text: str) -> str:
+    match = EVENT_WORDS.search(text)
+    return match.group(0).title() if match else "Event"
+
+
+def _timing(text: str, now: datetime) -> tuple[str, str, int]:
+    timing = resolve(text, now)
+    date = timing.date or (now + timedelta(days=1)).strftime("%Y-%m-%d")
+    return date, timing.start_time or "14:00", timing.duration_minutes or 60
+
+
+class FakeLLM:
+    """Builds the parsed result for one structured-output request"""
+
+    def __init__(self, now: Optional[datetime] = None):
+        self.now = now
+
+    def respond(self, messages: list[dict], response_format):
+        name = response_format.__name__
+        text = messages[-1]["content"]
+        now = self.now or datetime.now()
+        is_event = bool(EVENT_WORDS.search(text))
+        request_type = ("modify_event" if MODIFY_WORDS.search(text) else "new_event") if is_event else "other"
+        date, start_time, duration = _timing(text, now)
+        participants = _participants(text)
+        subject = _subject(text)
+
+        new_details = {"name": subject, "date": date, "duration_minutes": duration, "start_time": start_time,
+                       "participants": participants}
+        modify_details = {"event_identifier": subject, "changes": [], "date": date, "duration_minutes": duration,
+                          "start_time": start_time, "participants_to_add": participants,
+                          "participants_to_remove": [], "original_date": None}
+        confidence = 0.9 if is_event else 0.8
+
+        if name == "CalendarRequestType":
+            data = {"request_type": request_type, "confidence_score": confidence, "description": text}
+        elif name == "FusedCalendarRequest":
+            details = {"new_event": new_details, "modify_event": modify_details}.get(request_type)
+            request = {"request_type": request_type, **({"details": details} if details else {})}
+            data = {"confidence_score": confidence, "description": text, "request": request}
+        elif name == "NewEventDetails":
+            data = new_details
+        elif name == "ModifyEventDetails":
+            data = modify_details
+        elif name in ("NewEventSubject", "EventSubject"):
+            data = {"name": subject, "participants": participants}
+        elif name == "ModifyEventSubject":
+            data = {"event_identifier": subject, "participants_to_add": participants, "participants_to_remove": []}
+        elif name == "EventExtraction":
+            data = {"description": text, "is_calendar_event": is_event, "confidence_score": confidence}
+        elif name == "EventDetails":
+            data = {"name": subject, "date": date, "duration_minutes": duration, "participants": participants}
+        elif name == "EventConfirmation":
+            data = {"confirmation_message": f"Your event is confirmed. {text[:200]}", "calendar_link": None}
+        elif name == "OrchestratorPlan":
+            count = 4 + _digest(text) % 3
+            data = {
+                "topic_analysis": f"Analysis of the requested topic ({len(text)} characters of instructions).",
+                "target_audience": "software engineers",
+                "sections": [
+                    {"section_type": f"Section {number + 1}", "description": f"Part {number + 1} of the post",
+                     "style_guide": "clear and concrete", "target_length": 200,
+                     "depends_on": [f"Section {number}"] if number else []}
+                    for number in range(count)
+                ],
+            }
+        elif name == "SectionContent":
+            words = " ".join(f"w{(_digest(text) + number) % 997}" for number in range(180))
+            data = {"content": words, "key_points": ["first point", "second point", "third point"]}
+        elif name == "ReviewFeedback":
+            data = {"cohesion_score": 0.8, "suggested_edits": [], "final_version": text[-4000:]}
+        elif name == "SectionReview":
+            data = {"suggested_edit": "Tighten the opening.", "polished_content": text[-1500:]}
+        elif name == "CohesionReview":
+            data = {"cohesion_score": 0.8}
+        else:
+            raise ValueError(f"No fake response for {name}")
+        return response_format.model_validate(data)
+
+
+class PrefixCache:
+    """Remembers request prefixes: schema name plus the leading messages, never the last one"""
+
+    def __init__(self):
+        self._seen = set()
+        self._lock = threading.Lock()
+
+    def cached_tokens(self, messages: list[dict], response_format) -> int:
+        prefixes = [
+            hashlib.sha256(repr((response_format.__name__, messages[:end])).encode("utf-8")).hexdigest()
+            for end in range(1, len(messages))
+        ]
+        with self._lock:
+            hits = [end for end, prefix in enumerate(prefixes, start=1) if prefix in self._seen]
+            self._seen.update(prefixes)
+        return estimate_prompt_tokens(messages[:max(hits)]) if hits else 0
+
+
+def _completion(parsed, messages: list[dict], cached_tokens: int = 0):
+    content = parsed.model_dump_json()
+    usage = types.SimpleNamespace(
+        prompt_tokens=estimate_prompt_tokens(messages),
+        completion_tokens=estimate_tokens(content),
+        prompt_tokens_details=types.SimpleNamespace(cached_tokens=cached_tokens),
+    )
+    usage.total_tokens = usage.prompt_tokens + usage.completion_tokens
+    message = types.SimpleNamespace(parsed=parsed, content=content, refusal=None)
+    return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)], usage=usage)
+
+
+class _FakeStream:
+    """Context manager mimicking the SDK's structured-output stream: content.delta events, then the final completion"""
+
+    def __init__(self, completion, chunk_chars: int):
+        self.completion = completion
+        self.chunk_chars = chunk_chars
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def __iter__(self):
+        content = self.completion.choices[0].message.content
+        for end in range(self.chunk_chars, len(content) + self.chunk_chars, self.chunk_chars):
+            yield types.SimpleNamespace(type="content.delta", snapshot=content[:end], delta=None, parsed=None)
+
+    def get_final_completion(self):
+        return self.completion
+
+
+class _FakeCompletions:
+    def __init__(self, latency: Latency, llm: FakeLLM):
+        self.latency = latency
+        self.llm = llm
+        self.calls = 0
+        self.prefix_cache = PrefixCache()
+        self._lock = threading.Lock()
+
+    def _complete(self, messages, response_format):
+        with self._lock:
+            self.calls += 1
+        self.latency.sleep("llm")
+        cached = self.prefix_cache.cached_tokens(messages, response_format)
+        return _completion(self.llm.respond(messages, response_format), messages, cached)
+
+    def parse(self, model, messages, response_format, **kwargs):
+        return self._complete(messages, response_format)
+
+    def stream(self, model, messages, response_format, **kwargs):
+        return _FakeStream(self._complete(messages, response_format), chunk_chars=16)
+
+
+class _FakeAsyncCompletions(_FakeCompletions):
+    async def parse(self, model, messages, response_format, **kwargs):
+        with self._lock:
+            self.calls += 1
+        await asyncio.sleep(self.latency.seconds("llm"))
+        cached = self.prefix_cache.cached_tokens(messages, response_format)
+        return _completion(self.llm.respond(messages, response_format), messages, cached)
+
+
+class FakeOpenAI:
+    """Covers `client.beta.chat.completions.parse/stream`; `calls` counts requests"""
+
+    def __init__(self, latency: Latency, now: Optional[datetime] = None, is_async: bool = False):
+        completions = (_FakeAsyncCompletions if is_async else _FakeCompletions)(latency, FakeLLM(now))
+        self.completions = completions
+        self.beta = types.SimpleNamespace(chat=types.SimpleNamespace(completions=completions))
+        self.chat = self.beta.chat
+
+    @property
+    def calls(self) -> int:
+        return self.completions.calls
+
+
+class _Request:
+    def __init__(self, latency: Latency, backend: str, result):
+        self.latency = latency
+        self.backend = backend
+        self.result = result
+
+    def execute(self):
+        self.latency.sleep(self.backend)
+        return self.response()
+
+    def response(self):
+        return self.result() if callable(self.result) else self.result
+
+
+class _FakeEvents:
+    def __init__(self, latency: Latency):
+        self.latency = latency
+        self.events = {}
+        self._lock = threading.Lock()
+
+    def insert(self, calendarId, body, **kwargs):
+        def create():
+            with self._lock:
+                event_id = body.get("id") or f"fake{len(self.events) + 1:06d}"
+                if event_id in self.events:
+                    # Like Calendar, a client-chosen id can only be inserted once
+                    raise HttpError(types.SimpleNamespace(status=409, reason="Conflict"),
+                                    b'{"error": {"code": 409, "message": "The requested identifier already exists."}}')
+                self.events[event_id] = dict(body, id=event_id)
+            return {**self.events[event_id], "htmlLink": f"https://calendar.example/{event_id}"}
+        return _Request(self.latency, "calendar", create)
+
+    def update(self, calendarId, eventId, body, **kwargs):
+        def replace():
+            with self._lock:
+                self.events[eventId] = dict(body, id=eventId)
+            return {**self.events[eventId], "htmlLink": f"https://calendar.example/{eventId}"}
+        return _Request(self.latency, "calendar", replace)
+
+    def get(self, calendarId, eventId, **kwargs):
+        return _Request(self.latency, "calendar", lambda: self.events[eventId])
+
+
+class FakeCalendarPool:
+    """Drop-in for CalendarClientPool: one in-memory calendar shared by every thread"""
+
+    def __init__(self, latency: Latency):
+        self._service = types.SimpleNamespace(events=lambda: self.events)
+        self.events = _FakeEvents(latency)
+
+    def service(self):
+        return self._service
+
+
+class _FakeBatch:
+    def __init__(self, latency: Latency, callback, failing_parts: dict):
+        self.latency = latency
+        self.callback = callback
+        self.failing_parts = failing_parts
+        self.requests = []
+
+    def add(self, request, request_id=None):
+        self.requests.append((request_id, request))
+
+    def execute(self):
+        # One round trip for the whole batch
+        self.latency.sleep("gmail")
+        for request_id, request in self.requests:
+            if self.failing_parts.get(request_id):
+                # A part can fail inside a batch that succeeds as a whole
+                self.failing_parts[request_id] -= 1
+                self.callback(request_id, None, HttpError(types.SimpleNamespace(status=429, reason="Too Many Requests"),
+                                                          b'{"error": {"code": 429, "message": "Rate Limit Exceeded"}}'))
+                continue
+            self.callback(request_id, request.response(), None)
+
+
+class _FakeMessages:
+    """Message m<n> was added at history id n + 1; `read` holds the ids marked read"""
+
+    def __init__(self, latency: Latency, emails: list[str]):
+        self.latency = latency
+        self.emails = emails
+        self.read = set()
+        self.fetched = {"full": 0, "metadata": 0}
+        self._lock = threading.Lock()
+
+    def labels(self, message_id: str) -> list[str]:
+        return ["INBOX"] if message_id in self.read else ["INBOX", "UNREAD"]
+
+    def list(self, userId, q=None, maxResults=100, pageToken=None, **kwargs):
+        numbers = [number for number in range(len(self.emails))
+                   if not (q and "is:unread" in q and f"m{number}" in self.read)]
+        start = int(pageToken or 0)
+        end = min(len(numbers), start + maxResults)
+        result = {"messages": [{"id": f"m{number}", "threadId": f"t{number}"} for number in numbers[start:end]]}
+        if end < len(numbers):
+            result["nextPageToken"] = str(end)
+        return _Request(self.latency, "gmail", result)
+
+    def batchModify(self, userId, body):
+        def modify():
+            if "UNREAD" in body.get("removeLabelIds", []):
+                self.read.update(body["ids"])
+            return ""
+        return _Request(self.latency, "gmail", modify)
+
+    def get(self, userId, id, format="full", **kwargs):
+        with self._lock:
+            self.fetched[format] += 1
+        body = self.emails[int(id[1:])]
+        headers = [{"name": "Subject", "value": body[:40]}, {"name": "From", "value": "sender@example.com"}]
+        message = {"id": id, "threadId": f"t{id[1:]}", "labelIds": self.labels(id), "historyId": str(int(id[1:]) + 1)}
+        if format == "metadata":
+            return _Request(self.latency, "gmail", {**message, "payload": {"mimeType": "multipart/alternative",
+                                                                          "headers": headers}})
+        data = base64.urlsafe_b64encode(body.encode("utf-8")).decode("ascii")
+        return _Request(self.latency, "gmail", {
+            **message,
+            "payload": {
+                "mimeType": "multipart/alternative",
+                "headers": headers,
+                "parts": [{"mimeType": "text/plain", "body": {"data": data, "size": len(body)}}],
+            },
+        })
+
+
+class _FakeHistory:
+    def __init__(self, messages: _FakeMessages, page_size: int = 100):
+        self.messages = messages
+        self.page_size = page_size
+        # History ids at or below this one have expired and answer 404
+        self.oldest = 0
+
+    def list(self, userId, startHistoryId, historyTypes=None, labelId=None, maxResults=100, pageToken=None, **kwargs):
+        def page():
+            start = int(startHistoryId)
+            if start < self.oldest:
+                raise HttpError(types.SimpleNamespace(status=404, reason="Not Found"),
+                                b'{"error": {"code": 404, "message": "Requested entity was not found."}}')
+            numbers = list(range(start, len(self.messages.emails)))
+            offset = int(pageToken or 0)
+            chunk = numbers[offset:offset + min(maxResults, self.page_size)]
+            result = {
+                "history": [
+                    {"id": str(number + 1), "messagesAdded": [{"message": {
+                        "id": f"m{number}", "threadId": f"t{number}", "labelIds": ["INBOX", "UNREAD"]}}]}
+                    for number in chunk
+                ],
+                "historyId": str(len(self.messages.emails)),
+            }
+            if offset + len(chunk) < len(numbers):
+                result["nextPageToken"] = str(offset + len(chunk))
+            return result
+        return _Request(self.messages.latency, "gmail", page)
+
+
+class FakeGmailService:
+    """Serves `emails` as unread messages m0..mN through messages().list/get/batchModify, history().list,
+    getProfile and batch requests; `add` delivers a new message, `fail_in_batch` makes batch parts answer 429"""
+
+    def __init__(self, latency: Latency, emails: list[str]):
+        self.latency = latency
+        self._messages = _FakeMessages(latency, list(emails))
+        self._history = _FakeHistory(self._messages)
+        self._failing_parts = {}
+
+    def add(self, email: str) -> str:
+        self._messages.emails.append(email)
+        return f"m{len(self._messages.emails) - 1}"
+
+    def fail_in_batch(self, message_id: str, times: int = 1):
+        """The next `times` batch gets of `message_id` fail with 429; single gets still succeed"""
+        self._failing_parts[message_id] = times
+
+    def expire_history(self):
+        """Make every history id issued so far too old for history().list"""
+        self._history.oldest = len(self._messages.emails) + 1
+
+    def users(self):
+        return types.SimpleNamespace(
+            messages=lambda: self._messages,
+            history=lambda: self._history,
+            getProfile=lambda userId: _Request(self.latency, "gmail", lambda: {
+                "emailAddress": "me@example.com", "historyId": str(len(self._messages.emails)),
+            }),
+        )
+
+    def new_batch_http_request(self, callback=None):
+        return _FakeBatch(self.latency, callback, self._failing_parts)
@@ -0,0 +1,297 @@
+"""Offline replay: recorded inputs through the agents, against fake OpenAI, Calendar and Gmail backends.
+
+Inputs are JSONL files; each line contributes its "text", "body" or "title" field
+(so the calendar corpus, captured emails and requests.jsonl all work). Scenarios:
+
+    calendar   calendar-modifier.py process_calendar_request, one input at a time
+    async      calendar-modifier.py process_many_async, every input at once under BackendLimits
+    worker     CalendarWorker.process_pending over the inputs served as unread Gmail messages
+    assistant  personal-assistant.py process_calendar_request
+    blog       Blogger.py BlogOrchestrator.write_blog, one topic at a time
+
+The backends are the deterministic fakes in benchmarks/fakes.py with the injected
+latency given on the command line. Everything runs in a throwaway working
+directory (Chroma, event index, journal, caches), with the LLM cache off unless
+--llm-cache is given and the scheduler's rate limits lifted unless --rate-limits is. For each scenario it prints throughput, p50/p95/p99 latency,
+the LLM calls made, the share of prompt tokens the fake's prefix cache served and
+the peak Python heap (tracemalloc, off with --no-memory).
+
+Run from the project root:
+    python -m benchmarks.replay
+    python -m benchmarks.replay --scenario worker --pipeline --llm-ms 400 --calendar-ms 150 --repeat 3
+    python -m benchmarks.replay --scenario calendar --scenario async --llm-ms 400 --calendar-ms 150
+    python -m benchmarks.replay --scenario blog --llm-ms 200 --json replay.json
+"""
+import argparse
+import asyncio
+import importlib.util
+import json
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.fakes import FakeCalendarPool, FakeGmailService, FakeOpenAI, Latency
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES = os.path.join(PROJECT_ROOT, "benchmarks", "fixtures")
+DEFAULT_INPUTS = os.path.join(FIXTURES, "calendar_corpus.jsonl")
+DEFAULT_TOPICS = os.path.join(FIXTURES, "blog_topics.jsonl")
+SCENARIOS = ["calendar", "async", "worker", "assistant", "blog"]
+
+
+def load_texts(path: str, keys=("text", "body", "title", "topic")) -> list[str]:
+    texts = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            text = next((record[key] for key in keys if record.get(key)), None)
+            if text:
+                texts.append(text)
+    return texts
+
+
+def load_script(filename: str, alias: str):
+    """Import one of the project's scripts (some have hyphenated names) as a module"""
+    spec = importlib.util.spec_from_file_location(alias, os.path.join(PROJECT_ROOT, filename))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[alias] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class ErrorCounter(logging.Handler):
+    def __init__(self):
+        super().__init__(level=logging.ERROR)
+        self.count = 0
+
+    def emit(self, record):
+        self.count += 1
+
+
+class Replay:
+    """Loads the agents once, swaps their clients for fakes and times each scenario"""
+
+    def __init__(self, latency: Latency, args):
+        self.args = args
+        self.latency = latency
+        self.llm = FakeOpenAI(latency)
+        self.async_llm = FakeOpenAI(latency, is_async=True)
+        self._modules = {}
+
+    def module(self, name: str):
+        if name not in self._modules:
+            if name == "calendar":
+                module = load_script("calendar-modifier.py", "calendar_modifier")
+                module.client = self.llm
+                module.async_client = self.async_llm
+                module.calendar_pool = FakeCalendarPool(self.latency)
+            elif name == "assistant":
+                module = load_script("personal-assistant.py", "personal_assistant")
+                module.client = self.llm
+            else:
+                module = load_script("Blogger.py", "Blogger")
+                module.client = self.llm
+            self._modules[name] = module
+        return self._modules[name]
+
+    def timed(self, call, items: list) -> tuple[list[float], int]:
+        latencies, errors = [], 0
+        for item in items:
+            started = time.perf_counter()
+            try:
+                call(item)
+            except Exception as e:
+                errors += 1
+                logging.getLogger(__name__).warning(f"Replay of {str(item)[:60]!r} failed: {e}")
+            latencies.append(time.perf_counter() - started)
+        return latencies, errors
+
+    def calendar(self, texts: list[str]):
+        calendar_modifier = self.module("calendar")
+        result = self.timed(lambda text: calendar_modifier.process_calendar_request(text, fused=self.args.fused), texts)
+        calendar_modifier.event_writer.flush()
+        return result
+
+    def calendar_async(self, texts: list[str]):
+        calendar_modifier = self.module("calendar")
+
+        async def timed_one(text: str, limits) -> tuple[float, bool]:
+            started = time.perf_counter()
+            try:
+                await calendar_modifier.process_calendar_request_async(text, limits, fused=self.args.fused)
+                failed = False
+            except Exception as e:
+                failed = True
+                logging.getLogger(__name__).warning(f"Replay of {text[:60]!r} failed: {e}")
+            return time.perf_counter() - started, failed
+
+        async def run_all():
+            # Semaphores bind to the running loop, so the limits are created inside it
+            limits = calendar_modifier.BackendLimits(llm=self.args.async_llm_limit)
+            return await asyncio.gather(*(timed_one(text, limits) for text in texts))
+
+        results = asyncio.run(run_all())
+        calendar_modifier.event_writer.flush()
+        return [latency for latency, _ in results], sum(failed for _, failed in results)
+
+    def worker(self, texts: list[str]):
+        import gmail_reader
+        from email_ledger import EmailLedger
+
+        calendar_modifier = self.module("calendar")
+        gmail_reader._service = FakeGmailService(self.latency, texts)
+        # A fresh ledger without content dedup, so --repeat still replays every copy
+        ledger = EmailLedger(":memory:", dedup_window=0)
+        worker = calendar_modifier.CalendarWorker(fused=self.args.fused, pipelined=self.args.pipeline, ledger=ledger,
+                                                  incremental=self.args.incremental)
+        # The worker logs failed emails instead of raising, so count those records
+        errors = ErrorCounter()
+        logging.getLogger().addHandler(errors)
+        try:
+            worker.process_pending()
+        finally:
+            logging.getLogger().removeHandler(errors)
+        calendar_modifier.event_writer.flush()
+        # Pipelined runs only time the emails that reach the last stage
+        return worker.latencies, errors.count
+
+    def assistant(self, texts: list[str]):
+        personal_assistant = self.module("assistant")
+        return self.timed(personal_assistant.process_calendar_request, texts)
+
+    def blog(self, topics: list[str]):
+        from artifact_store import ArtifactStore
+
+        blogger = self.module("blog")
+
+        def write(topic: str):
+            # A fresh in-memory store per post, so repeated topics are not served from earlier runs
+            orchestrator = blogger.BlogOrchestrator(max_in_flight=self.args.blog_workers, artifacts=ArtifactStore(None))
+            orchestrator.write_blog(topic=topic, target_length=self.args.target_length)
+
+        return self.timed(write, topics)
+
+    def run(self, scenario: str, items: list[str]) -> dict:
+        if not self.args.no_memory:
+            tracemalloc.start()
+            tracemalloc.reset_peak()
+        from llm_cache import token_usage
+
+        calls_before = self.llm.calls + self.async_llm.calls
+        tokens_before = token_usage.summary()["total"]
+        started = time.perf_counter()
+        latencies, errors = getattr(self, {"async": "calendar_async"}.get(scenario, scenario))(items)
+        elapsed = time.perf_counter() - started
+        tokens = {key: value - tokens_before[key] for key, value in token_usage.summary()["total"].items()
+                  if key in ("prompt_tokens", "cached_tokens")}
+        peak = tracemalloc.get_traced_memory()[1] if tracemalloc.is_tracing() else None
+        tracemalloc.stop()
+
+        latencies.sort()
+        return {
+            "scenario": scenario,
+            "requests": len(items),
+            "errors": errors,
+            "elapsed_s": elapsed,
+            "throughput_per_s": len(items) / elapsed if elapsed else 0.0,
+            "p50_ms": statistics.median(latencies) * 1000 if latencies else None,
+            "p95_ms": percentile(latencies, 0.95) * 1000 if latencies else None,
+            "p99_ms": percentile(latencies, 0.99) * 1000 if latencies else None,
+            "llm_calls": self.llm.calls + self.async_llm.calls - calls_before,
+            "prompt_tokens": tokens["prompt_tokens"],
+            "cached_share": tokens["cached_tokens"] / tokens["prompt_tokens"] if tokens["prompt_tokens"] else None,
+            "peak_memory_mb": peak / 2**20 if peak is not None else None,
+        }
+
+
+def report(results: list[dict]):
+    print(
+        f"{'scenario':>10} {'requests':>9} {'errors':>7} {'per s':>8} {'p50 ms':>9} {'p95 ms':>9} "
+        f"{'p99 ms':>9} {'llm calls':>10} {'cached':>7} {'peak MB':>8}"
+    )
+    for result in results:
+        latency = [f"{result[key]:>9.1f}" if result[key] is not None else f"{'-':>9}" for key in ("p50_ms", "p95_ms", "p99_ms")]
+        memory = f"{result['peak_memory_mb']:>8.1f}" if result["peak_memory_mb"] is not None else f"{'-':>8}"
+        cached = f"{result['cached_share']:>7.0%}" if result["cached_share"] is not None else f"{'-':>7}"
+        print(
+            f"{result['scenario']:>10} {result['requests']:>9} {result['errors']:>7} "
+            f"{result['throughput_per_s']:>8.2f} {' '.join(latency)} {result['llm_calls']:>10} {cached} {memory}"
+        )
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--scenario", choices=SCENARIOS, action="append",
+                            help="Scenario to run; repeat for several (default: all)")
+    arg_parser.add_argument("--inputs", default=DEFAULT_INPUTS, help="JSONL of requests/emails")
+    arg_parser.add_argument("--topics", default=DEFAULT_TOPICS, help="JSONL of blog topics")
+    arg_parser.add_argument("--repeat", type=int, default=1, help="Replay the inputs this many times")
+    arg_parser.add_argument("--limit", type=int, help="Use only the first N inputs")
+    arg_parser.add_argument("--llm-ms", type=float, default=0.0)
+    arg_parser.add_argument("--calendar-ms", type=float, default=0.0)
+    arg_parser.add_argument("--gmail-ms", type=float, default=0.0)
+    arg_parser.add_argument("--jitter", type=float, default=0.0, help="Latency jitter as a fraction, e.g. 0.2")
+    arg_parser.add_argument("--seed", type=int, default=0)
+    arg_parser.add_argument("--fused", action="store_true", help="Route and extract in one LLM call")
+    arg_parser.add_argument("--pipeline", action="store_true", help="Run the worker scenario pipelined")
+    arg_parser.add_argument("--incremental", action="store_true", help="Run the worker scenario with history-based sync")
+    arg_parser.add_argument("--async-llm-limit", type=int, default=8, help="LLM calls in flight in the async scenario")
+    arg_parser.add_argument("--blog-workers", type=int, default=4)
+    arg_parser.add_argument("--target-length", type=int, default=1000)
+    arg_parser.add_argument("--llm-cache", action="store_true", help="Keep the LLM response cache on")
+    arg_parser.add_argument("--rate-limits", action="store_true", help="Keep the scheduler's production rate limits")
+    arg_parser.add_argument("--no-memory", action="store_true", help="Skip tracemalloc (lower overhead)")
+    arg_parser.add_argument("--json", metavar="PATH", help="Also write the results to PATH")
+    arg_parser.add_argument("--log-level", default="ERROR")
+    args = arg_parser.parse_args()
+
+    inputs = load_texts(args.inputs)[:args.limit] * args.repeat
+    topics = load_texts(args.topics)[:args.limit] * args.repeat
+    json_path = os.path.abspath(args.json) if args.json else None
+
+    # The agents keep Chroma, the index, the journal and the caches relative to the working directory
+    workdir = tempfile.TemporaryDirectory(prefix="replay-")
+    sys.path.insert(0, PROJECT_ROOT)
+    os.chdir(workdir.name)
+    # The fakes replace the clients, but the scripts build real ones on import
+    os.environ["OPENAI_API_KEY"] = os.environ.get("OPENAI_API_KEY") or "replay"
+    os.environ.setdefault("EVENTDB_EMBEDDING", "hashing")
+    os.environ["BLOG_ARTIFACT_PATH"] = os.path.join(workdir.name, "artifacts.sqlite3")
+    os.environ["LLM_CACHE_PATH"] = os.path.join(workdir.name, "llm_cache.sqlite3")
+    if not args.llm_cache:
+        os.environ["LLM_CACHE_DISABLED"] = "1"
+    if not args.rate_limits:
+        for backend in ("OPENROUTER", "CALENDAR", "GMAIL"):
+            os.environ[f"RATE_LIMIT_{backend}"] = "inf"
+
+    latency = Latency(args.llm_ms, args.calendar_ms, args.gmail_ms, jitter=args.jitter, seed=args.seed)
+    replay = Replay(latency, args)
+    results = []
+    for scenario in args.scenario or SCENARIOS:
+        # Importing the agents configures logging, so quieten it once they are loaded
+        replay.module({"worker": "calendar", "async": "calendar"}.get(scenario, scenario))
+        logging.getLogger().setLevel(args.log_level)
+        results.append(replay.run(scenario, topics if scenario == "blog" else inputs))
+
+    if "calendar" in replay._modules:
+        replay._modules["calendar"].event_writer.close()
+    report(results)
+    if json_path:
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    os.chdir(PROJECT_ROOT)
+    workdir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
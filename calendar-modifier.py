@@ -1,20 +1,40 @@
-from typing import Optional, Literal
+import time
+
+# Measured from the first import so startup cost can be reported separately from per-request latency
+STARTUP_BEGAN = time.perf_counter()
+
+from typing import Callable, Iterator, Optional, Literal, Union
 from pydantic import BaseModel, Field
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI
 import os
+import argparse
+import asyncio
+import signal
+import statistics
+import threading
 import logging
 from dotenv import load_dotenv
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
 from datetime import datetime, timedelta
 from dateutil import parser
-import re
-import chromadb
-from database_retrieval import add_to_db, update_to_db
-from gmail_reader import readEmails
+from calendar_client import CalendarClientPool
+from database_retrieval import update_to_db, event_metadata, start_metadata, find_event_id, find_pending_event_id, has_event
+import database_retrieval
+from gmail_reader import HistorySync, get_gmail_service, iter_unread_emails, mark_read
+from googleapiclient.errors import HttpError
+from email_ledger import DONE, DUPLICATE, FAILED, IGNORED, EmailLedger, content_hash, is_forward
+from llm_cache import cached_parse, cached_parse_async, token_usage
+import prompts
+from prompts import build_messages, date_context
+from temporal import TemporalResolution, resolve
+from write_behind import open_write_behind
+from pipeline import Pipeline, Stage
+from scheduler import INTERACTIVE, priority, scheduler
 import tracemalloc
-
-tracemalloc.start()
+import json
+import base64
+import hashlib
+import tracing
+from tracing import span
 
 load_dotenv()
 # Set up logging configuration
@@ -30,13 +50,25 @@ SCOPES = ['https://www.googleapis.com/auth/calendar']
 SERVICE_ACCOUNT_FILE = '/Users/mehrad/Programming/agents/corded-cable-431717-g0-0ad41cef68fe.json'
 CALENDAR_ID = 'msoltani2001@gmail.com'
 
-# LLM model configuration
+# Credentials and built services are reused across events instead of being rebuilt per call
+calendar_pool = CalendarClientPool(SERVICE_ACCOUNT_FILE, SCOPES)
+
+# LLM model configuration; retries are left to the shared scheduler
 client = OpenAI(base_url="https://openrouter.ai/api/v1",
-                api_key=os.environ.get("OPENAI_API_KEY"),)
+                api_key=os.environ.get("OPENAI_API_KEY"), max_retries=0)
+async_client = AsyncOpenAI(base_url="https://openrouter.ai/api/v1",
+                           api_key=os.environ.get("OPENAI_API_KEY"), max_retries=0)
 model = "gpt-4o"
 
-client_db = chromadb.PersistentClient(path="eventdb")
-database_path = "eventdb/df_db.csv"
+# Requests routed below this confidence are dropped (two-step) or re-routed (fused)
+CONFIDENCE_THRESHOLD = 0.7
+# Longest a modification waits for queued event records to reach the database
+FLUSH_TIMEOUT = 5.0
+
+database_path = "eventdb/event_index.sqlite3"
+
+# New event records are journaled and written to Chroma in the background
+event_writer = open_write_behind(database_path)
 
 # --------------------------------------------------------------
 # Step 1: Define the data models for routing and responses
@@ -82,6 +114,57 @@ class ModifyEventDetails(BaseModel):
     start_time: str = Field(description="The new start time of the event")
     participants_to_add: list[str] = Field(description="New participants to add")
     participants_to_remove: list[str] = Field(description="Participants to remove")
+    original_date: Optional[str] = Field(
+        description="Date of the event before the change (ISO 8601), if the request mentions it"
+    )
+
+
+class NewEventSubject(BaseModel):
+    """What is left to extract for a new event once its date, time and duration are resolved locally"""
+
+    name: str = Field(description="Name of the event")
+    participants: list[str] = Field(description="List of participants")
+
+
+class ModifyEventSubject(BaseModel):
+    """What is left to extract for a modification once the new date, time and duration are resolved locally"""
+
+    event_identifier: str = Field(
+        description="Description to identify the existing event"
+    )
+    participants_to_add: list[str] = Field(description="New participants to add")
+    participants_to_remove: list[str] = Field(description="Participants to remove")
+
+
+class NewEventRequest(BaseModel):
+    """Fused call variant: a new event together with its details"""
+
+    request_type: Literal["new_event"]
+    details: NewEventDetails
+
+
+class ModifyEventRequest(BaseModel):
+    """Fused call variant: a modification together with its details"""
+
+    request_type: Literal["modify_event"]
+    details: ModifyEventDetails
+
+
+class OtherRequest(BaseModel):
+    """Fused call variant: not a calendar request"""
+
+    request_type: Literal["other"]
+
+
+class FusedCalendarRequest(BaseModel):
+    """Single LLM call: route the request and extract its details at once"""
+
+    confidence_score: float = Field(description="Confidence score between 0 and 1")
+    description: str = Field(description="Cleaned description of the request")
+    # Tagged by request_type; a plain Union keeps the schema to anyOf, which structured outputs accept
+    request: Union[NewEventRequest, ModifyEventRequest, OtherRequest] = Field(
+        description="The request type and, for calendar requests, the extracted details"
+    )
 
 
 class CalendarResponse(BaseModel):
@@ -92,139 +175,342 @@ class CalendarResponse(BaseModel):
     calendar_link: Optional[str] = Field(description="Calendar link if applicable")
 
 
+class CalendarJob(BaseModel):
+    """A request as it moves through routing, extraction and the Calendar/database step"""
+
+    text: str = Field(description="Raw request text")
+    email_id: Optional[str] = Field(default=None, description="Gmail message the request came from")
+    request_type: Optional[Literal["new_event", "modify_event"]] = Field(default=None, description="Routed request type")
+    description: Optional[str] = Field(default=None, description="Cleaned description of the request")
+    details: Optional[Union[NewEventDetails, ModifyEventDetails]] = Field(default=None, description="Extracted details")
+    response: Optional[CalendarResponse] = Field(default=None, description="Outcome once applied")
+    started: float = Field(default_factory=time.perf_counter, description="perf_counter() when the job was created")
+
+
 # --------------------------------------------------------------
 # Step 2: Define the routing and processing functions
 # --------------------------------------------------------------
 
 
+def router_messages(user_input: str) -> list[dict]:
+    """Prompt for the router LLM call"""
+    return build_messages(prompts.ROUTER, user_input)
+
+
+def new_event_messages(description: str, today: Optional[datetime] = None) -> list[dict]:
+    """Prompt for extracting the details of a new event"""
+    return build_messages(prompts.NEW_EVENT, description, date_context(today))
+
+
+def modify_event_messages(description: str) -> list[dict]:
+    """Prompt for extracting the details of an event modification"""
+    return build_messages(prompts.MODIFY_EVENT, description, date_context())
+
+
+def new_event_subject_messages(description: str) -> list[dict]:
+    """Prompt for a new event whose timing is already resolved; no date context, so it is not day-scoped"""
+    return build_messages(prompts.NEW_EVENT_SUBJECT, description)
+
+
+def modify_event_subject_messages(description: str) -> list[dict]:
+    """Prompt for a modification whose new timing is already resolved"""
+    return build_messages(prompts.MODIFY_EVENT_SUBJECT, description)
+
+
+def fused_messages(user_input: str) -> list[dict]:
+    """Prompt for routing and extracting in a single call"""
+    return build_messages(prompts.FUSED, user_input, date_context())
+
+
+def event_window(details) -> tuple[datetime, datetime]:
+    """Parse the start and end time out of extracted event details"""
+    combined_datetime_str = f"{details.date} {details.start_time}" if details.date else details.start_time
+    start_time = parser.parse(combined_datetime_str)
+    end_time = start_time + timedelta(minutes=details.duration_minutes)
+    return start_time, end_time
+
+
+def event_body(summary: str, start_time: datetime, end_time: datetime, time_zone: str = 'America/Toronto') -> dict:
+    """Get the event details in the JSON format to use it as the body of the event"""
+    return {
+        'summary': summary,
+        'start': {
+            'dateTime': start_time.isoformat(),
+            'timeZone': time_zone,
+        },
+        'end': {
+            'dateTime': end_time.isoformat(),
+            'timeZone': time_zone,
+        },
+    }
+
+
+def resolved_new_event(subject: NewEventSubject, timing: TemporalResolution) -> NewEventDetails:
+    return NewEventDetails(
+        name=subject.name,
+        date=timing.date,
+        duration_minutes=timing.duration_minutes,
+        start_time=timing.start_time,
+        participants=subject.participants,
+    )
+
+
+def resolved_modify_event(subject: ModifyEventSubject, timing: TemporalResolution) -> ModifyEventDetails:
+    changes = [Change(field="date", new_value=timing.date), Change(field="start_time", new_value=timing.start_time)]
+    if not timing.duration_defaulted:
+        changes.append(Change(field="duration_minutes", new_value=str(timing.duration_minutes)))
+    return ModifyEventDetails(
+        event_identifier=subject.event_identifier,
+        changes=changes,
+        date=timing.date,
+        duration_minutes=timing.duration_minutes,
+        start_time=timing.start_time,
+        participants_to_add=subject.participants_to_add,
+        participants_to_remove=subject.participants_to_remove,
+        # A single date in the request is the new one
+        original_date=None,
+    )
+
+
+def modify_timing(description: str) -> Optional[TemporalResolution]:
+    """Local timing of a modification, if the fast path may use it"""
+    timing = resolve(description)
+    # For modifications "next" is relative to the event's original date, which only the LLM path knows
+    if not timing.complete or timing.next_weekday:
+        return None
+    return timing
+
+
+def extract_new_event(description: str) -> NewEventDetails:
+    """Extract new event details, resolving the timing locally when the request spells it out"""
+    timing = resolve(description)
+    if not timing.complete:
+        return cached_parse(
+            client,
+            model=model,
+            messages=new_event_messages(description),
+            response_format=NewEventDetails,
+            day_scoped=True,
+        )
+    logger.info(f"Timing resolved locally: {timing.date} {timing.start_time} for {timing.duration_minutes} min")
+    subject = cached_parse(
+        client,
+        model=model,
+        messages=new_event_subject_messages(description),
+        response_format=NewEventSubject,
+    )
+    return resolved_new_event(subject, timing)
+
+
+def extract_modify_event(description: str) -> ModifyEventDetails:
+    """Extract modification details, resolving the new timing locally when the request spells it out"""
+    timing = modify_timing(description)
+    if timing is None:
+        return cached_parse(
+            client,
+            model=model,
+            messages=modify_event_messages(description),
+            response_format=ModifyEventDetails,
+            day_scoped=True,
+        )
+    logger.info(f"Timing resolved locally: {timing.date} {timing.start_time} for {timing.duration_minutes} min")
+    subject = cached_parse(
+        client,
+        model=model,
+        messages=modify_event_subject_messages(description),
+        response_format=ModifyEventSubject,
+    )
+    return resolved_modify_event(subject, timing)
+
+
 def route_calendar_request(user_input: str) -> CalendarRequestType:
     """Router LLM call to determine the type of calendar request"""
     logger.info("Routing calendar request")
 
-    completion = client.beta.chat.completions.parse(
+    result = cached_parse(
+        client,
         model=model,
-        messages=[
-            {
-                "role": "system",
-                "content": "Determine if this is a request to create a new calendar event or modify an existing one.",
-            },
-            {"role": "user", "content": user_input},
-        ],
+        messages=router_messages(user_input),
         response_format=CalendarRequestType,
     )
-    result = completion.choices[0].message.parsed
     logger.info(
         f"Request routed as: {result.request_type} with confidence: {result.confidence_score}"
     )
     return result
 
 
-def calendar_create_event(start_time, end_time, description):
-    """Create an event in Google Calendar"""
-    # Setting up the connection to the calendar
-    credentials = service_account.Credentials.from_service_account_file(SERVICE_ACCOUNT_FILE, scopes=SCOPES)
-    service = build('calendar', 'v3', credentials=credentials)
+def route_and_extract(user_input: str) -> FusedCalendarRequest:
+    """Fused LLM call that routes the request and extracts its details"""
+    logger.info("Routing and extracting calendar request in one call")
 
-    # Get the event details in the JSON format to use it as the body of the event
-    event = {
-        'summary': description,
-        'start': {
-            'dateTime': start_time.isoformat(),
-            'timeZone': 'America/Toronto',
-        },
-        'end': {
-            'dateTime': end_time.isoformat(),
-            'timeZone': 'America/Toronto',
-        },
-    }
+    result = cached_parse(
+        client,
+        model=model,
+        messages=fused_messages(user_input),
+        response_format=FusedCalendarRequest,
+        day_scoped=True,
+    )
+    logger.info(
+        f"Request routed as: {result.request.request_type} with confidence: {result.confidence_score}"
+    )
+    return result
+
+
+def calendar_event_id(idempotency_key: str) -> str:
+    """Deterministic Calendar event id for a request: base32hex (a-v, 0-9) as the API requires"""
+    digest = hashlib.sha256(idempotency_key.encode("utf-8")).digest()[:20]
+    return base64.b32hexencode(digest).decode("ascii").lower()
+
+
+def calendar_create_event(start_time, end_time, description, idempotency_key: Optional[str] = None):
+    """Create an event in Google Calendar
+
+    With an `idempotency_key` (e.g. the Gmail message id) the event gets an id derived
+    from it, so creating it again returns the existing event, marked `"existing": True`,
+    instead of a duplicate.
+    """
+    # Reuse the pooled connection to the calendar
+    service = calendar_pool.service()
 
     # Create the event in the calendar
-    created_event = service.events().insert(calendarId=CALENDAR_ID, body=event).execute()
+    body = event_body(description, start_time, end_time)
+    if idempotency_key is not None:
+        body["id"] = calendar_event_id(idempotency_key)
+    with span("google.calendar.events.insert", bytes=len(json.dumps(body))):
+        try:
+            # Without a fixed id, an insert that failed server-side may have created the event,
+            # so it is only retried when throttled
+            created_event = scheduler.call(
+                "calendar", service.events().insert(calendarId=CALENDAR_ID, body=body).execute,
+                idempotent=idempotency_key is not None,
+            )
+        except HttpError as e:
+            if idempotency_key is None or e.resp.status != 409:
+                raise
+            logger.info(f"Event {body['id']} already exists, reusing it")
+            existing_event = scheduler.call(
+                "calendar", service.events().get(calendarId=CALENDAR_ID, eventId=body["id"]).execute
+            )
+            return {**existing_event, "existing": True}
     logger.info(f"Created event: {created_event.get('htmlLink')}")
 
     return created_event
 
-def calendar_modify_event(summary: str = None, start_time: datetime = None, end_time: datetime = None, time_zone: str = 'America/Toronto'):
-    "Modify event in the Google calendar"
-    # Setting up the connection to the calendar
-    credentials = service_account.Credentials.from_service_account_file(SERVICE_ACCOUNT_FILE, scopes=SCOPES)
-    service = build('calendar', 'v3', credentials=credentials)
 
-    # Get the updated event information in the JSON format to use as the body of the event
-    event_updates = {
-        'summary': summary,
-        'start': {
-            'dateTime': start_time.isoformat(),
-            'timeZone': 'America/Toronto',
-        },
-        'end': {
-            'dateTime': end_time.isoformat(),
-            'timeZone': 'America/Toronto',
-        },
-    }
+def find_calendar_event_id(summary: str, original_date: Optional[str] = None, participants: Optional[list[str]] = None) -> Optional[str]:
+    """Look up the Calendar_ID of the stored event `summary` refers to
 
-    try:
-        # Extracting the event_id from Database
-        collection = client_db.get_or_create_collection(name="eventdb")
-        similar_record = collection.query(
-            query_texts=summary,
-            n_results=1
+    Candidates are narrowed to the original day when it is known, otherwise to events
+    that have not ended yet, and to those that include `participants`.
+    """
+    if original_date:
+        start_after = datetime.combine(parser.parse(original_date).date(), datetime.min.time())
+        start_before = start_after + timedelta(days=1)
+    else:
+        start_after, start_before = datetime.now() - timedelta(days=1), None
+
+    # Read-your-writes: records of just-created events may still be queued. If the
+    # queue cannot drain in time (e.g. Chroma keeps failing), look through it instead.
+    if not event_writer.flush(timeout=FLUSH_TIMEOUT):
+        logger.warning(f"Event records still queued after {FLUSH_TIMEOUT}s, searching the queue as well")
+        event_id = find_pending_event_id(
+            event_writer.pending_records(), summary, start_after=start_after, start_before=start_before,
+            participants=participants,
         )
-        match = re.search(r"Calendar_ID=([a-zA-Z0-9]+)", similar_record["documents"][0][0])
-        if match:
-            event_id = match.group(1)
-            logger.info(f"Found the event id={event_id} from the database")
-        else:
-            logger.info("No Calendar_ID found.")
+        if event_id:
+            logger.info(f"Found the event id={event_id} among the queued records")
+            return event_id
 
-        # Updating the event using event id in the Google calendar
-        updated_event = service.events().update(calendarId=CALENDAR_ID, eventId=event_id, body=event_updates).execute()
-        logger.info(f"Modified event: {updated_event.get('htmlLink')}")
+    event_id = find_event_id(summary, start_after=start_after, start_before=start_before, participants=participants)
+    if event_id:
+        logger.info(f"Found the event id={event_id} from the database")
+    else:
+        logger.info("No Calendar_ID found.")
+    return event_id
+
+
+def calendar_update_event(event_id: str, event_updates: dict):
+    """Apply `event_updates` to an existing Google Calendar event"""
+    # Reuse the pooled connection to the calendar
+    service = calendar_pool.service()
+
+    # Updating the event using event id in the Google calendar
+    with span("google.calendar.events.update", bytes=len(json.dumps(event_updates))):
+        updated_event = scheduler.call(
+            "calendar", service.events().update(calendarId=CALENDAR_ID, eventId=event_id, body=event_updates).execute
+        )
+    logger.info(f"Modified event: {updated_event.get('htmlLink')}")
+    return updated_event
 
-        return updated_event
+
+def calendar_modify_event(summary: str = None, start_time: datetime = None, end_time: datetime = None, time_zone: str = 'America/Toronto',
+                          original_date: Optional[str] = None, participants: Optional[list[str]] = None):
+    "Modify event in the Google calendar"
+    try:
+        # Extracting the event_id from Database
+        event_id = find_calendar_event_id(summary, original_date, participants)
+        if event_id is None:
+            return None
+        return calendar_update_event(event_id, event_body(summary, start_time, end_time, time_zone))
 
     except Exception as e:
         logger.error(f"Failed to modify event: {e}")
         return None
 
 
-def handle_new_event(description: str) -> CalendarResponse:
-    """Process a new event request and create it in Google Calendar"""
+def new_event_message(details: NewEventDetails, created_event: dict, start_time: datetime) -> str:
+    """Record of a created event; this is the text stored in the database"""
+    return f"Created new event with the name '{details.name}' with Calendar_ID={created_event['id']} starting at {start_time.strftime('%Y-%m-%d %H:%M')} with participant(s) {', '.join(details.participants)}"
+
+
+def modify_event_message(details: ModifyEventDetails, modified_event: dict, start_time: datetime) -> str:
+    """Record of a modified event; this replaces the stored record in the database"""
+    return f"Modified existing event with the name '{details.event_identifier}' with the new Calendar_ID={modified_event['id']} starting at {start_time}"
+
+
+def queue_event_record(message: str, created_event: dict, details: NewEventDetails, start_time: datetime):
+    """Queue the database record of a created event, unless an earlier attempt already stored it
+
+    An event that already existed may come from a run that crashed, or an insert
+    that was retried, after the Calendar write but before the record was queued.
+    So it is only skipped when its record is in the collection or still queued.
+    """
+    calendar_id = created_event["id"]
+    if created_event.get("existing"):
+        queued = any(metadata and metadata.get("calendar_id") == calendar_id
+                     for _, metadata in event_writer.pending_records())
+        if queued or has_event(calendar_id):
+            logger.info(f"Event {calendar_id} is already in the database")
+            return
+    event_writer.submit(message, metadata=event_metadata(calendar_id, details.name, start_time, details.participants))
+    logger.info("The event is queued for the database!")
+
+
+def handle_new_event(description: str, details: Optional[NewEventDetails] = None,
+                     idempotency_key: Optional[str] = None) -> CalendarResponse:
+    """Process a new event request and create it in Google Calendar
+
+    Requests with the same `idempotency_key` create the Calendar event only once.
+    """
     logger.info("Processing new event request")
-    today = datetime.now()
-    date_context = f"Today is {today.strftime('%A, %B %d, %Y')}."
 
     try:
-        # Step 1: Extract event details using OpenAI
-        completion = client.beta.chat.completions.parse(
-            model=model,
-            messages=[
-                {
-                    "role": "system",
-                    "content": f"Extract details for creating a new calendar event. {date_context}",
-                },
-                {"role": "user", "content": description},
-            ],
-            response_format=NewEventDetails,
-        )
-        details = completion.choices[0].message.parsed
+        # Step 1: Extract event details using OpenAI, unless the fused call already did
+        if details is None:
+            details = extract_new_event(description)
         logger.info(f"New event extracted: {details.model_dump_json(indent=2)}")
 
         # Step 2: Parse the date and time
-        combined_datetime_str = f"{details.date} {details.start_time}" if details.date else details.start_time
-        start_time = parser.parse(combined_datetime_str)
-        end_time = start_time + timedelta(minutes=details.duration_minutes)
+        start_time, end_time = event_window(details)
 
         # Step 3: Create the event in Google Calendar
-        calendar_created_event = calendar_create_event(start_time, end_time, details.name)
-        event_id = calendar_created_event["id"]
+        calendar_created_event = calendar_create_event(start_time, end_time, details.name, idempotency_key)
 
         # Step 4: Prepare success response
-        message = f"Created new event with the name '{details.name}' with Calendar_ID={event_id} starting at {start_time.strftime('%Y-%m-%d %H:%M')} with participant(s) {', '.join(details.participants)}"
+        message = new_event_message(details, calendar_created_event, start_time)
         calendar_link = calendar_created_event.get('htmlLink', None)
 
-        add_to_db(message, database_path)
-        logger.info("The event is added to the database!")
+        queue_event_record(message, calendar_created_event, details, start_time)
 
         return CalendarResponse(
             success=True,
@@ -241,44 +527,51 @@ def handle_new_event(description: str) -> CalendarResponse:
         )
 
 
-def handle_modify_event(description: str) -> CalendarResponse:
+def handle_modify_event(description: str, details: Optional[ModifyEventDetails] = None) -> CalendarResponse:
     """Process an event modification request"""
     logger.info("Processing event modification request")
 
-    today = datetime.now()
-    date_context = f"Today is {today.strftime('%A, %B %d, %Y')}."
-
-    # Step 1: Extract modification details using OpenAI
-    completion = client.beta.chat.completions.parse(
-        model=model,
-        messages=[
-            {
-                "role": "system",
-                "content": f"""Extract details for modifying an existing calendar event. Today's date is {date_context}.
-                                Note that terms like "next" indicate the modification should be scheduled after the event's original date.""",
-            },
-            {"role": "user", "content": description},
-        ],
-        response_format=ModifyEventDetails,
-    )
-    details = completion.choices[0].message.parsed
-
-    # Step 2: Parse the date and time
-    combined_datetime_str = f"{details.date} {details.start_time}" if details.date else details.start_time
-    start_time = parser.parse(combined_datetime_str)
-    end_time = start_time + timedelta(minutes=details.duration_minutes)
-
-    # Step 3: Modify the event in Google Calendar
-    modified_event = calendar_modify_event(summary=details.event_identifier, start_time=start_time, end_time=end_time)
-    event_id = modified_event["id"]
-
-    # Step 4: Prepare success response
-    message = f"Modified existing event with the name '{details.event_identifier}' with the new Calendar_ID={event_id} starting at {start_time}"
-    logger.info(f"Modified event: {details.model_dump_json(indent=2)}")
-
-    # Step 5: Update the event's record in the database
-    update_to_db(description=description, path=database_path, message=message)
-    logger.info("Updated in the database and the dataframe")
+    # Modifications are waited on by a person, so their calls jump ahead of batch work such as blogs
+    with priority(INTERACTIVE):
+        try:
+            # Step 1: Extract modification details using OpenAI, unless the fused call already did
+            if details is None:
+                details = extract_modify_event(description)
+
+            # Step 2: Parse the date and time
+            start_time, end_time = event_window(details)
+
+            # Step 3: Modify the event in Google Calendar
+            modified_event = calendar_modify_event(
+                summary=details.event_identifier,
+                start_time=start_time,
+                end_time=end_time,
+                original_date=details.original_date,
+                participants=details.participants_to_remove,
+            )
+            if modified_event is None:
+                return CalendarResponse(
+                    success=False,
+                    message=f"Failed to modify event: could not find or update '{details.event_identifier}'",
+                    calendar_link=None,
+                )
+
+            # Step 4: Prepare success response
+            message = modify_event_message(details, modified_event, start_time)
+            logger.info(f"Modified event: {details.model_dump_json(indent=2)}")
+
+            # Step 5: Update the event's record in the database
+            update_to_db(description=description, path=database_path, message=message,
+                         calendar_id=modified_event["id"], metadata=start_metadata(start_time))
+            logger.info("Updated in the database and the index")
+
+        except Exception as e:
+            logger.error(f"Failed to process event modification: {e}")
+            return CalendarResponse(
+                success=False,
+                message=f"Failed to modify event: {str(e)}",
+                calendar_link=None,
+            )
 
     # Generate success response
     return CalendarResponse(
@@ -287,44 +580,601 @@ def handle_modify_event(description: str) -> CalendarResponse:
         calendar_link=f"calendar://modify?event={details.event_identifier}",
     )
 
-def process_calendar_request(user_input: str) -> Optional[CalendarResponse]:
-    """Main function implementing the routing workflow"""
-    logger.info("Processing calendar request")
+def route_job(job: CalendarJob, fused: bool = False) -> Optional[CalendarJob]:
+    """Routing step: set the request type (and, when fused, the details); None drops the job
+
+    With `fused`, one LLM call routes and extracts; the two-step path is only used
+    when that call is not confident enough.
+    """
+    with span("calendar.route", fused=fused) as current:
+        job = _route_job(job, fused)
+        current.set(request_type=job.request_type if job else "dropped")
+    return job
+
+
+def _route_job(job: CalendarJob, fused: bool) -> Optional[CalendarJob]:
+    if fused:
+        fused_result = route_and_extract(job.text)
+        if fused_result.confidence_score >= CONFIDENCE_THRESHOLD:
+            request = fused_result.request
+            if request.request_type == "other":
+                logger.warning("Request type not supported")
+                return None
+            job.request_type = request.request_type
+            job.description = fused_result.description
+            job.details = request.details
+            return job
+        logger.info(f"Low fused confidence score: {fused_result.confidence_score}, falling back to two-step routing")
 
     # Route the request
-    route_result = route_calendar_request(user_input)
+    route_result = route_calendar_request(job.text)
 
     # Check confidence threshold
-    if route_result.confidence_score < 0.7:
+    if route_result.confidence_score < CONFIDENCE_THRESHOLD:
         logger.warning(f"Low confidence score: {route_result.confidence_score}")
         return None
-
-    # Route to appropriate handler
-    if route_result.request_type == "new_event":
-        return handle_new_event(route_result.description)
-    elif route_result.request_type == "modify_event":
-        return handle_modify_event(route_result.description)
-    else:
+    if route_result.request_type == "other":
         logger.warning("Request type not supported")
         return None
 
+    job.request_type = route_result.request_type
+    job.description = route_result.description
+    return job
+
+
+def extract_job(job: CalendarJob) -> CalendarJob:
+    """Extraction step: fill in the details unless routing already did"""
+    if job.details is None:
+        with span("calendar.extract", request_type=job.request_type):
+            if job.request_type == "new_event":
+                job.details = extract_new_event(job.description)
+            else:
+                with priority(INTERACTIVE):
+                    job.details = extract_modify_event(job.description)
+    return job
+
+
+def apply_job(job: CalendarJob) -> CalendarJob:
+    """Calendar and database step"""
+    with span("calendar.apply", request_type=job.request_type) as current:
+        if job.request_type == "new_event":
+            job.response = handle_new_event(job.description, details=job.details, idempotency_key=job.email_id)
+        else:
+            job.response = handle_modify_event(job.description, details=job.details)
+        current.set(success=bool(job.response and job.response.success))
+    return job
+
+
+def process_calendar_request(user_input: str, fused: bool = False, email_id: Optional[str] = None) -> Optional[CalendarResponse]:
+    """Main function implementing the routing workflow
+
+    `email_id` is the Gmail message the request came from; it keys the created event.
+    """
+    logger.info("Processing calendar request")
+
+    # Route the request, then hand it to the appropriate handler
+    with span("calendar.request", bytes=len(user_input)):
+        job = route_job(CalendarJob(text=user_input, email_id=email_id), fused=fused)
+        if job is None:
+            return None
+        return apply_job(extract_job(job)).response
+
+
+# --------------------------------------------------------------
+# Step 2b: Asynchronous pipeline with per-backend concurrency limits
+# --------------------------------------------------------------
+
+
+class BackendLimits:
+    """Caps how many calls may be in flight against each backend at once"""
+
+    def __init__(self, llm: int = 8, calendar: int = 4, database: int = 1):
+        # The database defaults to one writer so Chroma writes stay ordered with the index
+        self.llm = asyncio.Semaphore(llm)
+        self.calendar = asyncio.Semaphore(calendar)
+        self.database = asyncio.Semaphore(database)
+
+
+async def route_calendar_request_async(user_input: str, limits: BackendLimits) -> CalendarRequestType:
+    """Async router LLM call to determine the type of calendar request"""
+    logger.info("Routing calendar request")
+
+    with span("calendar.route", fused=False, mode="async"):
+        async with limits.llm:
+            result = await cached_parse_async(
+                async_client,
+                model=model,
+                messages=router_messages(user_input),
+                response_format=CalendarRequestType,
+            )
+    logger.info(
+        f"Request routed as: {result.request_type} with confidence: {result.confidence_score}"
+    )
+    return result
+
+
+async def route_and_extract_async(user_input: str, limits: BackendLimits) -> FusedCalendarRequest:
+    """Async fused LLM call that routes the request and extracts its details"""
+    logger.info("Routing and extracting calendar request in one call")
+
+    with span("calendar.route", fused=True, mode="async"):
+        async with limits.llm:
+            result = await cached_parse_async(
+                async_client,
+                model=model,
+                messages=fused_messages(user_input),
+                response_format=FusedCalendarRequest,
+                day_scoped=True,
+            )
+    logger.info(
+        f"Request routed as: {result.request.request_type} with confidence: {result.confidence_score}"
+    )
+    return result
+
+
+async def extract_new_event_async(description: str, limits: BackendLimits) -> NewEventDetails:
+    """Async counterpart of extract_new_event"""
+    timing = resolve(description)
+    async with limits.llm:
+        if not timing.complete:
+            return await cached_parse_async(
+                async_client,
+                model=model,
+                messages=new_event_messages(description),
+                response_format=NewEventDetails,
+                day_scoped=True,
+            )
+        subject = await cached_parse_async(
+            async_client,
+            model=model,
+            messages=new_event_subject_messages(description),
+            response_format=NewEventSubject,
+        )
+    logger.info(f"Timing resolved locally: {timing.date} {timing.start_time} for {timing.duration_minutes} min")
+    return resolved_new_event(subject, timing)
+
+
+async def extract_modify_event_async(description: str, limits: BackendLimits) -> ModifyEventDetails:
+    """Async counterpart of extract_modify_event"""
+    timing = modify_timing(description)
+    async with limits.llm:
+        if timing is None:
+            return await cached_parse_async(
+                async_client,
+                model=model,
+                messages=modify_event_messages(description),
+                response_format=ModifyEventDetails,
+                day_scoped=True,
+            )
+        subject = await cached_parse_async(
+            async_client,
+            model=model,
+            messages=modify_event_subject_messages(description),
+            response_format=ModifyEventSubject,
+        )
+    logger.info(f"Timing resolved locally: {timing.date} {timing.start_time} for {timing.duration_minutes} min")
+    return resolved_modify_event(subject, timing)
+
+
+async def handle_new_event_async(description: str, limits: BackendLimits, details: Optional[NewEventDetails] = None,
+                                 idempotency_key: Optional[str] = None) -> CalendarResponse:
+    """Async counterpart of handle_new_event"""
+    logger.info("Processing new event request")
+
+    try:
+        if details is None:
+            details = await extract_new_event_async(description, limits)
+        logger.info(f"New event extracted: {details.model_dump_json(indent=2)}")
+
+        start_time, end_time = event_window(details)
+
+        async with limits.calendar:
+            calendar_created_event = await asyncio.to_thread(
+                calendar_create_event, start_time, end_time, details.name, idempotency_key
+            )
+
+        message = new_event_message(details, calendar_created_event, start_time)
+        calendar_link = calendar_created_event.get('htmlLink', None)
+
+        # Only the journal append (and for a reused event, the lookup) is awaited;
+        # the Chroma write happens in the background
+        await asyncio.to_thread(queue_event_record, message, calendar_created_event, details, start_time)
+
+        return CalendarResponse(
+            success=True,
+            message=message,
+            calendar_link=calendar_link,
+        )
+
+    except Exception as e:
+        logger.error(f"Failed to process new event: {e}")
+        return CalendarResponse(
+            success=False,
+            message=f"Failed to create event: {str(e)}",
+            calendar_link=None,
+        )
+
+
+async def handle_modify_event_async(description: str, limits: BackendLimits, details: Optional[ModifyEventDetails] = None) -> CalendarResponse:
+    """Async counterpart of handle_modify_event"""
+    logger.info("Processing event modification request")
+
+    with priority(INTERACTIVE):
+        try:
+            if details is None:
+                details = await extract_modify_event_async(description, limits)
+
+            start_time, end_time = event_window(details)
+
+            modified_event = None
+            async with limits.database:
+                event_id = await asyncio.to_thread(
+                    find_calendar_event_id, details.event_identifier, details.original_date, details.participants_to_remove
+                )
+            if event_id is not None:
+                async with limits.calendar:
+                    modified_event = await asyncio.to_thread(
+                        calendar_update_event, event_id, event_body(details.event_identifier, start_time, end_time)
+                    )
+            if modified_event is None:
+                return CalendarResponse(
+                    success=False,
+                    message=f"Failed to modify event: could not find or update '{details.event_identifier}'",
+                    calendar_link=None,
+                )
+
+            message = modify_event_message(details, modified_event, start_time)
+            logger.info(f"Modified event: {details.model_dump_json(indent=2)}")
+
+            async with limits.database:
+                await asyncio.to_thread(
+                    update_to_db, description=description, path=database_path, message=message,
+                    calendar_id=modified_event["id"], metadata=start_metadata(start_time),
+                )
+            logger.info("Updated in the database and the index")
+
+        except Exception as e:
+            logger.error(f"Failed to process event modification: {e}")
+            return CalendarResponse(
+                success=False,
+                message=f"Failed to modify event: {str(e)}",
+                calendar_link=None,
+            )
+
+    return CalendarResponse(
+        success=True,
+        message=message,
+        calendar_link=f"calendar://modify?event={details.event_identifier}",
+    )
+
+
+async def process_calendar_request_async(user_input: str, limits: Optional[BackendLimits] = None, fused: bool = False,
+                                         email_id: Optional[str] = None) -> Optional[CalendarResponse]:
+    """Async counterpart of process_calendar_request; returns the same CalendarResponse objects"""
+    logger.info("Processing calendar request")
+    limits = limits or BackendLimits()
+
+    with span("calendar.request", bytes=len(user_input), mode="async"):
+        if fused:
+            fused_result = await route_and_extract_async(user_input, limits)
+            if fused_result.confidence_score >= CONFIDENCE_THRESHOLD:
+                request = fused_result.request
+                if request.request_type == "new_event":
+                    return await handle_new_event_async(fused_result.description, limits, details=request.details,
+                                                        idempotency_key=email_id)
+                elif request.request_type == "modify_event":
+                    return await handle_modify_event_async(fused_result.description, limits, details=request.details)
+                else:
+                    logger.warning("Request type not supported")
+                    return None
+            logger.info(f"Low fused confidence score: {fused_result.confidence_score}, falling back to two-step routing")
+
+        route_result = await route_calendar_request_async(user_input, limits)
+
+        if route_result.confidence_score < CONFIDENCE_THRESHOLD:
+            logger.warning(f"Low confidence score: {route_result.confidence_score}")
+            return None
+
+        if route_result.request_type == "new_event":
+            return await handle_new_event_async(route_result.description, limits, idempotency_key=email_id)
+        elif route_result.request_type == "modify_event":
+            return await handle_modify_event_async(route_result.description, limits)
+        else:
+            logger.warning("Request type not supported")
+            return None
+
+
+async def process_many_async(user_inputs: list[str], limits: Optional[BackendLimits] = None, fused: bool = False,
+                             email_ids: Optional[list[Optional[str]]] = None) -> list[Optional[CalendarResponse]]:
+    """Process many requests concurrently; results keep the order of `user_inputs`
+
+    `email_ids`, parallel to `user_inputs`, key the created events as in process_calendar_request.
+    """
+    limits = limits or BackendLimits()
+    email_ids = email_ids or [None] * len(user_inputs)
+    results = await asyncio.gather(
+        *(
+            process_calendar_request_async(user_input, limits, fused=fused, email_id=email_id)
+            for user_input, email_id in zip(user_inputs, email_ids)
+        ),
+        return_exceptions=True,
+    )
+    responses = []
+    for user_input, result in zip(user_inputs, results):
+        if isinstance(result, Exception):
+            logger.error(f"Failed to process request {user_input!r}: {result}")
+            result = None
+        responses.append(result)
+    return responses
+
 
 # --------------------------------------------------------------
-# Step 3: Using tools to interact with Google Calendar
+# Step 3: Run as a resident worker polling Gmail for new requests
 # --------------------------------------------------------------
 
-# new_event_input = "Let's schedule a team meeting next Tuesday at 2pm with Alice and Bob"
-new_event_input = readEmails()
-result = process_calendar_request(new_event_input)
-if result:
-    print(f"Response: {result.message}")
 
-snapshot = tracemalloc.take_snapshot()
-top_stats = snapshot.statistics('lineno')
+# Worker threads per stage in --pipeline mode; the two LLM stages dominate latency
+PIPELINE_WORKERS = {"route": 4, "extract": 4, "apply": 2}
+# Ledger key of the Gmail history id the next incremental poll starts from
+HISTORY_CHECKPOINT = "gmail_history_id"
+
+
+class CalendarWorker:
+    """Keeps the clients warm and processes unread emails until asked to stop
+
+    Handled messages are recorded in the email ledger and marked read in bulk after
+    each poll, so a message is skipped by id before its body is even fetched, and a
+    forward or same-thread copy of a request handled minutes ago is skipped by
+    content hash. With
+    `incremental`, each poll reads only the Gmail history since the checkpointed
+    history id instead of scanning the whole unread set.
+    """
+
+    def __init__(self, poll_interval: float = 30.0, fused: bool = False, pipelined: bool = False,
+                 ledger: Optional[EmailLedger] = None, incremental: bool = False):
+        self.poll_interval = poll_interval
+        self.fused = fused
+        self.pipelined = pipelined
+        self.ledger = ledger if ledger is not None else EmailLedger()
+        self.history = HistorySync(self.ledger.checkpoint(HISTORY_CHECKPOINT)) if incremental else None
+        self.stop_event = threading.Event()
+        self.skipped = 0
+        # Email id -> (content hash, thread id, forwarded) of emails admitted but not yet recorded,
+        # so copies within one poll are caught
+        self._in_progress = {}
+        self._in_progress_lock = threading.Lock()
+        self.latencies = []
+        self._latencies_lock = threading.Lock()
+
+    def warm_up(self) -> float:
+        """Build the Gmail and Calendar services, open the event collection and load the embedding model"""
+        get_gmail_service()
+        calendar_pool.service()
+        database_retrieval.warm_up()
+        event_writer.start()
+        startup_seconds = time.perf_counter() - STARTUP_BEGAN
+        logger.info(f"Worker ready after {startup_seconds:.2f}s of startup")
+        return startup_seconds
+
+    def request_stop(self, signum=None, frame=None):
+        """Finish the request in flight, then leave the polling loop"""
+        logger.info(f"Shutdown requested (signal={signum}), draining the current request")
+        self.stop_event.set()
+
+    def admit(self, email) -> bool:
+        """Whether `email` needs processing; empty bodies and copies of a handled request are recorded and skipped"""
+        if not email.body:
+            self.ledger.record(email.id, IGNORED)
+            return False
+        digest = content_hash(email.body)
+        forwarded = is_forward(email.subject, email.body)
+        with self._in_progress_lock:
+            # In --pipeline mode the original may still be in flight, not yet in the ledger
+            original = next(
+                (other_id for other_id, (other_digest, other_thread, other_forwarded) in self._in_progress.items()
+                 if other_digest == digest
+                 and (forwarded or other_forwarded or (email.thread_id is not None and other_thread == email.thread_id))),
+                None,
+            ) or self.ledger.duplicate_of(email.id, digest, email.thread_id, forwarded)
+            if original is None:
+                self._in_progress[email.id] = (digest, email.thread_id, forwarded)
+        if original is not None:
+            logger.info(f"Email {email.id} repeats already handled email {original}, skipping it")
+            self.ledger.record(email.id, DUPLICATE, digest, email.thread_id, forwarded)
+            self.skipped += 1
+            return False
+        return True
+
+    def record(self, email_id: str, text: str, response: Optional[CalendarResponse], failed: bool = False):
+        if failed or (response is not None and not response.success):
+            status = FAILED
+        else:
+            status = DONE if response is not None else IGNORED
+        with self._in_progress_lock:
+            admitted = self._in_progress.get(email_id)
+        digest, thread_id, forwarded = admitted or (content_hash(text), None, False)
+        # Released only once it is in the ledger, so a concurrent copy always finds one or the other
+        self.ledger.record(email_id, status, digest, thread_id, forwarded)
+        with self._in_progress_lock:
+            self._in_progress.pop(email_id, None)
+
+    def unread_emails(self) -> Iterator:
+        """The unread emails to consider on this poll, skipping the ones the ledger has handled"""
+        if self.history is None:
+            return iter_unread_emails(skip=self.ledger.handled)
+        return self.history.poll(skip=self.ledger.handled, retry_ids=self.ledger.retryable())
+
+    def finish_poll(self):
+        """Mark handled emails read and checkpoint the history id the next poll starts from"""
+        self.mark_handled_read()
+        if self.history is not None and self.history.history_id is not None:
+            self.ledger.save_checkpoint(HISTORY_CHECKPOINT, self.history.history_id)
+
+    def mark_handled_read(self):
+        """Take every handled message out of the unread set with one batchModify per 1000 ids"""
+        message_ids = self.ledger.unmarked()
+        if not message_ids:
+            return
+        try:
+            mark_read(message_ids)
+        except Exception as e:
+            # They stay in the ledger as unmarked and are retried after the next poll
+            logger.error(f"Failed to mark {len(message_ids)} message(s) read: {e}")
+            return
+        self.ledger.mark_read(message_ids)
+
+    def process_pending(self) -> int:
+        """Process every unread email that has not been handled yet"""
+        if self.pipelined:
+            handled = self.process_pending_pipelined()
+            self.finish_poll()
+            return handled
+        handled = 0
+        for email in self.unread_emails():
+            if self.stop_event.is_set():
+                break
+            if not self.admit(email):
+                continue
+
+            started = time.perf_counter()
+            result, failed = None, False
+            try:
+                result = process_calendar_request(email.body, fused=self.fused, email_id=email.id)
+                if result:
+                    print(f"Response: {result.message}")
+            except Exception as e:
+                failed = True
+                logger.error(f"Failed to process email {email.id}: {e}")
+            latency = time.perf_counter() - started
+
+            self.record(email.id, email.body, result, failed)
+            self.latencies.append(latency)
+            handled += 1
+            logger.info(f"Processed email {email.id} in {latency:.2f}s")
+        self.finish_poll()
+        return handled
+
+    def new_emails(self) -> Iterator[CalendarJob]:
+        """Source of the pipeline: unread, unhandled emails as jobs"""
+        for email in self.unread_emails():
+            if self.stop_event.is_set():
+                return
+            if self.admit(email):
+                yield CalendarJob(text=email.body, email_id=email.id)
+
+    def tracked(self, func: Callable[[CalendarJob], Optional[CalendarJob]]) -> Callable:
+        """Wrap a pipeline stage so jobs it drops or fails on are recorded in the ledger"""
+        def run(job: CalendarJob) -> Optional[CalendarJob]:
+            try:
+                result = func(job)
+            except Exception:
+                self.record(job.email_id, job.text, None, failed=True)
+                raise
+            if result is None:
+                self.record(job.email_id, job.text, None)
+            return result
+        return run
+
+    def process_pending_pipelined(self) -> int:
+        """Like process_pending, but Gmail paging, routing, extraction and the Calendar/database
+        step of different emails overlap, each stage on its own threads behind a bounded queue"""
+        def finished(job: CalendarJob):
+            self.record(job.email_id, job.text, job.response)
+            latency = time.perf_counter() - job.started
+            with self._latencies_lock:
+                self.latencies.append(latency)
+            if job.response:
+                print(f"Response: {job.response.message}")
+            logger.info(f"Processed email {job.email_id} in {latency:.2f}s")
+
+        pipeline = Pipeline(
+            [
+                Stage("route", self.tracked(lambda job: route_job(job, fused=self.fused)), workers=PIPELINE_WORKERS["route"]),
+                Stage("extract", self.tracked(extract_job), workers=PIPELINE_WORKERS["extract"]),
+                Stage("apply", self.tracked(apply_job), workers=PIPELINE_WORKERS["apply"]),
+            ],
+            on_result=finished,
+        )
+        metrics = pipeline.run(self.new_emails())
+        for name, stage in metrics["stages"].items():
+            logger.info(
+                f"Stage {name}: {stage['processed']} processed, {stage['dropped']} dropped, {stage['failed']} failed, "
+                f"{stage['throughput_per_s']:.2f}/s, max queue {stage['max_queue_depth']}, utilization {stage['utilization']:.0%}"
+            )
+        route = metrics["stages"]["route"]
+        return route["processed"] + route["dropped"] + route["failed"]
+
+    def run(self, once: bool = False):
+        """Poll Gmail until stopped; with `once` only the current unread backlog is processed"""
+        while not self.stop_event.is_set():
+            try:
+                self.process_pending()
+            except Exception as e:
+                logger.error(f"Polling Gmail failed: {e}")
+            if once:
+                break
+            self.stop_event.wait(self.poll_interval)
+        self.report()
+
+    def report(self):
+        """Log per-request latency, excluding startup cost, and the prompt-cache share of LLM input tokens"""
+        if not self.latencies:
+            logger.info("No requests processed")
+            return
+        logger.info(
+            f"Processed {len(self.latencies)} request(s) - "
+            f"mean {statistics.mean(self.latencies):.2f}s, "
+            f"median {statistics.median(self.latencies):.2f}s, "
+            f"max {max(self.latencies):.2f}s"
+        )
+        total = token_usage.summary()["total"]
+        if total["prompt_tokens"]:
+            logger.info(
+                f"LLM prompt tokens: {total['prompt_tokens']}, "
+                f"{total['cached_tokens'] / total['prompt_tokens']:.0%} served from the provider's prompt cache"
+            )
+
+
+def main(argv: Optional[list[str]] = None):
+    arg_parser = argparse.ArgumentParser(description="Turn unread emails into Google Calendar events")
+    arg_parser.add_argument("--once", action="store_true", help="Process the current unread emails and exit")
+    arg_parser.add_argument("--poll-interval", type=float, default=30.0, help="Seconds between Gmail polls")
+    arg_parser.add_argument("--fused", action="store_true", help="Route and extract each request in a single LLM call")
+    arg_parser.add_argument("--pipeline", action="store_true", help="Overlap Gmail, LLM and Calendar work of different emails")
+    arg_parser.add_argument("--incremental", action="store_true",
+                            help="Poll only the Gmail history since the last checkpoint instead of every unread email")
+    arg_parser.add_argument("--trace", metavar="PATH", help="Write per-stage latency and token spans to PATH (JSONL)")
+    arg_parser.add_argument("--trace-memory", action="store_true", help="Print the top memory allocations on exit")
+    args = arg_parser.parse_args(argv)
+
+    if args.trace:
+        tracing.enable(args.trace)
+
+    if args.trace_memory:
+        tracemalloc.start()
+
+    worker = CalendarWorker(poll_interval=args.poll_interval, fused=args.fused, pipelined=args.pipeline,
+                            incremental=args.incremental)
+    signal.signal(signal.SIGINT, worker.request_stop)
+    signal.signal(signal.SIGTERM, worker.request_stop)
+
+    worker.warm_up()
+    worker.run(once=args.once)
+    # Persist the queued event records before exiting
+    event_writer.close()
+
+    if args.trace_memory:
+        snapshot = tracemalloc.take_snapshot()
+        top_stats = snapshot.statistics('lineno')
+
+        print("[ Top 10 Memory Allocations ]")
+        for stat in top_stats[:10]:
+            print(stat)
+
+
+if __name__ == "__main__":
+    main()
 
-print("[ Top 10 Memory Allocations ]")
-for stat in top_stats[:50]:
-    print(stat)
 # --------------------------------------------------------------
 # Step 4: Test with modify event
 # --------------------------------------------------------------
@@ -332,7 +1182,6 @@ for stat in top_stats[:50]:
 # modify_event_input = (
 #     "Can you move the team meeting with Alice and Bob to next Wednesday at 3pm instead?"
 # )
-# modify_event_input = readEmails()
 # result = process_calendar_request(modify_event_input)
 # if result:
 #
@@ -345,4 +1194,4 @@ for stat in top_stats[:50]:
 # invalid_input = "What's the weather like today?"
 # result = process_calendar_request(invalid_input)
 # if not result:
-#     print("Request not recognized as a calendar operation")
\ No newline at end of file
+#     print("Request not recognized as a calendar operation")
@@ -0,0 +1,84 @@
+import threading
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Optional
+import httplib2
+import google_auth_httplib2
+from google.auth.transport.requests import Request
+from google.oauth2 import service_account
+from googleapiclient.discovery import build
+
+
+logger = logging.getLogger(__name__)
+
+# Refresh the access token this long before it expires so no request goes out with a stale one
+REFRESH_MARGIN = timedelta(minutes=5)
+
+
+def _build_calendar_service(credentials):
+    """Build a Calendar service bound to its own authorized, connection-reusing HTTP object"""
+    http = google_auth_httplib2.AuthorizedHttp(credentials, http=httplib2.Http())
+    return build('calendar', 'v3', http=http, cache_discovery=False)
+
+
+class CalendarClientPool:
+    """Caches service-account credentials and one Calendar service per thread.
+
+    googleapiclient service objects sit on top of httplib2, which is not thread-safe,
+    so each thread gets its own service (and its own kept-alive connections) while the
+    credentials are loaded once and refreshed under a lock.
+    """
+
+    def __init__(
+        self,
+        service_account_file: str,
+        scopes: list[str],
+        service_builder: Callable = _build_calendar_service,
+        credentials_loader: Optional[Callable] = None,
+        refresh_margin: timedelta = REFRESH_MARGIN,
+    ):
+        self.service_account_file = service_account_file
+        self.scopes = scopes
+        self.service_builder = service_builder
+        self.credentials_loader = credentials_loader or self._load_credentials
+        self.refresh_margin = refresh_margin
+        self._credentials = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._refresh_request = Request()
+
+    def _load_credentials(self):
+        return service_account.Credentials.from_service_account_file(self.service_account_file, scopes=self.scopes)
+
+    def _needs_refresh(self, credentials) -> bool:
+        if not credentials.token or credentials.expiry is None:
+            return True
+        # google-auth stores expiry as a naive UTC datetime
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        return credentials.expiry - now <= self.refresh_margin
+
+    def credentials(self):
+        """Return the shared credentials, loading them once and refreshing before expiry"""
+        with self._lock:
+            if self._credentials is None:
+                self._credentials = self.credentials_loader()
+                logger.info("Loaded Calendar service account credentials")
+            if self._needs_refresh(self._credentials):
+                self._credentials.refresh(self._refresh_request)
+                logger.info("Refreshed Calendar access token")
+            return self._credentials
+
+    def service(self):
+        """Return this thread's Calendar service, building it on first use"""
+        credentials = self.credentials()
+        service = getattr(self._local, "service", None)
+        if service is None:
+            service = self.service_builder(credentials)
+            self._local.service = service
+        return service
+
+    def reset(self):
+        """Drop the cached credentials and this thread's service, e.g. after rotating the key file"""
+        with self._lock:
+            self._credentials = None
+        self._local.service = None
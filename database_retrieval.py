@@ -1,60 +1,319 @@
 import chromadb
-from chromadb.utils import embedding_functions
 import os
+import re
+from datetime import datetime
+from typing import Optional
 import logging
-import pandas as pd
+from embeddings import make_embedding_function
+from event_index import open_index
+from tracing import span
 from dotenv import load_dotenv
 from pprint import pprint
 
 
 
 load_dotenv()
+logger = logging.getLogger(__name__)
 client = chromadb.PersistentClient(path="eventdb")
 
-# Creating a DataFrame to store descriptions and their ids
-# df_db = pd.DataFrame(columns=["ids","description"])
-# df_db.to_csv("eventdb/df_db.csv")
-df_db = pd.read_csv("eventdb/df_db.csv")
-
-def add_to_db(description: str, path: str):
-    collection = client.get_or_create_collection(name="eventdb")
-
-    # Adding descriptions to a dataframe to have the ids stored
-    df_db = pd.read_csv(path)
-    df_db.loc[len(df_db)] = {"ids": f"id{len(df_db)+1}", "description": description}
-    df_db.to_csv(path, index=False)
-
-    # Adding the description as a new document
-    collection.add(
-        documents=[
-            df_db.iloc[len(df_db) - 1]["description"],
-        ],
-        ids=[f"id{len(df_db)}"]
-    )
+# Configured with EVENTDB_EMBEDDING (onnx | sentence-transformers | hashing | stub)
+embedding_function = make_embedding_function()
+
+# The id -> description index lives in eventdb/event_index.sqlite3; an existing
+# eventdb/df_db.csv is migrated into it the first time the index is opened.
+
+# Documents per Chroma call; each chunk is embedded in one batch
+CHUNK_SIZE = 100
+# Nearest records checked for a legacy (metadata-less) match when the metadata filter finds nothing
+LEGACY_CANDIDATES = 20
+
+_collection = None
+
+
+def get_collection():
+    """Open the eventdb collection once per process"""
+    global _collection
+    if _collection is None:
+        _collection = client.get_or_create_collection(name="eventdb", embedding_function=embedding_function)
+    return _collection
+
 
+def warm_up():
+    """Open the collection and load the embedding model before the first request"""
+    get_collection()
+    embedding_function.warm_up()
+
+
+def reembed_collection(chunk_size: int = CHUNK_SIZE):
+    """Rebuild the collection with the configured embedding backend, e.g. after changing EVENTDB_EMBEDDING.
+
+    Chroma refuses to open a collection with a different embedding function than it
+    was created with, so the documents and metadata are read without embedding
+    and written to a fresh collection.
+    """
+    global _collection
+    old = client.get_collection(name="eventdb")
+    records = old.get(include=["documents", "metadatas"])
+    client.delete_collection(name="eventdb")
+    _collection = None
+
+    collection = get_collection()
+    for start in range(0, len(records["ids"]), chunk_size):
+        end = start + chunk_size
+        metadatas = records["metadatas"][start:end]
+        collection.add(
+            ids=records["ids"][start:end],
+            documents=records["documents"][start:end],
+            # Chroma rejects empty metadata dicts, legacy records have none
+            metadatas=[metadata or None for metadata in metadatas] if any(metadatas) else None,
+        )
+    logger.info(f"Re-embedded {len(records['ids'])} record(s) with {embedding_function.name()}")
     return collection
 
 
-def update_to_db(description: str, path: str, message: str):
-    collection = client.get_or_create_collection(name="eventdb")
-    similar_record = collection.query(
-        query_texts=description,
-        n_results=1
-    )
-    db_id = str(similar_record["ids"][0][0])
+def _chunks(items: list, size: int):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
 
-    collection.update(
-        ids=[db_id],
-        documents=[message]
-    )
 
-    df_db = pd.read_csv(path)
-    df_db.loc[df_db["ids"] == db_id, "description"] = message
-    df_db.to_csv(path, index=False)
+def start_metadata(start_time: datetime) -> dict:
+    """Start time fields of an event record"""
+    return {
+        "start": start_time.isoformat(),
+        # Chroma range filters only work on numbers
+        "start_ts": int(start_time.timestamp()),
+    }
+
+
+def event_metadata(calendar_id: str, name: str, start_time: datetime, participants: list[str]) -> dict:
+    """Structured fields stored next to an event record so lookups can filter instead of parsing text"""
+    return {
+        "calendar_id": calendar_id,
+        "name": name,
+        "participants": ", ".join(participants),
+        **start_metadata(start_time),
+    }
+
+
+def add_many(descriptions: list[str], path: str, chunk_size: int = CHUNK_SIZE, metadatas: Optional[list[dict]] = None):
+    """Add many descriptions, embedding and writing them `chunk_size` at a time"""
+    collection = get_collection()
+    index = open_index(path)
+
+    for start in range(0, len(descriptions), chunk_size):
+        chunk = descriptions[start:start + chunk_size]
+        # Adding the descriptions to the index to have the ids stored
+        ids = index.append_many(chunk)
+        try:
+            # Adding the descriptions as new documents
+            with span("chroma.add", records=len(chunk), bytes=sum(len(d) for d in chunk)):
+                if metadatas is None:
+                    collection.add(documents=chunk, ids=ids)
+                else:
+                    collection.add(documents=chunk, ids=ids, metadatas=metadatas[start:start + chunk_size])
+        except Exception:
+            # Keep the index in step with the collection
+            index.delete_many(ids)
+            raise
+
     return collection
 
-collection = client.get_or_create_collection(name="eventdb")
 
+def _record_ids(collection, chunk: list[tuple]) -> list[Optional[str]]:
+    """Resolve the record each update targets: exactly by calendar_id when known, else by similarity"""
+    record_ids = [None] * len(chunk)
+
+    calendar_ids = [calendar_id for _, _, calendar_id, _ in chunk if calendar_id]
+    if calendar_ids:
+        with span("chroma.get", filter="calendar_id", keys=len(calendar_ids)):
+            found = collection.get(where={"calendar_id": {"$in": calendar_ids}}, include=["metadatas"])
+        by_calendar_id = {metadata["calendar_id"]: record_id for record_id, metadata in zip(found["ids"], found["metadatas"])}
+        for i, (_, _, calendar_id, _) in enumerate(chunk):
+            record_ids[i] = by_calendar_id.get(calendar_id)
+
+    unresolved = [i for i, record_id in enumerate(record_ids) if record_id is None]
+    if unresolved:
+        with span("chroma.query", queries=len(unresolved)):
+            similar_records = collection.query(
+                query_texts=[chunk[i][0] for i in unresolved],
+                n_results=1
+            )
+        for i, ids in zip(unresolved, similar_records["ids"]):
+            if ids:
+                record_ids[i] = str(ids[0])
+    return record_ids
+
+
+def update_many(
+    updates: list[tuple[str, str]],
+    path: str,
+    chunk_size: int = CHUNK_SIZE,
+    calendar_ids: Optional[list[Optional[str]]] = None,
+    metadatas: Optional[list[Optional[dict]]] = None,
+):
+    """Apply many (description, message) updates.
+
+    Each message replaces the record with the matching `calendar_ids` entry, or the
+    record most similar to its description when no calendar id is given. Entries of
+    `metadatas` are merged into the record's metadata.
+    """
+    collection = get_collection()
+    index = open_index(path)
+    calendar_ids = calendar_ids or [None] * len(updates)
+    metadatas = metadatas or [None] * len(updates)
+    rows = [(description, message, calendar_id, metadata)
+            for (description, message), calendar_id, metadata in zip(updates, calendar_ids, metadatas)]
+
+    for chunk in _chunks(rows, chunk_size):
+        # Later updates to the same record win, as they would when applied one by one
+        messages, new_metadata = {}, {}
+        for record_id, (_, message, _, metadata) in zip(_record_ids(collection, chunk), chunk):
+            if record_id is None:
+                continue
+            messages[record_id] = message
+            if metadata:
+                new_metadata[record_id] = metadata
+
+        if not messages:
+            continue
+        with span("chroma.update", records=len(messages), bytes=sum(len(m) for m in messages.values())):
+            collection.update(
+                ids=list(messages),
+                documents=list(messages.values())
+            )
+            if new_metadata:
+                collection.update(ids=list(new_metadata), metadatas=list(new_metadata.values()))
+        index.update_many(list(messages.items()))
+
+    return collection
+
+
+def find_event_id(
+    query_text: str,
+    start_after: Optional[datetime] = None,
+    start_before: Optional[datetime] = None,
+    participants: Optional[list[str]] = None,
+) -> Optional[str]:
+    """Find the Calendar_ID of a stored event.
+
+    Records are first narrowed by their structured metadata (start window and
+    participants); the embedding is only used to rank when more than one record
+    survives. Records stored before metadata existed are still found by falling back
+    to a plain similarity query and the Calendar_ID in the document text.
+    """
+    collection = get_collection()
+
+    conditions = [{"calendar_id": {"$ne": ""}}]
+    if start_after is not None:
+        conditions.append({"start_ts": {"$gte": int(start_after.timestamp())}})
+    if start_before is not None:
+        conditions.append({"start_ts": {"$lt": int(start_before.timestamp())}})
+    where = conditions[0] if len(conditions) == 1 else {"$and": conditions}
+
+    with span("chroma.get", filter="start_ts", conditions=len(conditions)) as current:
+        candidates = collection.get(where=where, include=["metadatas"])
+        current.set(records=len(candidates["ids"]))
+    wanted = {p.strip().lower() for p in participants or [] if p.strip()}
+    calendar_ids = [
+        metadata["calendar_id"]
+        for metadata in candidates["metadatas"]
+        if metadata and metadata.get("calendar_id")
+        and wanted <= {p.strip().lower() for p in metadata.get("participants", "").split(",")}
+    ]
+
+    if len(calendar_ids) == 1:
+        logger.info(f"Found the event id={calendar_ids[0]} from metadata alone")
+        return calendar_ids[0]
+
+    if calendar_ids:
+        with span("chroma.query", candidates=len(calendar_ids)):
+            ranked = collection.query(
+                query_texts=[query_text],
+                n_results=1,
+                where={"calendar_id": {"$in": calendar_ids}},
+                include=["metadatas"],
+            )
+        calendar_id = ranked["metadatas"][0][0]["calendar_id"]
+        logger.info(f"Found the event id={calendar_id} among {len(calendar_ids)} candidates")
+        return calendar_id
+
+    # Legacy records carry no metadata; rank by similarity and read the id from the text.
+    # Records with metadata were already ruled out by the filter above, so they never match here.
+    with span("chroma.query", legacy=True) as current:
+        similar_records = collection.query(
+            query_texts=[query_text],
+            n_results=LEGACY_CANDIDATES,
+            include=["documents", "metadatas"],
+        )
+        documents = similar_records["documents"][0] if similar_records["documents"] else []
+        metadatas = similar_records["metadatas"][0] if similar_records["metadatas"] else []
+        legacy = [
+            document for document, metadata in zip(documents, metadatas or [None] * len(documents))
+            if not (metadata and metadata.get("calendar_id"))
+        ]
+        current.set(records=len(legacy))
+    for document in legacy:
+        match = re.search(r"Calendar_ID=([a-zA-Z0-9]+)", document)
+        if match:
+            return match.group(1)
+    return None
+
+
+def has_event(calendar_id: str) -> bool:
+    """Whether a record with metadata for `calendar_id` is in the collection"""
+    with span("chroma.get", filter="calendar_id", keys=1):
+        found = get_collection().get(where={"calendar_id": calendar_id}, include=[])
+    return bool(found["ids"])
+
+
+def find_pending_event_id(
+    records: list[tuple[str, Optional[dict]]],
+    query_text: str,
+    start_after: Optional[datetime] = None,
+    start_before: Optional[datetime] = None,
+    participants: Optional[list[str]] = None,
+) -> Optional[str]:
+    """find_event_id over records that have not reached the collection yet (the write-behind queue)
+
+    The same metadata filter applies; several survivors are ranked by the words their
+    name shares with `query_text`, and a tie finds nothing rather than guessing.
+    """
+    wanted = {p.strip().lower() for p in participants or [] if p.strip()}
+    candidates = []
+    for _, metadata in records:
+        if not (metadata and metadata.get("calendar_id")):
+            continue
+        start_ts = metadata.get("start_ts")
+        if start_after is not None and (start_ts is None or start_ts < int(start_after.timestamp())):
+            continue
+        if start_before is not None and (start_ts is None or start_ts >= int(start_before.timestamp())):
+            continue
+        if not wanted <= {p.strip().lower() for p in metadata.get("participants", "").split(",")}:
+            continue
+        candidates.append(metadata)
+
+    if len(candidates) <= 1:
+        return candidates[0]["calendar_id"] if candidates else None
+    words = set(re.findall(r"\w+", query_text.lower()))
+    scored = sorted(
+        ((len(words & set(re.findall(r"\w+", metadata.get("name", "").lower()))), metadata["calendar_id"])
+         for metadata in candidates),
+        reverse=True,
+    )
+    if scored[0][0] == 0 or scored[0][0] == scored[1][0]:
+        return None
+    return scored[0][1]
+
+
+def add_to_db(description: str, path: str, metadata: Optional[dict] = None):
+    return add_many([description], path, metadatas=[metadata] if metadata else None)
+
+
+def update_to_db(description: str, path: str, message: str, calendar_id: Optional[str] = None, metadata: Optional[dict] = None):
+    return update_many([(description, message)], path, calendar_ids=[calendar_id], metadatas=[metadata])
+
+
+# collection = get_collection()
 # similar_record = collection.query(
 #         query_texts="Can you move the team meeting with Alice and Bob to next Wednesday at 3pm instead?",
 #         n_results=1
@@ -68,8 +327,8 @@ collection = client.get_or_create_collection(name="eventdb")
 # )
 # collection = client.get_or_create_collection(name="eventdb")
 # query = "Can you move the team meeting with Alice and Bob to next Wednesday at 3pm instead?"
-# update_to_db(query, "eventdb/df_db.csv", "Change the time of \"Team Meeting\" from 2025-06-03 14:00 to 2025-06-04 with Calendar_ID=sdfjhasd23424;aschlfgk")
-# add_to_db(description="Created new event with the name 'Team Meeting' with Calendar_ID=p3omdijoqei2dv3r1lmos4op98 starting at 2025-06-03 14:00 with participant(s) Alice, Bob", path="eventdb/df_db.csv")
+# update_to_db(query, "eventdb/event_index.sqlite3", "Change the time of \"Team Meeting\" from 2025-06-03 14:00 to 2025-06-04 with Calendar_ID=sdfjhasd23424;aschlfgk")
+# add_to_db(description="Created new event with the name 'Team Meeting' with Calendar_ID=p3omdijoqei2dv3r1lmos4op98 starting at 2025-06-03 14:00 with participant(s) Alice, Bob", path="eventdb/event_index.sqlite3")
 # collection.delete(ids=["id3"])
 # print(collection.get())
 
@@ -0,0 +1,166 @@
+import os
+import re
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import Iterable, Optional
+from tracing import span
+
+
+logger = logging.getLogger(__name__)
+
+LEDGER_PATH = "eventdb/email_ledger.sqlite3"
+# A message whose processing failed is picked up again on later polls, at most this many times in all
+MAX_ATTEMPTS = 3
+# Only messages handled this recently count as the original of a copy; the same wording
+# days apart ("lunch tomorrow at noon") is a new request
+DEDUP_WINDOW_SECONDS = 10 * 60
+
+DONE, IGNORED, DUPLICATE, FAILED = "done", "ignored", "duplicate", "failed"
+
+_forward_header = re.compile(r"^-+ ?(forwarded message|original message) ?-+$", re.I)
+_header_line = re.compile(r"^(from|to|cc|date|sent|subject):", re.I)
+_whitespace = re.compile(r"\s+")
+_forward_subject = re.compile(r"^\s*fwd?:", re.I)
+
+
+def content_hash(body: str) -> str:
+    """Hash of an email body that ignores forwarding: banners, quoted header lines, '>' prefixes and spacing"""
+    lines = []
+    for line in body.splitlines():
+        line = line.lstrip("> ").strip()
+        if not line or _forward_header.match(line) or _header_line.match(line):
+            continue
+        lines.append(line)
+    normalized = _whitespace.sub(" ", " ".join(lines)).strip().lower()
+    # Subject prefixes added by forwarding and replying do not change the request
+    normalized = re.sub(r"^((fwd?|re):\s*)+", "", normalized)
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+def is_forward(subject: Optional[str], body: str) -> bool:
+    """Whether an email forwards another: a Fwd:/Fw: subject or a forward banner in the body"""
+    if subject and _forward_subject.match(subject):
+        return True
+    return any(_forward_header.match(line.lstrip("> ").strip()) for line in body.splitlines())
+
+
+class EmailLedger:
+    """Which Gmail messages the worker has already handled, and with what outcome.
+
+    Lets a poll skip handled messages by id before fetching their bodies, recognise
+    copies of a recently handled request by content hash, and remember which
+    handled messages still have to be marked read in Gmail. Only forwards and
+    messages in the original's thread count as copies; the same wording sent
+    afresh is a new request.
+    """
+
+    def __init__(self, path: str = LEDGER_PATH, max_attempts: int = MAX_ATTEMPTS,
+                 dedup_window: float = DEDUP_WINDOW_SECONDS):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.dedup_window = dedup_window
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS messages ("
+            "message_id TEXT PRIMARY KEY, content_hash TEXT, thread_id TEXT, forwarded INTEGER NOT NULL DEFAULT 0, "
+            "status TEXT NOT NULL, "
+            "attempts INTEGER NOT NULL DEFAULT 0, marked_read INTEGER NOT NULL DEFAULT 0, updated_at REAL NOT NULL)"
+        )
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(messages)")}
+        if "thread_id" not in columns:
+            # Ledgers written before copies were tied to a thread or a forward
+            self._db.execute("ALTER TABLE messages ADD COLUMN thread_id TEXT")
+            self._db.execute("ALTER TABLE messages ADD COLUMN forwarded INTEGER NOT NULL DEFAULT 0")
+        self._db.execute("CREATE INDEX IF NOT EXISTS messages_content_hash ON messages (content_hash)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._db.commit()
+
+    def handled(self, message_ids: Iterable[str]) -> set[str]:
+        """The ids among `message_ids` that need no further processing"""
+        message_ids = list(message_ids)
+        found = set()
+        with self._lock:
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(message_ids), 500):
+                chunk = message_ids[start:start + 500]
+                rows = self._db.execute(
+                    f"SELECT message_id FROM messages WHERE message_id IN ({','.join('?' * len(chunk))}) "
+                    "AND (status != ? OR attempts >= ?)",
+                    (*chunk, FAILED, self.max_attempts),
+                )
+                found.update(message_id for (message_id,) in rows)
+        return found
+
+    def duplicate_of(self, message_id: str, digest: str, thread_id: Optional[str] = None,
+                     forwarded: bool = False) -> Optional[str]:
+        """Id of a recently handled message with the same content, in the same thread or with either one a forward
+
+        A forward that was itself a copy stands in for nothing: its original decides.
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT message_id FROM messages WHERE content_hash = ? AND message_id != ? AND status != ? "
+                "AND updated_at >= ? AND (? OR (forwarded = 1 AND status != ?) OR thread_id = ?) LIMIT 1",
+                (digest, message_id, FAILED, time.time() - self.dedup_window, forwarded, DUPLICATE, thread_id),
+            ).fetchone()
+        return row[0] if row else None
+
+    def record(self, message_id: str, status: str, digest: Optional[str] = None, thread_id: Optional[str] = None,
+               forwarded: bool = False):
+        """Store the outcome of one processing attempt"""
+        with span("ledger.record", status=status), self._lock, self._db:
+            self._db.execute(
+                "INSERT INTO messages (message_id, content_hash, thread_id, forwarded, status, attempts, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, 1, ?) "
+                "ON CONFLICT (message_id) DO UPDATE SET content_hash = COALESCE(excluded.content_hash, content_hash), "
+                "thread_id = COALESCE(excluded.thread_id, thread_id), forwarded = excluded.forwarded, "
+                "status = excluded.status, attempts = attempts + 1, updated_at = excluded.updated_at",
+                (message_id, digest, thread_id, forwarded, status, time.time()),
+            )
+
+    def retryable(self) -> list[str]:
+        """Failed messages that have attempts left"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT message_id FROM messages WHERE status = ? AND attempts < ?", (FAILED, self.max_attempts)
+            ).fetchall()
+        return [message_id for (message_id,) in rows]
+
+    def checkpoint(self, key: str) -> Optional[str]:
+        """A stored sync position, e.g. the last Gmail history id"""
+        with self._lock:
+            row = self._db.execute("SELECT value FROM state WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def save_checkpoint(self, key: str, value: str):
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT INTO state (key, value) VALUES (?, ?) ON CONFLICT (key) DO UPDATE SET value = excluded.value",
+                (key, value),
+            )
+
+    def unmarked(self) -> list[str]:
+        """Handled messages that have not been marked read in Gmail yet"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT message_id FROM messages WHERE marked_read = 0 AND (status != ? OR attempts >= ?)",
+                (FAILED, self.max_attempts),
+            ).fetchall()
+        return [message_id for (message_id,) in rows]
+
+    def mark_read(self, message_ids: list[str]):
+        with self._lock, self._db:
+            self._db.executemany("UPDATE messages SET marked_read = 1 WHERE message_id = ?", [(i,) for i in message_ids])
+
+    def close(self):
+        with self._lock:
+            self._db.close()
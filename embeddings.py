@@ -0,0 +1,186 @@
+import os
+import re
+import zlib
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict
+import numpy as np
+from chromadb.api.types import Documents, EmbeddingFunction, Embeddings
+from chromadb.utils import embedding_functions
+from chromadb.utils.embedding_functions import register_embedding_function
+
+
+logger = logging.getLogger(__name__)
+
+# Embedding configuration
+EMBEDDING_BACKEND = os.environ.get("EVENTDB_EMBEDDING", "onnx")
+SENTENCE_TRANSFORMER_MODEL = os.environ.get("EVENTDB_EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+EMBEDDING_BATCH_SIZE = 64
+EMBEDDING_CACHE_SIZE = 4096
+
+_token = re.compile(r"[a-z0-9]+")
+
+
+@register_embedding_function
+class HashingEmbeddingFunction(EmbeddingFunction[Documents]):
+    """CPU-only fallback: signed feature hashing of words and character n-grams"""
+
+    def __init__(self, dimensions: int = 384, min_n: int = 3, max_n: int = 5):
+        self.dimensions = dimensions
+        self.min_n = min_n
+        self.max_n = max_n
+
+    def _features(self, text: str):
+        for word in _token.findall(text.lower()):
+            yield word
+            padded = f"<{word}>"
+            for n in range(self.min_n, self.max_n + 1):
+                for start in range(len(padded) - n + 1):
+                    yield padded[start:start + n]
+
+    def __call__(self, input: Documents) -> Embeddings:
+        embeddings = []
+        for text in input:
+            vector = np.zeros(self.dimensions, dtype=np.float32)
+            for feature in self._features(text):
+                h = zlib.crc32(feature.encode("utf-8"))
+                vector[h % self.dimensions] += 1.0 if h & 0x80000000 else -1.0
+            norm = np.linalg.norm(vector)
+            embeddings.append(vector / norm if norm else vector)
+        return embeddings
+
+    @staticmethod
+    def name() -> str:
+        return "eventdb_hashing"
+
+    def default_space(self):
+        return "cosine"
+
+    def get_config(self) -> Dict[str, Any]:
+        return {"dimensions": self.dimensions, "min_n": self.min_n, "max_n": self.max_n}
+
+    @staticmethod
+    def build_from_config(config: Dict[str, Any]) -> "HashingEmbeddingFunction":
+        return HashingEmbeddingFunction(**config)
+
+
+@register_embedding_function
+class StubEmbeddingFunction(EmbeddingFunction[Documents]):
+    """Deterministic, model-free vectors for benchmarks and offline runs; equal texts map to equal vectors"""
+
+    def __init__(self, dimensions: int = 16):
+        self.dimensions = dimensions
+
+    def __call__(self, input: Documents) -> Embeddings:
+        embeddings = []
+        for text in input:
+            digest = hashlib.sha256(text.encode("utf-8")).digest()
+            vector = np.frombuffer(digest, dtype=np.uint8)[:self.dimensions].astype(np.float32) + 1.0
+            embeddings.append(vector / np.linalg.norm(vector))
+        return embeddings
+
+    @staticmethod
+    def name() -> str:
+        return "eventdb_stub"
+
+    def get_config(self) -> Dict[str, Any]:
+        return {"dimensions": self.dimensions}
+
+    @staticmethod
+    def build_from_config(config: Dict[str, Any]) -> "StubEmbeddingFunction":
+        return StubEmbeddingFunction(**config)
+
+
+class CachedEmbeddingFunction(EmbeddingFunction[Documents]):
+    """Wraps a backend with an LRU cache keyed by text hash and batched encoding of the misses.
+
+    It reports the backend's name and config, so Chroma treats it as the backend
+    itself and existing collections keep opening without a conflict.
+    """
+
+    def __init__(self, backend: EmbeddingFunction, batch_size: int = EMBEDDING_BATCH_SIZE, max_entries: int = EMBEDDING_CACHE_SIZE):
+        self.backend = backend
+        self.batch_size = batch_size
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __call__(self, input: Documents) -> Embeddings:
+        keys = [hashlib.sha1(text.encode("utf-8")).hexdigest() for text in input]
+
+        missing = {}
+        with self._lock:
+            for key, text in zip(keys, input):
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+                    self.hits += 1
+                elif key not in missing:
+                    missing[key] = text
+                    self.misses += 1
+
+        missing_keys = list(missing)
+        computed = {}
+        for start in range(0, len(missing_keys), self.batch_size):
+            batch_keys = missing_keys[start:start + self.batch_size]
+            vectors = self.backend([missing[key] for key in batch_keys])
+            computed.update(zip(batch_keys, vectors))
+
+        with self._lock:
+            for key, vector in computed.items():
+                self._cache[key] = vector
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+            return [computed[key] if key in computed else self._cache[key] for key in keys]
+
+    def warm_up(self):
+        """Load the model now, so the first request does not pay for it"""
+        self.backend(["warm-up"])
+        logger.info(f"Embedding backend {self.backend.name()} is warm")
+
+    def name(self) -> str:
+        return self.backend.name()
+
+    def default_space(self):
+        return self.backend.default_space()
+
+    def supported_spaces(self):
+        return self.backend.supported_spaces()
+
+    def get_config(self) -> Dict[str, Any]:
+        return self.backend.get_config()
+
+    def is_legacy(self) -> bool:
+        return self.backend.is_legacy()
+
+    @staticmethod
+    def build_from_config(config: Dict[str, Any]) -> "CachedEmbeddingFunction":
+        """Rebuild from a collection's stored embedding function config ({"name": ..., "config": ...})
+
+        Collections record the backend's name and config, so the backend comes from
+        Chroma's registry and is wrapped with a fresh cache.
+        """
+        return CachedEmbeddingFunction(embedding_functions.config_to_embedding_function(config))
+
+
+def make_embedding_function(backend: str = EMBEDDING_BACKEND) -> CachedEmbeddingFunction:
+    """Build the configured eventdb embedding backend wrapped with the cache.
+
+    `onnx` is Chroma's default MiniLM model (the one existing collections were built
+    with), `sentence-transformers` needs the sentence-transformers package, `hashing`
+    needs nothing but numpy, and `stub` is for offline runs.
+    """
+    if backend == "onnx":
+        function = embedding_functions.DefaultEmbeddingFunction()
+    elif backend == "sentence-transformers":
+        function = embedding_functions.SentenceTransformerEmbeddingFunction(model_name=SENTENCE_TRANSFORMER_MODEL)
+    elif backend == "hashing":
+        function = HashingEmbeddingFunction()
+    elif backend == "stub":
+        function = StubEmbeddingFunction()
+    else:
+        raise ValueError(f"Unknown embedding backend: {backend}")
+    return CachedEmbeddingFunction(function)
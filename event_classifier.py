@@ -0,0 +1,111 @@
+import re
+import json
+import math
+import logging
+from typing import Iterable, Literal
+
+
+logger = logging.getLogger(__name__)
+
+# Below this score a message is rejected without an LLM call. At 0.1 only messages
+# with no date, time or meeting evidence at all (or bulk-mail markers) are rejected;
+# check changes with `python -m benchmarks.eval_event_classifier`
+REJECT_BELOW = 0.1
+
+# There is no "accept": the gate's cleaned description is what the later prompts
+# work from, so every message that is not rejected goes through it
+Decision = Literal["reject", "escalate"]
+
+_weekday = r"(?:monday|tuesday|wednesday|thursday|friday|saturday|sunday|mon|tue|tues|wed|thu|thur|thurs|fri|sat|sun)"
+_month = r"(?:jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec)[a-z]*"
+
+# (name, pattern, weight): positive weights are evidence of an event, negative of bulk mail
+FEATURES = [
+    ("weekday", re.compile(rf"\b{_weekday}\b"), 1.5),
+    ("relative_day", re.compile(r"\b(?:today|tonight|tomorrow|next week|this week|next month|weekend)\b"), 1.5),
+    ("month_date", re.compile(rf"\b(?:{_month}\s+\d{{1,2}}(?:st|nd|rd|th)?|\d{{1,2}}(?:st|nd|rd|th)?\s+(?:of\s+)?{_month})\b"), 1.5),
+    ("numeric_date", re.compile(r"\b\d{4}-\d{2}-\d{2}\b|\b\d{1,2}/\d{1,2}(?:/\d{2,4})?\b"), 1.5),
+    ("clock_time", re.compile(r"\b\d{1,2}(?::\d{2})?\s*(?:am|pm)\b|\b[01]?\d:[0-5]\d\b|\b2[0-3]:[0-5]\d\b|\b(?:noon|midnight)\b"), 1.5),
+    ("duration", re.compile(r"\b\d+(?:\.\d+)?\s*(?:h|hr|hrs|hours?|m|mins?|minutes?)\b|\bhalf an hour\b|\ban hour\b"), 0.75),
+    ("meeting_word", re.compile(r"\b(?:meet(?:ing)?s?|call|sync|standup|stand-up|appointment|interview|lunch|dinner|breakfast|coffee|review|retro|demo|workshop|session|class|conference|offsite|kickoff|catch up|1:1|one-on-one|event|party|webinar)\b"), 1.0),
+    ("schedule_verb", re.compile(r"\b(?:schedule|book|set up|arrange|reschedule|move|postpone|push|shift|cancel|invite|calendar|rsvp)\b"), 1.25),
+    ("bulk_mail", re.compile(r"\b(?:unsubscribe|newsletter|promotion|promo code|% off|sale ends|receipt|invoice|order #|order number|shipped|tracking number|verification code|password reset|security alert|do not reply|no-reply)\b"), -2.5),
+]
+
+# Logistic bias: with no evidence at all a message scores about 0.05
+BIAS = -3.0
+
+
+def features(text: str) -> dict[str, int]:
+    """Which features fire on `text` (1) or not (0)"""
+    lowered = text.lower()
+    return {name: int(bool(pattern.search(lowered))) for name, pattern, _ in FEATURES}
+
+
+def score(text: str) -> float:
+    """Likelihood-style score in [0, 1] that `text` is a calendar request"""
+    fired = features(text)
+    logit = BIAS + sum(weight for name, _, weight in FEATURES if fired[name])
+    return 1.0 / (1.0 + math.exp(-logit))
+
+
+class EventPreClassifier:
+    """CPU-only stage in front of the LLM gate: rejects obvious non-events, escalates the rest.
+
+    `reject_below` trades recall (events wrongly dropped) for LLM calls saved.
+    """
+
+    def __init__(self, reject_below: float = REJECT_BELOW):
+        self.reject_below = reject_below
+
+    def decide(self, text: str) -> Decision:
+        value = score(text)
+        decision = "reject" if value < self.reject_below else "escalate"
+        logger.debug(f"Pre-classifier score {value:.2f} -> {decision}")
+        return decision
+
+
+def load_corpus(path: str) -> list[tuple[str, bool]]:
+    """Read a JSONL corpus of {"text": ..., "is_event": ...} records"""
+    with open(path, encoding="utf-8") as f:
+        return [(record["text"], bool(record["is_event"])) for record in map(json.loads, f) if record]
+
+
+def evaluate(classifier: EventPreClassifier, corpus: Iterable[tuple[str, bool]]) -> dict:
+    """Score a classifier against labelled examples.
+
+    `reject_recall` is the share of real events that survive the pre-classifier (the
+    number that must stay ~1.0), `reject_precision` the share of rejections that
+    really were non-events, and `llm_calls_saved` the share of messages that never
+    reach the gate.
+    """
+    counts = {(decision, label): 0 for decision in ("reject", "escalate") for label in (True, False)}
+    for text, is_event in corpus:
+        counts[(classifier.decide(text), is_event)] += 1
+
+    events = sum(count for (_, label), count in counts.items() if label)
+    rejected = counts[("reject", True)] + counts[("reject", False)]
+    total = sum(counts.values())
+    return {
+        "examples": total,
+        "events": events,
+        "rejected": rejected,
+        "escalated": counts[("escalate", True)] + counts[("escalate", False)],
+        "missed_events": counts[("reject", True)],
+        "reject_recall": 1.0 - counts[("reject", True)] / events if events else 1.0,
+        "reject_precision": counts[("reject", False)] / rejected if rejected else 1.0,
+        "llm_calls_saved": rejected / total if total else 0.0,
+    }
+
+
+def tune(corpus: list[tuple[str, bool]], min_recall: float = 1.0) -> EventPreClassifier:
+    """Pick the most aggressive reject threshold that still meets the recall target"""
+    scores = sorted({round(score(text), 4) for text, _ in corpus})
+    # Candidate cut points sit just above each observed score
+    cuts = [0.0] + [value + 1e-4 for value in scores]
+
+    reject_below = 0.0
+    for cut in cuts:
+        if evaluate(EventPreClassifier(cut), corpus)["reject_recall"] >= min_recall:
+            reject_below = cut
+    return EventPreClassifier(reject_below)
@@ -0,0 +1,135 @@
+import os
+import csv
+import sqlite3
+import logging
+import threading
+from typing import Iterator, Optional
+from tracing import span
+
+
+logger = logging.getLogger(__name__)
+
+INDEX_PATH = "eventdb/event_index.sqlite3"
+LEGACY_CSV_NAME = "df_db.csv"
+
+# Bumped once the legacy CSV has been imported so an emptied index is not re-filled from it
+SCHEMA_VERSION = 1
+
+
+def _seq(event_id: str) -> int:
+    """Ids keep the historical `id<N>` shape; N is the row's primary key"""
+    if not event_id.startswith("id") or not event_id[2:].isdigit():
+        raise ValueError(f"Malformed event id: {event_id!r}")
+    return int(event_id[2:])
+
+
+class EventIndex:
+    """id -> description store backing the `eventdb` collection.
+
+    Backed by SQLite in WAL mode with synchronous=FULL, so appends and in-place
+    updates are single-row transactions that survive a crash, instead of a full
+    CSV rewrite per event.
+    """
+
+    def __init__(self, path: str = INDEX_PATH, legacy_csv_path: Optional[str] = None):
+        self.path = path
+        if legacy_csv_path is None:
+            legacy_csv_path = os.path.join(os.path.dirname(path), LEGACY_CSV_NAME)
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=FULL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS events (seq INTEGER PRIMARY KEY AUTOINCREMENT, description TEXT NOT NULL)"
+        )
+        self._db.commit()
+
+        (version,) = self._db.execute("PRAGMA user_version").fetchone()
+        if version < SCHEMA_VERSION:
+            if os.path.exists(legacy_csv_path):
+                self.migrate_from_csv(legacy_csv_path)
+            self._db.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+            self._db.commit()
+
+    def migrate_from_csv(self, csv_path: str) -> int:
+        """Import the `ids,description` rows of the old pandas-managed CSV, keeping their ids"""
+        with open(csv_path, newline="", encoding="utf-8") as f:
+            rows = [(_seq(row["ids"]), row["description"]) for row in csv.DictReader(f) if row.get("ids")]
+        with self._lock, self._db:
+            self._db.executemany("INSERT OR REPLACE INTO events (seq, description) VALUES (?, ?)", rows)
+        logger.info(f"Migrated {len(rows)} record(s) from {csv_path} to {self.path}")
+        return len(rows)
+
+    def append(self, description: str) -> str:
+        """Store a new description and return its id"""
+        return self.append_many([description])[0]
+
+    def append_many(self, descriptions: list[str]) -> list[str]:
+        """Store several descriptions in one transaction and return their ids in order"""
+        ids = []
+        with span("index.append", rows=len(descriptions), bytes=sum(len(d) for d in descriptions)), self._lock, self._db:
+            for description in descriptions:
+                cursor = self._db.execute("INSERT INTO events (description) VALUES (?)", (description,))
+                ids.append(f"id{cursor.lastrowid}")
+        return ids
+
+    def update(self, event_id: str, description: str):
+        """Replace the description stored under `event_id`"""
+        self.update_many([(event_id, description)])
+
+    def update_many(self, updates: list[tuple[str, str]]):
+        """Replace several descriptions in one transaction"""
+        with span("index.update", rows=len(updates), bytes=sum(len(d) for _, d in updates)), self._lock, self._db:
+            self._db.executemany(
+                "UPDATE events SET description = ? WHERE seq = ?",
+                [(description, _seq(event_id)) for event_id, description in updates],
+            )
+
+    def delete_many(self, event_ids: list[str]):
+        """Remove records, e.g. to roll back an append whose Chroma write failed"""
+        with span("index.delete", rows=len(event_ids)), self._lock, self._db:
+            self._db.executemany("DELETE FROM events WHERE seq = ?", [(_seq(event_id),) for event_id in event_ids])
+
+    def get(self, event_id: str) -> Optional[str]:
+        with self._lock:
+            row = self._db.execute("SELECT description FROM events WHERE seq = ?", (_seq(event_id),)).fetchone()
+        return row[0] if row else None
+
+    def items(self) -> Iterator[tuple[str, str]]:
+        with self._lock:
+            rows = self._db.execute("SELECT seq, description FROM events ORDER BY seq").fetchall()
+        for seq, description in rows:
+            yield f"id{seq}", description
+
+    def __len__(self) -> int:
+        with self._lock:
+            (count,) = self._db.execute("SELECT COUNT(*) FROM events").fetchone()
+        return count
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def open_index(path: str = INDEX_PATH) -> EventIndex:
+    """Return the process-wide EventIndex for `path`.
+
+    Passing the old `eventdb/df_db.csv` path opens the SQLite index next to it and
+    migrates the CSV on first use.
+    """
+    legacy_csv_path = None
+    if path.endswith(".csv"):
+        legacy_csv_path = path
+        path = os.path.join(os.path.dirname(path), os.path.basename(INDEX_PATH))
+    with _indexes_lock:
+        if path not in _indexes:
+            _indexes[path] = EventIndex(path, legacy_csv_path=legacy_csv_path)
+        return _indexes[path]
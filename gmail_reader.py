@@ -1,9 +1,16 @@
 import os.path
+import re
+import json
 import base64
+from html.parser import HTMLParser
+from typing import Callable, Iterator, Optional
+from pydantic import BaseModel, Field
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
+from scheduler import GMAIL_UNITS_PER_CALL, is_retryable, scheduler, status_of
+from tracing import enabled as tracing_enabled, span
 import logging
 
 
@@ -16,19 +23,65 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Gmail API Configuration
+SCOPES = ['https://www.googleapis.com/auth/gmail.readonly', 'https://www.googleapis.com/auth/gmail.modify']
+SERVICE_ACCOUNT_FILE = '/Users/mehrad/Programming/agents/client_secret_58170239586-uid3pfgdius0eeordf4q4adjc3mbjgbd.apps.googleusercontent.com.json'
+TOKEN_FILE = 'token.json'
 
-def readEmails():
-    # Gmail API Configuration
-    SCOPES = ['https://www.googleapis.com/auth/gmail.readonly', 'https://www.googleapis.com/auth/gmail.modify']
-    SERVICE_ACCOUNT_FILE = '/Users/mehrad/Programming/agents/client_secret_58170239586-uid3pfgdius0eeordf4q4adjc3mbjgbd.apps.googleusercontent.com.json'
+# The batch endpoint accepts up to 100 calls, Google recommends staying at or below 50
+BATCH_SIZE = 50
+PAGE_SIZE = 100
+# batchModify accepts up to 1000 ids and costs 50 quota units per call
+MODIFY_BATCH_SIZE = 1000
+MODIFY_UNITS_PER_CALL = 50
+# history.list costs 2 quota units and getProfile 1; history pages hold up to 500 records
+HISTORY_UNITS_PER_CALL = 2
+PROFILE_UNITS_PER_CALL = 1
+HISTORY_PAGE_SIZE = 500
+# Headers fetched with format=metadata, before deciding whether a message needs its body
+METADATA_HEADERS = ['Subject', 'From']
+# Messages carrying one of these labels are never calendar requests
+EXCLUDED_LABELS = {'SENT', 'DRAFT', 'SPAM', 'TRASH', 'CHAT'}
+# Only this much of a body part is decoded; calendar requests are short, signatures and newsletters are not
+MAX_BODY_BYTES = 32 * 1024
+
+# Where a quoted reply chain starts: "On <date>, <name> wrote:", possibly wrapped. Outlook's
+# "-----Original Message-----" and underscore separators also open forwards, so they are not trimmed.
+_reply_header = re.compile(r"^On\b[^\n]*?(\n(?!On\b)[^\n]*?)?\bwrote:[ \t]*$", re.I | re.M)
+_charset = re.compile(r'charset="?([\w.-]+)"?', re.I)
+_blank_lines = re.compile(r"\n{3,}")
+
+_service = None
+
+
+class EmailMessage(BaseModel):
+    """A parsed Gmail message"""
+
+    id: str = Field(description="Gmail message id")
+    thread_id: Optional[str] = Field(default=None, description="Gmail thread id")
+    subject: Optional[str] = Field(default=None, description="Subject header")
+    sender: Optional[str] = Field(default=None, description="From header")
+    body: Optional[str] = Field(default=None, description="Decoded message body")
+    labels: list[str] = Field(default_factory=list, description="Gmail label ids")
+
+
+class HistoryExpired(Exception):
+    """The checkpointed history id is too old for `history.list`, a full resync is needed"""
+
+
+def get_gmail_service():
+    """Build the Gmail service once and reuse it for the lifetime of the process"""
+    global _service
+    if _service is not None:
+        return _service
 
     # Variable creds will store the user access token.
     # If no valid token found, we will create one.
     creds = None
 
-    # The file token.pickle contains the user access token.
-    if os.path.exists('token.json'):
-        creds = Credentials.from_authorized_user_file('token.json', SCOPES)
+    # The file token.json contains the user access token.
+    if os.path.exists(TOKEN_FILE):
+        creds = Credentials.from_authorized_user_file(TOKEN_FILE, SCOPES)
         # If there are no (valid) credentials available, let the user log in.
     if not creds or not creds.valid:
         if creds and creds.expired and creds.refresh_token:
@@ -38,47 +91,380 @@ def readEmails():
                 SERVICE_ACCOUNT_FILE, SCOPES)
             creds = flow.run_local_server(port=0)
         # Save the credentials for the next run
-        with open('token.json', 'w') as token:
+        with open(TOKEN_FILE, 'w') as token:
             token.write(creds.to_json())
 
     # Connect to the Gmail API
-    service = build('gmail', 'v1', credentials=creds)
+    _service = build('gmail', 'v1', credentials=creds)
+    return _service
+
+
+class _TextExtractor(HTMLParser):
+    """Visible text of an HTML body: scripts and styles dropped, block elements on their own lines"""
+
+    BLOCK_TAGS = {'p', 'div', 'br', 'li', 'tr', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'blockquote', 'table'}
+    SKIP_TAGS = {'script', 'style', 'head', 'title'}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.chunks = []
+        self._skipping = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP_TAGS:
+            self._skipping += 1
+        elif tag in self.BLOCK_TAGS:
+            self.chunks.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP_TAGS:
+            self._skipping = max(0, self._skipping - 1)
+        elif tag in self.BLOCK_TAGS:
+            self.chunks.append("\n")
+
+    def handle_data(self, data):
+        if not self._skipping:
+            self.chunks.append(data)
+
+    def text(self) -> str:
+        lines = (" ".join(line.split()) for line in "".join(self.chunks).splitlines())
+        return _blank_lines.sub("\n\n", "\n".join(lines)).strip()
+
+
+def html_to_text(html: str) -> str:
+    extractor = _TextExtractor()
+    extractor.feed(html)
+    extractor.close()
+    return extractor.text()
+
+
+def trim_quoted(text: str) -> str:
+    """Drop the quoted reply chain under a reply, keeping the new text (and whole forwards)"""
+    match = _reply_header.search(text)
+    trimmed = text[:match.start()] if match else text
+    trimmed = "\n".join(line for line in trimmed.splitlines() if not line.lstrip().startswith(">")).strip()
+    # A message that is nothing but a quote is kept as it is
+    return trimmed or text.strip()
+
+
+def _header(part: dict, name: str) -> Optional[str]:
+    for header in part.get('headers', []):
+        if header['name'].lower() == name:
+            return header['value']
+    return None
+
+
+def _decode_part(part: dict, max_bytes: int) -> str:
+    """Base64url-decode at most `max_bytes` of a part's inline data"""
+    data = part['body']['data']
+    # Four base64 characters carry three bytes, so only the needed prefix is decoded
+    limit = -(-max_bytes // 3) * 4
+    if len(data) > limit:
+        data = data[:limit]
+    raw = base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))[:max_bytes]
+    charset = _charset.search(_header(part, 'content-type') or "")
+    try:
+        # A cut in the middle of a multi-byte character is dropped rather than garbled
+        return raw.decode(charset.group(1) if charset else "utf-8", errors="ignore" if len(raw) == max_bytes else "replace")
+    except LookupError:
+        return raw.decode("utf-8", errors="replace")
+
+
+def _text_parts(payload: dict) -> Iterator[dict]:
+    """Depth-first walk over the inline text/plain and text/html parts; attachments are never decoded"""
+    stack = [payload]
+    while stack:
+        part = stack.pop()
+        children = part.get('parts')
+        if children:
+            stack.extend(reversed(children))
+            continue
+        body = part.get('body', {})
+        # Attachments carry a filename or only an attachmentId, their data is not in the response
+        if part.get('filename') or not body.get('data'):
+            continue
+        if part.get('mimeType', '').lower() in ('text/plain', 'text/html'):
+            yield part
+
+
+def extract_body(payload: dict, max_bytes: int = MAX_BODY_BYTES) -> str:
+    """Readable body of a message payload: the first text/plain part, else the first text/html part
+    stripped to text, with the quoted reply chain trimmed; "" when there is neither"""
+    html_part = None
+    for part in _text_parts(payload):
+        if part['mimeType'].lower() == 'text/plain':
+            return trim_quoted(_decode_part(part, max_bytes))
+        if html_part is None:
+            html_part = part
+    if html_part is not None:
+        return trim_quoted(html_to_text(_decode_part(html_part, max_bytes)))
+    return ""
+
+
+def parse_message(txt: dict) -> EmailMessage:
+    """Turn a `messages().get` response into an EmailMessage"""
+    # Get value of 'payload' from dictionary 'txt'
+    payload = txt['payload']
+    subject = sender = None
+
+    # Look for Subject and Sender Email in the headers
+    for d in payload.get('headers', []):
+        if d['name'] == 'Subject':
+            subject = d['value']
+        if d['name'] == 'From':
+            sender = d['value']
+
+    # A format=metadata response carries headers only, so its body stays None
+    description = None
+    if 'parts' in payload or 'body' in payload:
+        description = extract_body(payload)
 
-    # request a list of all the messages
-    result = service.users().messages().list(maxResults=1, userId='me', q='is:unread').execute()
+    return EmailMessage(
+        id=txt['id'],
+        thread_id=txt.get('threadId'),
+        subject=subject,
+        sender=sender,
+        body=description,
+        labels=txt.get('labelIds', []),
+    )
 
-    # We can also pass maxResults to get any number of emails. Like this:
-    messages = result.get('messages')
-    # messages is a list of dictionaries where each dictionary contains a message id.
 
-    # iterate through all the messages
-    for msg in messages:
-        # Get the message from its id
-        txt = service.users().messages().get(userId='me', id=msg['id']).execute()
+def list_message_ids(service, query: str = 'is:unread', max_messages: Optional[int] = None) -> Iterator[str]:
+    """Page through `messages().list` and yield every matching message id"""
+    page_token = None
+    listed = 0
+    while True:
+        page_size = PAGE_SIZE if max_messages is None else min(PAGE_SIZE, max_messages - listed)
+        with span("google.gmail.messages.list", page_size=page_size) as current:
+            request = service.users().messages().list(
+                userId='me', q=query, maxResults=page_size, pageToken=page_token
+            )
+            result = scheduler.call("gmail", request.execute, cost=GMAIL_UNITS_PER_CALL)
+            current.set(messages=len(result.get('messages', [])))
 
-        # Use try-except to avoid any Errors
+        # messages is a list of dictionaries where each dictionary contains a message id.
+        for msg in result.get('messages', []):
+            yield msg['id']
+            listed += 1
+
+        page_token = result.get('nextPageToken')
+        if not page_token or (max_messages is not None and listed >= max_messages):
+            return
+
+
+def fetch_messages(service, message_ids: list[str], format: str = 'full',
+                   failed: Optional[set[str]] = None) -> list[EmailMessage]:
+    """Fetch a chunk of messages through one Gmail batch request, keeping the input order
+
+    Parts of the batch that failed transiently (429, 5xx) are fetched again one by
+    one through the scheduler; ids that still fail are added to `failed`. Missing
+    messages are left out, and stay unread.
+    """
+    responses, errors = {}, {}
+
+    def _collect(request_id, response, exception):
+        if exception is not None:
+            errors[request_id] = exception
+            return
+        responses[request_id] = response
+
+    options = {'format': format}
+    if format == 'metadata':
+        options['metadataHeaders'] = METADATA_HEADERS
+    with span("google.gmail.batch_get", messages=len(message_ids), format=format) as current:
+        batch = service.new_batch_http_request(callback=_collect)
+        for message_id in message_ids:
+            batch.add(service.users().messages().get(userId='me', id=message_id, **options), request_id=message_id)
+        # Each call in the batch is metered separately against the Gmail quota
+        scheduler.call("gmail", batch.execute, cost=GMAIL_UNITS_PER_CALL * len(message_ids))
+        current.set(failed_parts=len(errors))
+        if tracing_enabled():
+            current.set(bytes=sum(len(json.dumps(response)) for response in responses.values()))
+
+    # The scheduler only retries the batch as a whole, not the parts that failed inside it
+    for message_id, error in errors.items():
+        if is_retryable(error):
+            try:
+                with span("google.gmail.messages.get", format=format):
+                    request = service.users().messages().get(userId='me', id=message_id, **options)
+                    responses[message_id] = scheduler.call("gmail", request.execute, cost=GMAIL_UNITS_PER_CALL)
+                continue
+            except Exception as retry_error:
+                error = retry_error
+                if failed is not None and is_retryable(error):
+                    failed.add(message_id)
+        logger.warning(f"Failed to fetch message {message_id}, leaving it unread: {error}")
+
+    messages = []
+    for message_id in message_ids:
+        if message_id not in responses:
+            continue
+        # Use try-except so one malformed message does not stop the batch
         try:
-            # Get value of 'payload' from dictionary 'txt'
-            payload = txt['payload']
-            headers = payload['headers']
-
-            # Look for Subject and Sender Email in the headers
-            for d in headers:
-                if d['name'] == 'Subject':
-                    subject = d['value']
-                if d['name'] == 'From':
-                    sender = d['value']
-
-            # The Body of the message is in Encrypted format. So, we have to decode it.
-            # Get the data and decode it with base 64 decoder.
-            parts = payload.get('parts')[0]
-            data = parts['body']['data']
-            data = data.replace("-", "+").replace("_", "/")
-            decoded_data = base64.urlsafe_b64decode(data)
-            description = decoded_data.decode("utf-8")
-            logger.info(f"Extracted the email: \n{description}")
-            return description
+            messages.append(parse_message(responses[message_id]))
         except Exception as error:
-            logger.info(f"An error occurred: {error}")
+            logger.info(f"An error occurred while parsing message {message_id}: {error}")
+    return messages
+
+
+def iter_unread_emails(
+    query: str = 'is:unread',
+    batch_size: int = BATCH_SIZE,
+    max_messages: Optional[int] = None,
+    service=None,
+    skip: Optional[Callable[[list[str]], set[str]]] = None,
+) -> Iterator[EmailMessage]:
+    """Yield every unread message, fetching bodies in batches of `batch_size`
+
+    `skip` receives each batch of listed ids and returns those not to fetch,
+    e.g. messages that were already handled.
+    """
+    service = service or get_gmail_service()
+
+    def fetch(chunk: list[str]) -> list[EmailMessage]:
+        if skip is not None:
+            skipped = skip(chunk)
+            chunk = [message_id for message_id in chunk if message_id not in skipped]
+        return fetch_messages(service, chunk) if chunk else []
+
+    chunk = []
+    for message_id in list_message_ids(service, query=query, max_messages=max_messages):
+        chunk.append(message_id)
+        if len(chunk) >= batch_size:
+            yield from fetch(chunk)
+            chunk = []
+    if chunk:
+        yield from fetch(chunk)
+
+
+def current_history_id(service) -> str:
+    """The mailbox's latest history id, from `users.getProfile`"""
+    with span("google.gmail.get_profile"):
+        request = service.users().getProfile(userId='me')
+        return str(scheduler.call("gmail", request.execute, cost=PROFILE_UNITS_PER_CALL)['historyId'])
+
+
+def list_history(service, start_history_id: str) -> tuple[list[str], str]:
+    """Ids of inbox messages added after `start_history_id`, and the history id to resume from
+
+    Raises HistoryExpired when Gmail no longer has history that old (404).
+    """
+    message_ids, seen = [], set()
+    latest = start_history_id
+    page_token = None
+    while True:
+        with span("google.gmail.history.list") as current:
+            request = service.users().history().list(
+                userId='me', startHistoryId=start_history_id, historyTypes=['messageAdded'], labelId='INBOX',
+                maxResults=HISTORY_PAGE_SIZE, pageToken=page_token,
+            )
+            try:
+                result = scheduler.call("gmail", request.execute, cost=HISTORY_UNITS_PER_CALL)
+            except Exception as error:
+                if status_of(error) == 404:
+                    raise HistoryExpired(f"History id {start_history_id} has expired") from error
+                raise
+            current.set(records=len(result.get('history', [])))
+
+        for record in result.get('history', []):
+            for added in record.get('messagesAdded', []):
+                message = added['message']
+                # History records carry the labels the message was added with, enough to drop sent mail and drafts
+                labels = set(message.get('labelIds', ['UNREAD']))
+                if message['id'] in seen or 'UNREAD' not in labels or labels & EXCLUDED_LABELS:
+                    continue
+                seen.add(message['id'])
+                message_ids.append(message['id'])
+
+        latest = result.get('historyId', latest)
+        page_token = result.get('nextPageToken')
+        if not page_token:
+            return message_ids, str(latest)
+
+
+def needs_body(message: EmailMessage) -> bool:
+    """Whether a message fetched with format=metadata is still unread inbox mail worth fetching in full"""
+    labels = set(message.labels)
+    return 'UNREAD' in labels and not labels & EXCLUDED_LABELS
+
+
+class HistorySync:
+    """Incremental intake of new unread messages through `users.history.list`
+
+    Each poll lists only the messages added since `history_id`, fetches them with
+    format=metadata and fetches the full message only for those still unread and
+    not skipped. Without a history id, or when Gmail answers 404 because it is too
+    old, the poll falls back to a full `is:unread` scan. `history_id` advances
+    once a poll has been consumed completely, so the caller checkpoints it then.
+    Messages whose fetch kept failing are listed again on the next poll.
+    """
+
+    def __init__(self, history_id: Optional[str] = None, service=None, batch_size: int = BATCH_SIZE):
+        self.history_id = history_id
+        self.service = service
+        self.batch_size = batch_size
+        self.full_syncs = 0
+        self.unfetched = set()
+
+    def poll(
+        self,
+        skip: Optional[Callable[[list[str]], set[str]]] = None,
+        retry_ids: Optional[list[str]] = None,
+    ) -> Iterator[EmailMessage]:
+        """Yield the new unread messages; `retry_ids` are messages to look at again, e.g. failed ones"""
+        service = self.service or get_gmail_service()
+
+        # Step 1: Find the candidate ids
+        message_ids, latest, check_labels = None, None, True
+        if self.history_id is not None:
+            try:
+                message_ids, latest = list_history(service, self.history_id)
+            except HistoryExpired as error:
+                logger.warning(f"{error}, falling back to a full resync")
+        if message_ids is None:
+            # Read the history id first, so nothing added during the scan is missed next time
+            latest = current_history_id(service)
+            message_ids = list(list_message_ids(service))
+            check_labels = False
+            self.full_syncs += 1
+        retry_ids = [*(retry_ids or []), *sorted(self.unfetched)]
+        self.unfetched = set()
+        for message_id in retry_ids:
+            if message_id not in message_ids:
+                message_ids.append(message_id)
+
+        # Step 2: Fetch metadata, then bodies, one batch at a time
+        for start in range(0, len(message_ids), self.batch_size):
+            chunk = message_ids[start:start + self.batch_size]
+            if skip is not None:
+                skipped = skip(chunk)
+                chunk = [message_id for message_id in chunk if message_id not in skipped]
+            if chunk and check_labels:
+                chunk = [message.id for message in fetch_messages(service, chunk, format='metadata', failed=self.unfetched)
+                         if needs_body(message)]
+            if chunk:
+                yield from fetch_messages(service, chunk, failed=self.unfetched)
+
+        self.history_id = latest
+
+
+def mark_read(message_ids: list[str], service=None, add_label_ids: Optional[list[str]] = None):
+    """Remove the UNREAD label (and optionally add labels) in bulk with `messages().batchModify`"""
+    service = service or get_gmail_service()
+    body = {'removeLabelIds': ['UNREAD']}
+    if add_label_ids:
+        body['addLabelIds'] = add_label_ids
+    for start in range(0, len(message_ids), MODIFY_BATCH_SIZE):
+        chunk = message_ids[start:start + MODIFY_BATCH_SIZE]
+        with span("google.gmail.messages.batch_modify", messages=len(chunk)):
+            request = service.users().messages().batchModify(userId='me', body={**body, 'ids': chunk})
+            scheduler.call("gmail", request.execute, cost=MODIFY_UNITS_PER_CALL)
+    logger.info(f"Marked {len(message_ids)} message(s) read")
 
 
+def readEmails() -> str:
+    """Return the body of the most recent unread email, "" when there is none"""
+    for email in iter_unread_emails(max_messages=1):
+        logger.info(f"Extracted the email: \n{email.body}")
+        return email.body or ""
+    return ""
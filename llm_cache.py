@@ -0,0 +1,242 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from typing import Callable, Optional, Type
+from pydantic import BaseModel
+from scheduler import scheduler
+from token_budget import TokenLedger
+from tracing import record_usage, span
+
+
+logger = logging.getLogger(__name__)
+
+# Cache configuration
+CACHE_PATH = os.environ.get("LLM_CACHE_PATH", ".llm_cache.sqlite3")
+CACHE_TTL_SECONDS = float(os.environ.get("LLM_CACHE_TTL", 7 * 24 * 3600))
+CACHE_DISABLED = os.environ.get("LLM_CACHE_DISABLED", "").lower() in ("1", "true", "yes")
+MAX_MEMORY_ENTRIES = 512
+MAX_DISK_ENTRIES = 20000
+
+_whitespace = re.compile(r"\s+")
+
+
+def _normalize(text: str) -> str:
+    """Collapse whitespace so re-indented prompts and re-wrapped forwards hash the same"""
+    return _whitespace.sub(" ", text).strip()
+
+
+def _next_midnight(now: float) -> float:
+    tomorrow = datetime.fromtimestamp(now).date() + timedelta(days=1)
+    return datetime.combine(tomorrow, datetime.min.time()).timestamp()
+
+
+class LLMCache:
+    """Two-tier (in-memory LRU + SQLite) cache of parsed structured-output responses.
+
+    Entries are keyed on a hash of (model, normalized messages, response_format schema)
+    and hold the parsed Pydantic result as JSON. Day-scoped entries, i.e. those whose
+    prompt embeds today's date, also key on the date and expire at midnight.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = CACHE_PATH,
+        ttl_seconds: float = CACHE_TTL_SECONDS,
+        max_memory_entries: int = MAX_MEMORY_ENTRIES,
+        max_disk_entries: int = MAX_DISK_ENTRIES,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS llm_cache_accessed ON llm_cache (accessed_at)")
+            self._db.commit()
+
+    @staticmethod
+    def make_key(model: str, messages: list[dict], response_format: Type[BaseModel], day_scoped: bool = False) -> str:
+        """Stable hash of everything that determines the parsed response"""
+        payload = {
+            "model": model,
+            "messages": [(m["role"], _normalize(m["content"])) for m in messages],
+            "response_format": [response_format.__name__, response_format.model_json_schema()],
+            "day": date.today().isoformat() if day_scoped else None,
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def get(self, key: str, response_format: Type[BaseModel]) -> Optional[BaseModel]:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return response_format.model_validate_json(value)
+                del self._memory[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    value, expires_at = row
+                    if expires_at > now:
+                        self._db.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key))
+                        self._db.commit()
+                        self._remember(key, expires_at, value)
+                        self.hits += 1
+                        return response_format.model_validate_json(value)
+                    self._db.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                    self._db.commit()
+
+            self.misses += 1
+            return None
+
+    def put(self, key: str, value: BaseModel, day_scoped: bool = False):
+        now = time.time()
+        expires_at = now + self.ttl_seconds
+        if day_scoped:
+            # A prompt that says "Today is ..." must not be answered from yesterday's cache
+            expires_at = min(expires_at, _next_midnight(now))
+        serialized = value.model_dump_json()
+
+        with self._lock:
+            self._remember(key, expires_at, serialized)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                    (key, serialized, expires_at, now),
+                )
+                self._evict_disk(now)
+                self._db.commit()
+
+    def _remember(self, key: str, expires_at: float, value: str):
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def _evict_disk(self, now: float):
+        self._db.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (now,))
+        (count,) = self._db.execute("SELECT COUNT(*) FROM llm_cache").fetchone()
+        if count > self.max_disk_entries:
+            self._db.execute(
+                "DELETE FROM llm_cache WHERE key IN (SELECT key FROM llm_cache ORDER BY accessed_at LIMIT ?)",
+                (count - self.max_disk_entries,),
+            )
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM llm_cache")
+                self._db.commit()
+
+    def parse(self, client, model: str, messages: list[dict], response_format: Type[BaseModel], day_scoped: bool = False,
+              on_usage: Optional[Callable] = None):
+        """Cached `client.beta.chat.completions.parse`, returning the parsed result
+
+        The request goes through the shared scheduler (rate limit, retries), and
+        identical requests in flight at the same time share one response.
+        `on_usage` receives the API usage object whenever a request is actually sent.
+        """
+        with span("llm.parse", model=model, response_format=response_format.__name__) as current:
+            key = self.make_key(model, messages, response_format, day_scoped)
+            cached = self.get(key, response_format)
+            current.set(cache_hit=cached is not None)
+            if cached is not None:
+                logger.info(f"LLM cache hit for {response_format.__name__}")
+                return cached
+
+            completion, sent = scheduler.submit(
+                "openrouter",
+                lambda: client.beta.chat.completions.parse(
+                    model=model,
+                    messages=messages,
+                    response_format=response_format,
+                ),
+                key=key,
+            )
+            result = completion.choices[0].message.parsed
+            if not sent:
+                # Another caller's identical request answered this one; its usage is already counted
+                current.set(coalesced=True)
+                return result
+            record_usage(current, completion.usage)
+            if completion.usage is not None:
+                token_usage.record_usage(response_format.__name__, completion.usage)
+                if on_usage is not None:
+                    on_usage(completion.usage)
+            if result is not None:
+                self.put(key, result, day_scoped)
+            return result
+
+    async def parse_async(self, client, model: str, messages: list[dict], response_format: Type[BaseModel], day_scoped: bool = False,
+                          on_usage: Optional[Callable] = None):
+        """Cached `AsyncOpenAI.beta.chat.completions.parse`, returning the parsed result"""
+        with span("llm.parse", model=model, response_format=response_format.__name__) as current:
+            key = self.make_key(model, messages, response_format, day_scoped)
+            cached = self.get(key, response_format)
+            current.set(cache_hit=cached is not None)
+            if cached is not None:
+                logger.info(f"LLM cache hit for {response_format.__name__}")
+                return cached
+
+            completion, sent = await scheduler.submit_async(
+                "openrouter",
+                lambda: client.beta.chat.completions.parse(
+                    model=model,
+                    messages=messages,
+                    response_format=response_format,
+                ),
+                key=key,
+            )
+            result = completion.choices[0].message.parsed
+            if not sent:
+                current.set(coalesced=True)
+                return result
+            record_usage(current, completion.usage)
+            if completion.usage is not None:
+                token_usage.record_usage(response_format.__name__, completion.usage)
+                if on_usage is not None:
+                    on_usage(completion.usage)
+            if result is not None:
+                self.put(key, result, day_scoped)
+            return result
+
+
+# Tokens of every request sent through the cache, per response format, with provider-cached prompt tokens
+token_usage = TokenLedger()
+
+# Shared by every agent in the process; LLM_CACHE_DISABLED=1 keeps only a zero-size memory tier
+llm_cache = LLMCache(path=None, max_memory_entries=0) if CACHE_DISABLED else LLMCache()
+
+
+def cached_parse(client, model: str, messages: list[dict], response_format: Type[BaseModel], day_scoped: bool = False,
+                 on_usage: Optional[Callable] = None):
+    """Parse through the shared cache"""
+    return llm_cache.parse(client, model, messages, response_format, day_scoped, on_usage)
+
+
+async def cached_parse_async(client, model: str, messages: list[dict], response_format: Type[BaseModel], day_scoped: bool = False,
+                             on_usage: Optional[Callable] = None):
+    """Parse through the shared cache from async code"""
+    return await llm_cache.parse_async(client, model, messages, response_format, day_scoped, on_usage)
@@ -1,10 +1,15 @@
 from typing import Optional
-from datetime import datetime
 from pydantic import BaseModel, Field
 from openai import OpenAI
 import os
 import logging
 from dotenv import load_dotenv
+from event_classifier import EventPreClassifier
+from llm_cache import cached_parse
+import prompts
+from prompts import build_messages, date_context
+from temporal import resolve
+from tracing import span
 
 load_dotenv()
 
@@ -16,10 +21,14 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Retries are left to the shared scheduler
 client = OpenAI(base_url="https://openrouter.ai/api/v1",
-                api_key=os.environ.get("OPENAI_API_KEY"),)
+                api_key=os.environ.get("OPENAI_API_KEY"), max_retries=0)
 model = "gpt-4o"
 
+# Local stage in front of the LLM gate; see event_classifier.py for the threshold
+pre_classifier = EventPreClassifier()
+
 # --------------------------------------------------------------
 # Step 1: Define the data models for each stage
 # --------------------------------------------------------------
@@ -46,6 +55,13 @@ class EventDetails(BaseModel):
     participants: list[str] = Field(description="List of participants")
 
 
+class EventSubject(BaseModel):
+    """Second LLM call when the date, time and duration were resolved locally"""
+
+    name: str = Field(description="Name of the event")
+    participants: list[str] = Field(description="List of participants")
+
+
 class EventConfirmation(BaseModel):
     """Third LLM call: Generate confirmation message"""
 
@@ -67,21 +83,13 @@ def extract_event_info(user_input: str) -> EventExtraction:
     logger.info("Starting event extraction analysis")
     logger.debug(f"Input text: {user_input}")
 
-    today = datetime.now()
-    date_context = f"Today is {today.strftime('%A, %B %d, %Y')}."
-
-    completion = client.beta.chat.completions.parse(
+    result = cached_parse(
+        client,
         model=model,
-        messages=[
-            {
-                "role": "system",
-                "content": f"{date_context} Analyze if the text describes a calendar event.",
-            },
-            {"role": "user", "content": user_input},
-        ],
+        messages=build_messages(prompts.EVENT_GATE, user_input, date_context()),
         response_format=EventExtraction,
+        day_scoped=True,
     )
-    result = completion.choices[0].message.parsed
     logger.info(
         f"Extraction complete - Is calendar event: {result.is_calendar_event}, Confidence: {result.confidence_score:.2f}"
     )
@@ -92,21 +100,33 @@ def parse_event_details(description: str) -> EventDetails:
     """Second LLM call to extract specific event details"""
     logger.info("Starting event details parsing")
 
-    today = datetime.now()
-    date_context = f"Today is {today.strftime('%A, %B %d, %Y')}."
+    # Fast path: resolve the timing locally and only ask for the name and participants
+    timing = resolve(description)
+    if timing.complete:
+        subject = cached_parse(
+            client,
+            model=model,
+            messages=build_messages(prompts.EVENT_SUBJECT, description),
+            response_format=EventSubject,
+        )
+        result = EventDetails(
+            name=subject.name,
+            date=f"{timing.date}T{timing.start_time}",
+            duration_minutes=timing.duration_minutes,
+            participants=subject.participants,
+        )
+        logger.info(
+            f"Parsed event details with local timing - Name: {result.name}, Date: {result.date}, Duration: {result.duration_minutes}min"
+        )
+        return result
 
-    completion = client.beta.chat.completions.parse(
+    result = cached_parse(
+        client,
         model=model,
-        messages=[
-            {
-                "role": "system",
-                "content": f"{date_context} Extract detailed event information. When dates reference 'next Tuesday' or similar relative dates, use this current date as reference.",
-            },
-            {"role": "user", "content": description},
-        ],
+        messages=build_messages(prompts.EVENT_DETAILS, description, date_context()),
         response_format=EventDetails,
+        day_scoped=True,
     )
-    result = completion.choices[0].message.parsed
     logger.info(
         f"Parsed event details - Name: {result.name}, Date: {result.date}, Duration: {result.duration_minutes}min"
     )
@@ -118,18 +138,12 @@ def generate_confirmation(event_details: EventDetails) -> EventConfirmation:
     """Third LLM call to generate a confirmation message"""
     logger.info("Generating confirmation message")
 
-    completion = client.beta.chat.completions.parse(
+    result = cached_parse(
+        client,
         model=model,
-        messages=[
-            {
-                "role": "system",
-                "content": "Generate a natural confirmation message for the event. Sign of with your name; Susie",
-            },
-            {"role": "user", "content": str(event_details.model_dump())},
-        ],
+        messages=build_messages(prompts.CONFIRMATION, str(event_details.model_dump())),
         response_format=EventConfirmation,
     )
-    result = completion.choices[0].message.parsed
     logger.info("Confirmation message generated successfully")
     return result
 
@@ -144,56 +158,66 @@ def process_calendar_request(user_input: str) -> Optional[EventConfirmation]:
     logger.info("Processing calendar request")
     logger.debug(f"Raw input: {user_input}")
 
-    # First LLM call: Extract basic info
-    initial_extraction = extract_event_info(user_input)
+    with span("assistant.request", bytes=len(user_input)) as current:
+        # Local pre-classifier: reject obvious non-events before any LLM call
+        decision = pre_classifier.decide(user_input)
+        current.set(pre_classifier=decision)
+        if decision == "reject":
+            logger.warning("Pre-classifier rejected the input, skipping the LLM gate")
+            return None
 
-    # Gate check: Verify if it's a calendar event with sufficient confidence
-    if (
-        not initial_extraction.is_calendar_event
-        or initial_extraction.confidence_score < 0.7
-    ):
-        logger.warning(
-            f"Gate check failed - is_calendar_event: {initial_extraction.is_calendar_event}, confidence: {initial_extraction.confidence_score:.2f}"
-        )
-        return None
+        # First LLM call: Extract basic info
+        initial_extraction = extract_event_info(user_input)
 
-    logger.info("Gate check passed, proceeding with event processing")
+        # Gate check: Verify if it's a calendar event with sufficient confidence
+        if (
+            not initial_extraction.is_calendar_event
+            or initial_extraction.confidence_score < 0.7
+        ):
+            current.set(gate_passed=False)
+            logger.warning(
+                f"Gate check failed - is_calendar_event: {initial_extraction.is_calendar_event}, confidence: {initial_extraction.confidence_score:.2f}"
+            )
+            return None
 
-    # Second LLM call: Get detailed event information
-    event_details = parse_event_details(initial_extraction.description)
+        logger.info("Gate check passed, proceeding with event processing")
 
-    # Third LLM call: Generate confirmation
-    confirmation = generate_confirmation(event_details)
+        # Second LLM call: Get detailed event information
+        event_details = parse_event_details(initial_extraction.description)
 
-    logger.info("Calendar request processing completed successfully")
-    return confirmation
+        # Third LLM call: Generate confirmation
+        confirmation = generate_confirmation(event_details)
+
+        logger.info("Calendar request processing completed successfully")
+        return confirmation
 
 
 # --------------------------------------------------------------
 # Step 4: Test the chain with a valid input
 # --------------------------------------------------------------
 
-user_input = "Let's schedule a 1h team meeting next Tuesday at 2pm with Alice and Bob to discuss the project roadmap."
+if __name__ == "__main__":
+    user_input = "Let's schedule a 1h team meeting next Tuesday at 2pm with Alice and Bob to discuss the project roadmap."
 
-result = process_calendar_request(user_input)
-if result:
-    print(f"Confirmation: {result.confirmation_message}")
-    if result.calendar_link:
-        print(f"Calendar Link: {result.calendar_link}")
-else:
-    print("This doesn't appear to be a calendar event request.")
+    result = process_calendar_request(user_input)
+    if result:
+        print(f"Confirmation: {result.confirmation_message}")
+        if result.calendar_link:
+            print(f"Calendar Link: {result.calendar_link}")
+    else:
+        print("This doesn't appear to be a calendar event request.")
 
 
-# --------------------------------------------------------------
-# Step 5: Test the chain with an invalid input
-# --------------------------------------------------------------
+    # --------------------------------------------------------------
+    # Step 5: Test the chain with an invalid input
+    # --------------------------------------------------------------
 
-user_input = "Can you send an email to Alice and Bob to discuss the project roadmap?"
+    user_input = "Can you send an email to Alice and Bob to discuss the project roadmap?"
 
-result = process_calendar_request(user_input)
-if result:
-    print(f"Confirmation: {result.confirmation_message}")
-    if result.calendar_link:
-        print(f"Calendar Link: {result.calendar_link}")
-else:
-    print("This doesn't appear to be a calendar event request.")
\ No newline at end of file
+    result = process_calendar_request(user_input)
+    if result:
+        print(f"Confirmation: {result.confirmation_message}")
+        if result.calendar_link:
+            print(f"Calendar Link: {result.calendar_link}")
+    else:
+        print("This doesn't appear to be a calendar event request.")
\ No newline at end of file
@@ -0,0 +1,159 @@
+import time
+import queue
+import logging
+import threading
+from typing import Any, Callable, Iterable, Optional
+
+
+logger = logging.getLogger(__name__)
+
+# Items waiting in front of each stage; a full queue blocks the stage feeding it
+QUEUE_SIZE = 16
+
+_DONE = object()
+
+
+class Stage:
+    """One step of a Pipeline: `func` maps an item to the next stage's item, or None to drop it"""
+
+    def __init__(self, name: str, func: Callable[[Any], Any], workers: int = 1, queue_size: int = QUEUE_SIZE):
+        self.name = name
+        self.func = func
+        self.workers = workers
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.processed = 0
+        self.dropped = 0
+        self.failed = 0
+        self.busy_seconds = 0.0
+        self.max_depth = 0
+        self._finished_workers = 0
+        self._lock = threading.Lock()
+
+    def put(self, item):
+        """Blocks while the stage is `queue_size` items behind, which is what pushes back upstream"""
+        self.queue.put(item)
+        depth = self.queue.qsize()
+        with self._lock:
+            self.max_depth = max(self.max_depth, depth)
+
+    def metrics(self, elapsed: float) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "queue_depth": self.queue.qsize(),
+                "max_queue_depth": self.max_depth,
+                "processed": self.processed,
+                "dropped": self.dropped,
+                "failed": self.failed,
+                "throughput_per_s": self.processed / elapsed if elapsed else 0.0,
+                # Share of the workers' time spent inside `func`; near 1.0 marks the bottleneck
+                "utilization": self.busy_seconds / (elapsed * self.workers) if elapsed else 0.0,
+            }
+
+
+class Pipeline:
+    """Runs items through stages concurrently, each stage with its own worker threads.
+
+    Stages are connected by bounded queues, so a slow stage fills the queue in front
+    of it and blocks the stages (and finally the source) feeding it instead of
+    buffering without limit. Items of different stages overlap: the source can
+    fetch item N+1 while a later stage still works on item N. Order is not kept.
+    """
+
+    def __init__(self, stages: list[Stage], on_result: Optional[Callable[[Any], None]] = None):
+        self.stages = stages
+        self.on_result = on_result
+        self._threads = []
+        self._started_at = None
+        self._finished_at = None
+
+    def start(self):
+        self._started_at = time.perf_counter()
+        for index, stage in enumerate(self.stages):
+            for number in range(stage.workers):
+                thread = threading.Thread(
+                    target=self._work, args=(index,), name=f"pipeline-{stage.name}-{number}", daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+
+    def _work(self, index: int):
+        stage = self.stages[index]
+        downstream = self.stages[index + 1] if index + 1 < len(self.stages) else None
+        while True:
+            item = stage.queue.get()
+            if item is _DONE:
+                self._worker_finished(stage, downstream)
+                return
+
+            started = time.perf_counter()
+            try:
+                result = stage.func(item)
+            except Exception as e:
+                logger.error(f"Pipeline stage {stage.name} failed: {e}")
+                with stage._lock:
+                    stage.failed += 1
+                    stage.busy_seconds += time.perf_counter() - started
+                continue
+            with stage._lock:
+                stage.busy_seconds += time.perf_counter() - started
+                if result is None:
+                    stage.dropped += 1
+                else:
+                    stage.processed += 1
+
+            if result is None:
+                continue
+            if downstream is not None:
+                downstream.put(result)
+            elif self.on_result is not None:
+                # A failing callback must not take the worker down with it
+                try:
+                    self.on_result(result)
+                except Exception as e:
+                    logger.error(f"Pipeline result handler failed: {e}")
+
+    def _worker_finished(self, stage: Stage, downstream: Optional[Stage]):
+        """The last worker of a stage to see the end marker passes it on to every downstream worker"""
+        with stage._lock:
+            stage._finished_workers += 1
+            last = stage._finished_workers == stage.workers
+        if last and downstream is not None:
+            for _ in range(downstream.workers):
+                downstream.put(_DONE)
+
+    def submit(self, item):
+        """Feed an item to the first stage, blocking while it is full"""
+        self.stages[0].put(item)
+
+    def close(self):
+        """No more items; workers exit once everything submitted has drained through"""
+        for _ in range(self.stages[0].workers):
+            self.stages[0].put(_DONE)
+
+    def join(self, timeout: Optional[float] = None):
+        for thread in self._threads:
+            thread.join(timeout)
+        self._finished_at = time.perf_counter()
+
+    def run(self, items: Iterable) -> dict:
+        """Start, feed every item from `items`, drain and return the metrics
+
+        If `items` raises, what was already submitted still drains and the workers
+        exit before the error propagates.
+        """
+        self.start()
+        try:
+            for item in items:
+                self.submit(item)
+        finally:
+            self.close()
+            self.join()
+        return self.metrics()
+
+    def metrics(self) -> dict:
+        """Per-stage queue depth, throughput and utilization since start"""
+        if self._started_at is None:
+            return {}
+        elapsed = (self._finished_at or time.perf_counter()) - self._started_at
+        return {"elapsed_s": elapsed, "stages": {stage.name: stage.metrics(elapsed) for stage in self.stages}}
@@ -0,0 +1,64 @@
+from datetime import datetime
+from typing import Optional
+
+
+# Prompt layout for provider-side prefix caching.
+#
+# Providers cache the longest prefix a request shares with recent ones (OpenAI from
+# 1024 tokens on, in 128-token steps; the structured-output schema is part of that
+# prefix). Every message list is therefore built as: the static instructions of the
+# call, byte-identical across calls and days; then the volatile context (today's
+# date) as a separate system message; then the user's text. Calls of the same kind
+# share everything up to the date, and calls on the same day up to the user text.
+
+# calendar-modifier.py
+
+ROUTER = "Determine if this is a request to create a new calendar event or modify an existing one."
+
+NEW_EVENT = "Extract details for creating a new calendar event."
+
+MODIFY_EVENT = (
+    "Extract details for modifying an existing calendar event.\n"
+    'Note that terms like "next" indicate the modification should be scheduled after the event\'s original date.'
+)
+
+FUSED = (
+    "Determine if this is a request to create a new calendar event or modify an existing one, "
+    "and extract the details of the request.\n"
+    'For modifications, note that terms like "next" indicate the modification should be scheduled after '
+    "the event's original date."
+)
+
+# Used when the timing was resolved locally; no date context, so these are not day-scoped
+NEW_EVENT_SUBJECT = "Extract the name and the participants of the calendar event described below."
+
+MODIFY_EVENT_SUBJECT = (
+    "Extract which existing calendar event this request modifies and the participants to add or remove."
+)
+
+# personal-assistant.py
+
+EVENT_GATE = "Analyze if the text describes a calendar event."
+
+EVENT_SUBJECT = "Extract the name and the participants of the event."
+
+EVENT_DETAILS = (
+    "Extract detailed event information. When dates reference 'next Tuesday' or similar relative dates, "
+    "use this current date as reference."
+)
+
+CONFIRMATION = "Generate a natural confirmation message for the event. Sign of with your name; Susie"
+
+
+def date_context(today: Optional[datetime] = None) -> str:
+    today = today or datetime.now()
+    return f"Today is {today.strftime('%A, %B %d, %Y')}."
+
+
+def build_messages(instructions: str, user_input: str, context: Optional[str] = None) -> list[dict]:
+    """Static instructions first, then the volatile `context`, then the user's text"""
+    messages = [{"role": "system", "content": instructions}]
+    if context:
+        messages.append({"role": "system", "content": context})
+    messages.append({"role": "user", "content": user_input})
+    return messages
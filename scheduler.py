@@ -0,0 +1,355 @@
+import os
+import time
+import heapq
+import random
+import asyncio
+import logging
+import itertools
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Iterator, Optional
+
+import openai
+
+
+logger = logging.getLogger(__name__)
+
+# Priority lanes: a waiting request of a lower lane is served before any of a higher one
+INTERACTIVE, DEFAULT, BATCH = 0, 1, 2
+
+# (requests per second, burst) per backend; Gmail is metered in quota units (250/s per user, 5 per list or get)
+RATE_LIMITS = {
+    "openrouter": (float(os.environ.get("RATE_LIMIT_OPENROUTER", 10)), 20),
+    "calendar": (float(os.environ.get("RATE_LIMIT_CALENDAR", 10)), 10),
+    "gmail": (float(os.environ.get("RATE_LIMIT_GMAIL", 250)), 250),
+}
+GMAIL_UNITS_PER_CALL = 5
+
+MAX_ATTEMPTS = 5
+BASE_DELAY = 0.5
+MAX_DELAY = 30.0
+# Retries may add at most this share of extra load on top of first attempts
+RETRY_RATIO = 0.2
+RETRY_BURST = 10
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+RATE_LIMIT_REASONS = ("rateLimitExceeded", "userRateLimitExceeded")
+
+_lane = contextvars.ContextVar("scheduler_lane", default=DEFAULT)
+
+
+@contextmanager
+def priority(lane: int):
+    """Run the enclosed calls (and work bound to this context) in `lane`"""
+    token = _lane.set(lane)
+    try:
+        yield
+    finally:
+        _lane.reset(token)
+
+
+def in_lane(lane: int, items: Iterator) -> Iterator:
+    """Advance the generator `items` in `lane`, leaving the caller's own work between items in its lane
+
+    A `with priority(...)` around the loop would also cover the consumer's code at
+    each yield, since a generator runs in its caller's context.
+    """
+    while True:
+        with priority(lane):
+            try:
+                item = next(items)
+            except StopIteration:
+                return
+        yield item
+
+
+def status_of(error: Exception) -> Optional[int]:
+    """HTTP status of an OpenAI or Google API error"""
+    status = getattr(error, "status_code", None)
+    if status is None and getattr(error, "resp", None) is not None:
+        status = getattr(error.resp, "status", None)
+    try:
+        return int(status) if status is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    """Seconds from a Retry-After header, when the error carries one"""
+    headers = getattr(getattr(error, "response", None), "headers", None) or getattr(error, "resp", None)
+    if not headers:
+        return None
+    value = headers.get("retry-after") or headers.get("Retry-After")
+    try:
+        return max(0.0, float(value)) if value is not None else None
+    except ValueError:
+        return None
+
+
+def is_throttled(error: Exception) -> bool:
+    status = status_of(error)
+    if status == 403:
+        # Google reports per-user rate limits as 403 with a rateLimitExceeded reason in the body
+        content = getattr(error, "content", b"") or b""
+        details = f"{error} {content.decode('utf-8', 'replace') if isinstance(content, bytes) else content}"
+        return any(reason in details for reason in RATE_LIMIT_REASONS)
+    return status == 429
+
+
+def is_retryable(error: Exception) -> bool:
+    if isinstance(error, (openai.APIConnectionError, ConnectionError, TimeoutError)):
+        return True
+    return is_throttled(error) or status_of(error) in RETRYABLE_STATUS
+
+
+class TokenBucket:
+    """Rate limiter with a FIFO wait queue per priority lane"""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._waiters = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, cost: float = 1.0, lane: Optional[int] = None) -> float:
+        """Block until `cost` tokens are free and this caller is first in line; returns the seconds waited"""
+        entry = (_lane.get() if lane is None else lane, next(self._sequence))
+        started = time.monotonic()
+        with self._condition:
+            heapq.heappush(self._waiters, entry)
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    if self._waiters[0] != entry:
+                        # Only the head of the queue watches the clock; the rest wait for their turn
+                        self._condition.wait()
+                        continue
+                    # A request larger than the burst would never fit, so it waits for a full bucket
+                    needed = min(cost, self.burst)
+                    delay = max(self._paused_until - now, (needed - self.tokens) / self.rate)
+                    if delay <= 0:
+                        self.tokens -= cost
+                        return time.monotonic() - started
+                    self._condition.wait(delay)
+            finally:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+                self._condition.notify_all()
+
+    def pause(self, seconds: float):
+        """Hold every caller back, e.g. after the backend answered 429 with Retry-After"""
+        with self._condition:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self.tokens = min(self.tokens, 0.0)
+
+
+class RetryBudget:
+    """Caps retries at `ratio` of first attempts, plus a small burst, so an outage is not amplified"""
+
+    def __init__(self, ratio: float = RETRY_RATIO, burst: float = RETRY_BURST):
+        self.ratio = ratio
+        self.burst = burst
+        self.balance = burst
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self.balance = min(self.burst, self.balance + self.ratio)
+
+    def withdraw(self) -> bool:
+        with self._lock:
+            if self.balance < 1:
+                return False
+            self.balance -= 1
+            return True
+
+
+class Backend:
+    """Limits and counters of one remote service"""
+
+    def __init__(self, name: str, rate: float, burst: float):
+        self.name = name
+        self.bucket = TokenBucket(rate, burst)
+        self.budget = RetryBudget()
+        self.requests = 0
+        self.retries = 0
+        self.throttled = 0
+        self.budget_exhausted = 0
+        self.coalesced = 0
+        self.waited_seconds = 0.0
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "retries": self.retries,
+            "throttled": self.throttled,
+            "budget_exhausted": self.budget_exhausted,
+            "coalesced": self.coalesced,
+            "waited_s": self.waited_seconds,
+        }
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class Scheduler:
+    """Shared gate in front of OpenRouter and the Google APIs.
+
+    Every call first takes a token from its backend's bucket, in priority-lane
+    order, and is retried on 429/5xx and connection errors with jittered
+    exponential backoff (or the server's Retry-After), up to `max_attempts`. A 429
+    also pauses the bucket, slowing every caller down; other retries draw on the
+    backend's retry budget, so a failing backend does not get extra load.
+    Calls submitted with the same `key` while one is in flight share its result.
+    """
+
+    def __init__(self, rate_limits: Optional[dict] = None, max_attempts: int = MAX_ATTEMPTS,
+                 base_delay: float = BASE_DELAY, max_delay: float = MAX_DELAY):
+        self.backends = {name: Backend(name, rate, burst) for name, (rate, burst) in (rate_limits or RATE_LIMITS).items()}
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._flights = {}
+        self._async_flights = {}
+        self._lock = threading.Lock()
+
+    def backoff(self, attempt: int, error: Exception) -> float:
+        """Full-jitter exponential backoff, never shorter than the server asked for"""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        server_delay = retry_after(error)
+        return max(delay, server_delay) if server_delay is not None else delay
+
+    def _should_retry(self, backend: Backend, error: Exception, attempt: int, idempotent: bool) -> bool:
+        throttled = is_throttled(error)
+        if throttled:
+            backend.throttled += 1
+        # A throttled request was refused before doing anything, so even non-idempotent calls may repeat it
+        if not (throttled or (idempotent and is_retryable(error))):
+            return False
+        if attempt + 1 >= self.max_attempts:
+            return False
+        # Throttled retries are already paced by the paused bucket; the budget guards against failing backends
+        if not throttled and not backend.budget.withdraw():
+            backend.budget_exhausted += 1
+            logger.warning(f"Retry budget for {backend.name} is exhausted, giving up: {error}")
+            return False
+        backend.retries += 1
+        return True
+
+    def _retry_delay(self, backend: Backend, error: Exception, attempt: int) -> float:
+        delay = self.backoff(attempt, error)
+        if is_throttled(error):
+            backend.bucket.pause(delay)
+        logger.warning(f"{backend.name} call failed ({error}), retry {attempt + 1} in {delay:.2f}s")
+        return delay
+
+    def _execute(self, name: str, func: Callable[[], Any], cost: float, idempotent: bool):
+        backend = self.backends[name]
+        backend.requests += 1
+        backend.budget.deposit()
+        attempt = 0
+        while True:
+            backend.waited_seconds += backend.bucket.acquire(cost)
+            try:
+                return func()
+            except Exception as e:
+                if not self._should_retry(backend, e, attempt, idempotent):
+                    raise
+                time.sleep(self._retry_delay(backend, e, attempt))
+                attempt += 1
+
+    def submit(self, name: str, func: Callable[[], Any], key: Optional[str] = None, cost: float = 1.0,
+               idempotent: bool = True) -> tuple[Any, bool]:
+        """Run `func` against backend `name`; returns (result, whether this caller sent the request)"""
+        if key is None:
+            return self._execute(name, func, cost, idempotent), True
+
+        with self._lock:
+            flight = self._flights.get((name, key))
+            leader = flight is None
+            if leader:
+                flight = self._flights[(name, key)] = _Flight()
+            else:
+                self.backends[name].coalesced += 1
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result, False
+
+        try:
+            flight.result = self._execute(name, func, cost, idempotent)
+            return flight.result, True
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[(name, key)]
+            flight.done.set()
+
+    def call(self, name: str, func: Callable[[], Any], key: Optional[str] = None, cost: float = 1.0,
+             idempotent: bool = True) -> Any:
+        return self.submit(name, func, key, cost, idempotent)[0]
+
+    async def _execute_async(self, name: str, func: Callable[[], Awaitable], cost: float, idempotent: bool):
+        backend = self.backends[name]
+        backend.requests += 1
+        backend.budget.deposit()
+        attempt = 0
+        lane = _lane.get()
+        while True:
+            backend.waited_seconds += await asyncio.to_thread(backend.bucket.acquire, cost, lane)
+            try:
+                return await func()
+            except Exception as e:
+                if not self._should_retry(backend, e, attempt, idempotent):
+                    raise
+                await asyncio.sleep(self._retry_delay(backend, e, attempt))
+                attempt += 1
+
+    async def submit_async(self, name: str, func: Callable[[], Awaitable], key: Optional[str] = None,
+                           cost: float = 1.0, idempotent: bool = True) -> tuple[Any, bool]:
+        """Async counterpart of submit; `func` returns a new awaitable per attempt"""
+        if key is None:
+            return await self._execute_async(name, func, cost, idempotent), True
+
+        flight_key = (id(asyncio.get_running_loop()), name, key)
+        flight = self._async_flights.get(flight_key)
+        if flight is not None:
+            self.backends[name].coalesced += 1
+            return await asyncio.shield(flight), False
+
+        flight = self._async_flights[flight_key] = asyncio.get_running_loop().create_future()
+        try:
+            result = await self._execute_async(name, func, cost, idempotent)
+            flight.set_result(result)
+            return result, True
+        except BaseException as e:
+            flight.set_exception(e)
+            # Followers re-raise it; the leader's own raise below is the one that counts
+            flight.exception()
+            raise
+        finally:
+            del self._async_flights[flight_key]
+
+    def stats(self) -> dict:
+        return {name: backend.stats() for name, backend in self.backends.items()}
+
+
+# Shared by every agent in the process
+scheduler = Scheduler()
@@ -0,0 +1,238 @@
+import re
+import logging
+from datetime import date, datetime, timedelta
+from typing import Optional
+from pydantic import BaseModel, Field
+
+
+logger = logging.getLogger(__name__)
+
+# Used when the date and start time are explicit but the duration is not, which is
+# also what the extraction prompt ends up guessing
+DEFAULT_DURATION_MINUTES = 60
+
+WEEKDAYS = {
+    "monday": 0, "mon": 0,
+    "tuesday": 1, "tue": 1, "tues": 1,
+    "wednesday": 2, "wed": 2, "weds": 2,
+    "thursday": 3, "thu": 3, "thur": 3, "thurs": 3,
+    "friday": 4, "fri": 4,
+    "saturday": 5,
+    "sunday": 6,
+}
+MONTHS = {
+    "january": 1, "jan": 1, "february": 2, "feb": 2, "march": 3, "mar": 3, "april": 4, "apr": 4,
+    "may": 5, "june": 6, "jun": 6, "july": 7, "jul": 7, "august": 8, "aug": 8,
+    "september": 9, "sep": 9, "sept": 9, "october": 10, "oct": 10, "november": 11, "nov": 11,
+    "december": 12, "dec": 12,
+}
+
+_weekday = "|".join(sorted(WEEKDAYS, key=len, reverse=True))
+_month = "|".join(sorted(MONTHS, key=len, reverse=True))
+_ordinal = r"(\d{1,2})(?:st|nd|rd|th)?"
+
+_iso_date = re.compile(r"\b(\d{4})-(\d{2})-(\d{2})\b")
+_numeric_date = re.compile(r"\b(\d{1,2})/(\d{1,2})(?:/(\d{2}|\d{4}))?\b")
+_month_day = re.compile(rf"\b({_month})\.?\s+{_ordinal}\b(?:,?\s+(\d{{4}}))?")
+_day_month = re.compile(rf"\b(?:the\s+)?{_ordinal}\s+(?:of\s+)?({_month})\b(?:,?\s+(\d{{4}}))?")
+_relative_day = re.compile(r"\b(day after tomorrow|tomorrow|today|tonight)\b")
+_weekday_phrase = re.compile(rf"\b(?:(next|this|coming)\s+)?({_weekday})\b\.?")
+# Vague references that name no single day; on their own they leave the date unresolved
+_next_week = re.compile(r"\bnext week\b")
+
+# Only dashed ranges: "from 3pm to 4pm" is as often a move as a range
+_time_range = re.compile(
+    r"\b(\d{1,2})(?::([0-5]\d))?\s*(am|pm)?\s*[-–]\s*(\d{1,2})(?::([0-5]\d))?\s*(am|pm)\b"
+)
+_time_12h = re.compile(r"\b(\d{1,2})(?::([0-5]\d))?\s*(am|pm|a\.m\.|p\.m\.)(?![a-z])")
+_time_24h = re.compile(r"\b([01]?\d|2[0-3]):([0-5]\d)\b")
+_time_named = re.compile(r"\b(noon|midday|midnight)\b")
+# "at 10" could be morning or evening; it blocks the fast path rather than guessing
+_bare_hour = re.compile(r"\bat\s+(\d{1,2})\b(?!\s*(?::|am|pm|a\.m\.|p\.m\.|%|/))")
+
+# Hyphens too: "a 30-minute call", "1-hour-30-minute workshop"
+_duration_compound = re.compile(
+    r"\b(\d+)[\s-]*(?:h|hr|hrs|hours?)[\s-]*(?:and\s+)?(\d+)[\s-]*(?:m|min|mins|minutes?)\b|\b(\d+)h(\d{2})\b"
+)
+_duration = re.compile(r"\b(\d+(?:\.\d+)?)[\s-]*(h|hr|hrs|hours?|m|min|mins|minutes?)\b")
+_duration_words = re.compile(r"\b(an hour and a half|hour and a half|half an hour|half-hour|an hour|a quarter of an hour)\b")
+_duration_word_minutes = {
+    "an hour and a half": 90, "hour and a half": 90, "half an hour": 30, "half-hour": 30,
+    "an hour": 60, "a quarter of an hour": 15,
+}
+
+
+class TemporalResolution(BaseModel):
+    """Date, start time and duration resolved locally from a request"""
+
+    date: Optional[str] = Field(default=None, description="Event date (YYYY-MM-DD)")
+    start_time: Optional[str] = Field(default=None, description="Start time (HH:MM, 24h)")
+    duration_minutes: Optional[int] = Field(default=None, description="Duration in minutes")
+    duration_defaulted: bool = Field(default=False, description="Whether duration_minutes is DEFAULT_DURATION_MINUTES")
+    next_weekday: bool = Field(
+        default=False, description="Whether the date came from a 'next <weekday>' phrase, resolved relative to today"
+    )
+
+    @property
+    def complete(self) -> bool:
+        """Whether the LLM no longer needs to resolve any of the temporal fields"""
+        return self.date is not None and self.start_time is not None and self.duration_minutes is not None
+
+
+def _mask(text: str, match: re.Match) -> str:
+    """Blank out a match so later patterns do not read its digits again"""
+    return text[:match.start()] + " " * (match.end() - match.start()) + text[match.end():]
+
+
+def _upcoming(today: date, month: int, day: int, year: Optional[int]) -> Optional[date]:
+    """The given month/day in `year`, or its next occurrence on or after today"""
+    try:
+        if year is not None:
+            return date(year if year >= 100 else 2000 + year, month, day)
+        candidate = date(today.year, month, day)
+        return candidate if candidate >= today else date(today.year + 1, month, day)
+    except ValueError:
+        return None
+
+
+def _weekday_date(today: date, modifier: Optional[str], weekday: int, in_next_week: bool) -> date:
+    """Resolve a weekday: "next Tuesday" (or "Tuesday next week") is the Tuesday of next
+    week, "this Tuesday" may be today, a bare "Tuesday" is its next occurrence after today."""
+    if modifier == "next" or in_next_week:
+        next_monday = today + timedelta(days=7 - today.weekday())
+        return next_monday + timedelta(days=weekday)
+    days_ahead = (weekday - today.weekday()) % 7
+    if days_ahead == 0 and modifier not in ("this", "coming"):
+        days_ahead = 7
+    return today + timedelta(days=days_ahead)
+
+
+def _clock(hour: int, minute: int, meridiem: Optional[str]) -> Optional[tuple[int, int]]:
+    if meridiem:
+        if not 1 <= hour <= 12:
+            return None
+        hour = hour % 12 + (12 if meridiem.startswith("p") else 0)
+    elif hour > 23:
+        return None
+    return hour, minute
+
+
+def _find_dates(text: str, today: date) -> tuple[str, set[date], bool, bool]:
+    """Every explicit date in `text`, the text with them masked, whether a vague one
+    was seen and whether a "next <weekday>" was"""
+    found = set()
+    vague = False
+
+    for match in list(_iso_date.finditer(text)):
+        resolved = _upcoming(today, int(match.group(2)), int(match.group(3)), int(match.group(1)))
+        if resolved:
+            found.add(resolved)
+        text = _mask(text, match)
+    for match in list(_numeric_date.finditer(text)):
+        year = int(match.group(3)) if match.group(3) else None
+        resolved = _upcoming(today, int(match.group(1)), int(match.group(2)), year)
+        if resolved:
+            found.add(resolved)
+        text = _mask(text, match)
+    for pattern, month_group, day_group in ((_month_day, 1, 2), (_day_month, 2, 1)):
+        for match in list(pattern.finditer(text)):
+            # "may" is also a verb; only count it when a day number follows
+            year = int(match.group(3)) if match.group(3) else None
+            resolved = _upcoming(today, MONTHS[match.group(month_group)], int(match.group(day_group)), year)
+            if resolved:
+                found.add(resolved)
+            text = _mask(text, match)
+    for match in list(_relative_day.finditer(text)):
+        offset = {"today": 0, "tonight": 0, "tomorrow": 1, "day after tomorrow": 2}[match.group(1)]
+        found.add(today + timedelta(days=offset))
+        text = _mask(text, match)
+
+    in_next_week = bool(_next_week.search(text))
+    weekday_matches = list(_weekday_phrase.finditer(text))
+    for match in weekday_matches:
+        found.add(_weekday_date(today, match.group(1), WEEKDAYS[match.group(2)], in_next_week))
+        text = _mask(text, match)
+    if in_next_week and not weekday_matches:
+        vague = True
+    next_weekday = in_next_week or any(match.group(1) == "next" for match in weekday_matches)
+    return text, found, vague, next_weekday
+
+
+def _find_times(text: str) -> tuple[str, set[tuple[int, int]], Optional[int], bool]:
+    """Every explicit start time, the duration of a time range if any, and whether an ambiguous hour was seen"""
+    found = set()
+    range_minutes = None
+
+    for match in list(_time_range.finditer(text)):
+        end = _clock(int(match.group(4)), int(match.group(5) or 0), match.group(6))
+        start_meridiem = match.group(3) or match.group(6)
+        start = _clock(int(match.group(1)), int(match.group(2) or 0), start_meridiem)
+        if start and end and not match.group(3) and start > end:
+            # "11-1pm" starts in the morning
+            start = _clock(int(match.group(1)), int(match.group(2) or 0), "am")
+        if start and end and end > start:
+            found.add(start)
+            range_minutes = (end[0] - start[0]) * 60 + end[1] - start[1]
+        text = _mask(text, match)
+    for match in list(_time_12h.finditer(text)):
+        clock = _clock(int(match.group(1)), int(match.group(2) or 0), match.group(3).replace(".", ""))
+        if clock:
+            found.add(clock)
+        text = _mask(text, match)
+    for match in list(_time_24h.finditer(text)):
+        found.add((int(match.group(1)), int(match.group(2))))
+        text = _mask(text, match)
+    for match in list(_time_named.finditer(text)):
+        found.add((0, 0) if match.group(1) == "midnight" else (12, 0))
+        text = _mask(text, match)
+
+    ambiguous = bool(_bare_hour.search(text))
+    return text, found, range_minutes, ambiguous
+
+
+def _find_durations(text: str) -> set[int]:
+    found = set()
+    for match in list(_duration_compound.finditer(text)):
+        hours, minutes = (match.group(1), match.group(2)) if match.group(1) else (match.group(3), match.group(4))
+        found.add(int(hours) * 60 + int(minutes))
+        text = _mask(text, match)
+    for match in list(_duration_words.finditer(text)):
+        found.add(_duration_word_minutes[match.group(1)])
+        text = _mask(text, match)
+    for match in _duration.finditer(text):
+        value = float(match.group(1))
+        found.add(round(value * 60) if match.group(2).startswith("h") else round(value))
+    return {minutes for minutes in found if minutes > 0}
+
+
+def resolve(text: str, now: Optional[datetime] = None) -> TemporalResolution:
+    """Resolve the date, start time and duration of a request without an LLM.
+
+    A field is only filled when the text names exactly one value for it; several
+    dates or times (e.g. "move it from Monday to Wednesday") or vague ones
+    ("next week", "at 10") leave it unresolved for the LLM.
+    """
+    today = (now or datetime.now()).date()
+    lowered = text.lower()
+
+    lowered, dates, vague_date, next_weekday = _find_dates(lowered, today)
+    lowered, times, range_minutes, ambiguous_time = _find_times(lowered)
+    durations = _find_durations(lowered)
+
+    resolution = TemporalResolution()
+    if len(dates) == 1 and not vague_date:
+        resolution.date = next(iter(dates)).isoformat()
+        resolution.next_weekday = next_weekday
+    if len(times) == 1 and not ambiguous_time:
+        hour, minute = next(iter(times))
+        resolution.start_time = f"{hour:02d}:{minute:02d}"
+    if len(durations) == 1:
+        resolution.duration_minutes = next(iter(durations))
+    elif not durations and range_minutes is not None:
+        resolution.duration_minutes = range_minutes
+    elif not durations and resolution.date and resolution.start_time:
+        resolution.duration_minutes = DEFAULT_DURATION_MINUTES
+        resolution.duration_defaulted = True
+
+    logger.debug(f"Resolved {text!r} locally to {resolution.model_dump()}")
+    return resolution
@@ -0,0 +1,92 @@
+import logging
+import threading
+from typing import Optional
+
+
+logger = logging.getLogger(__name__)
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# USD per million tokens: (input, cached input, output)
+PRICES = {
+    "gpt-4o": (2.50, 1.25, 10.00),
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+}
+
+# Per-message framing the chat format adds on top of the content
+MESSAGE_OVERHEAD_TOKENS = 4
+
+_encodings = {}
+
+
+def estimate_tokens(text: str, model: str = "gpt-4o") -> int:
+    """Count tokens with tiktoken when it is installed, else estimate ~4 characters per token"""
+    if tiktoken is None:
+        return len(text) // 4 + 1
+    if model not in _encodings:
+        try:
+            _encodings[model] = tiktoken.encoding_for_model(model)
+        except KeyError:
+            _encodings[model] = tiktoken.get_encoding("o200k_base")
+    return len(_encodings[model].encode(text))
+
+
+def estimate_prompt_tokens(messages: list[dict], model: str = "gpt-4o") -> int:
+    return sum(estimate_tokens(m["content"], model) + MESSAGE_OVERHEAD_TOKENS for m in messages)
+
+
+class TokenLedger:
+    """Thread-safe per-stage tally of tokens and cost, fed from the API usage field"""
+
+    def __init__(self, model: str = "gpt-4o"):
+        self.model = model
+        self.stages = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, prompt_tokens: int, completion_tokens: int, cached_tokens: int = 0):
+        with self._lock:
+            totals = self.stages.setdefault(
+                stage, {"calls": 0, "prompt_tokens": 0, "cached_tokens": 0, "completion_tokens": 0}
+            )
+            totals["calls"] += 1
+            totals["prompt_tokens"] += prompt_tokens
+            totals["cached_tokens"] += cached_tokens
+            totals["completion_tokens"] += completion_tokens
+
+    def record_usage(self, stage: str, usage):
+        """Book an API usage object, including the prompt tokens served from the provider's prefix cache"""
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached = getattr(details, "cached_tokens", 0) or 0
+        self.record(stage, usage.prompt_tokens, usage.completion_tokens, cached)
+
+    def recorder(self, stage: str):
+        """Callback for `cached_parse(on_usage=...)` that books the usage under `stage`"""
+        def on_usage(usage):
+            self.record_usage(stage, usage)
+        return on_usage
+
+    def cost(self, prompt_tokens: int, completion_tokens: int, cached_tokens: int = 0) -> Optional[float]:
+        if self.model not in PRICES:
+            return None
+        input_price, cached_price, output_price = PRICES[self.model]
+        return (
+            (prompt_tokens - cached_tokens) * input_price
+            + cached_tokens * cached_price
+            + completion_tokens * output_price
+        ) / 1_000_000
+
+    def summary(self) -> dict:
+        """Tokens and cost per stage plus a `total` entry"""
+        with self._lock:
+            stages = {stage: dict(totals) for stage, totals in self.stages.items()}
+        total = {"calls": 0, "prompt_tokens": 0, "cached_tokens": 0, "completion_tokens": 0}
+        for totals in stages.values():
+            totals["cost_usd"] = self.cost(totals["prompt_tokens"], totals["completion_tokens"], totals["cached_tokens"])
+            for key in total:
+                total[key] += totals[key]
+        total["cost_usd"] = self.cost(total["prompt_tokens"], total["completion_tokens"], total["cached_tokens"])
+        stages["total"] = total
+        return stages
@@ -0,0 +1,212 @@
+import os
+import sys
+import json
+import time
+import random
+import logging
+import statistics
+import threading
+import contextvars
+from contextlib import contextmanager
+from functools import wraps
+from typing import Any, Callable, Optional
+
+
+logger = logging.getLogger(__name__)
+
+# Tracing is off unless TRACE_PATH is set or enable() is called
+TRACE_PATH = os.environ.get("TRACE_PATH")
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+_exporter = None
+_exporter_lock = threading.Lock()
+
+
+class JsonlExporter:
+    """Appends finished spans to a file, one OTLP/JSON span object per line"""
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def export(self, span: dict):
+        line = json.dumps(span) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+def enable(path: str):
+    """Start writing spans to `path`"""
+    global _exporter
+    with _exporter_lock:
+        if _exporter is not None:
+            _exporter.close()
+        _exporter = JsonlExporter(path)
+    logger.info(f"Tracing spans to {path}")
+
+
+def disable():
+    global _exporter
+    with _exporter_lock:
+        if _exporter is not None:
+            _exporter.close()
+        _exporter = None
+
+
+def enabled() -> bool:
+    return _exporter is not None
+
+
+def _otlp_value(value: Any) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        # OTLP/JSON encodes 64-bit integers as strings
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class Span:
+    """A timed operation; attributes set on it (tokens, cache hits, bytes, ...) are exported with it"""
+
+    def __init__(self, name: str, parent: Optional["Span"], attributes: dict):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else f"{random.getrandbits(128):032x}"
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_span_id = parent.span_id if parent else ""
+        self.attributes = dict(attributes)
+        self.error = None
+        self.start_ns = time.time_ns()
+        self._started = time.perf_counter_ns()
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def to_otlp(self, end_ns: int) -> dict:
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_span_id,
+            "name": self.name,
+            "kind": 1,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(end_ns),
+            "attributes": [
+                {"key": key, "value": _otlp_value(value)} for key, value in self.attributes.items() if value is not None
+            ],
+            # 1 = OK, 2 = ERROR
+            "status": {"code": 2, "message": self.error} if self.error else {"code": 1},
+        }
+
+
+class _NoopSpan:
+    """Returned while tracing is off, so instrumented code pays almost nothing"""
+
+    def set(self, **attributes):
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Time the enclosed block as a child of the current span"""
+    exporter = _exporter
+    if exporter is None:
+        yield _NOOP
+        return
+
+    current = Span(name, _current_span.get(), attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current_span.reset(token)
+        end_ns = current.start_ns + (time.perf_counter_ns() - current._started)
+        exporter.export(current.to_otlp(end_ns))
+
+
+def traced(name: str):
+    """Decorator form of span()"""
+    def decorate(func: Callable) -> Callable:
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def in_context(func: Callable) -> Callable:
+    """Bind `func` to the caller's context, so spans it opens on a pool thread nest under the caller's"""
+    context = contextvars.copy_context()
+    # A Context can only be entered by one thread at a time, so each call runs in its own copy
+    return lambda *args, **kwargs: context.copy().run(func, *args, **kwargs)
+
+
+def record_usage(current, usage):
+    """Copy an OpenAI usage object onto a span"""
+    if usage is None:
+        return
+    details = getattr(usage, "prompt_tokens_details", None)
+    current.set(
+        prompt_tokens=usage.prompt_tokens,
+        completion_tokens=usage.completion_tokens,
+        cached_tokens=getattr(details, "cached_tokens", 0) or 0,
+    )
+
+
+def summarize(path: str) -> dict:
+    """Per span name: count, errors, p50/p95 duration in ms and summed numeric attributes"""
+    durations, errors, totals = {}, {}, {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            span_record = json.loads(line)
+            name = span_record["name"]
+            duration_ms = (int(span_record["endTimeUnixNano"]) - int(span_record["startTimeUnixNano"])) / 1e6
+            durations.setdefault(name, []).append(duration_ms)
+            errors[name] = errors.get(name, 0) + (span_record["status"].get("code") == 2)
+            for attribute in span_record["attributes"]:
+                value = attribute["value"]
+                number = int(value["intValue"]) if "intValue" in value else (
+                    int(value["boolValue"]) if "boolValue" in value else value.get("doubleValue"))
+                if number is not None:
+                    sums = totals.setdefault(name, {})
+                    sums[attribute["key"]] = sums.get(attribute["key"], 0) + number
+
+    summary = {}
+    for name, values in durations.items():
+        values.sort()
+        summary[name] = {
+            "count": len(values),
+            "errors": errors[name],
+            "p50_ms": statistics.median(values),
+            "p95_ms": values[min(len(values) - 1, int(len(values) * 0.95))],
+            **totals.get(name, {}),
+        }
+    return summary
+
+
+if TRACE_PATH:
+    enable(TRACE_PATH)
+
+
+if __name__ == "__main__":
+    # python tracing.py trace.jsonl
+    for name, stats in sorted(summarize(sys.argv[1]).items()):
+        print(name, json.dumps(stats))
@@ -0,0 +1,222 @@
+import os
+import json
+import time
+import atexit
+import logging
+import threading
+from typing import Callable, Optional
+from database_retrieval import CHUNK_SIZE, add_many, get_collection
+from tracing import span
+
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_PATH = "eventdb/write_behind.jsonl"
+# How long the worker waits for more records before writing a partial batch
+MAX_BATCH_DELAY = 0.2
+# Backoff between attempts when a batch write fails
+RETRY_DELAY = 2.0
+
+
+class WriteBehindQueue:
+    """Moves event-record persistence (embedding, Chroma write, index append) off the request path.
+
+    `submit` only appends the record to a local journal (fsynced) and returns; a
+    background thread writes pending records in batches with `add_many` and then
+    journals a commit marker. On start-up, records journaled but never committed
+    are replayed, skipping any whose calendar_id already reached the collection, so
+    a crash between the Chroma write and the marker does not duplicate them.
+    Readers that need to see pending records call `flush` first.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        journal_path: str = JOURNAL_PATH,
+        batch_size: int = CHUNK_SIZE,
+        max_batch_delay: float = MAX_BATCH_DELAY,
+        writer: Callable = add_many,
+    ):
+        self.path = path
+        self.journal_path = journal_path
+        self.batch_size = batch_size
+        self.max_batch_delay = max_batch_delay
+        self.writer = writer
+        self.written = 0
+        self._pending = []
+        self._next_seq = 1
+        self._in_flight = 0
+        self._batch = []
+        self._stopping = False
+        self._thread = None
+        self._journal = None
+        self._condition = threading.Condition()
+
+    def start(self):
+        """Replay the journal and start the background writer; idempotent"""
+        with self._condition:
+            if self._thread is not None:
+                return
+            self._pending, last_seq = self._replay()
+            # Seqs already in the journal may have commit markers, so new records never reuse one
+            self._next_seq = last_seq + 1
+            directory = os.path.dirname(self.journal_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._journal = open(self.journal_path, "a", encoding="utf-8")
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+            self._thread.start()
+            if self._pending:
+                logger.info(f"Replaying {len(self._pending)} journaled record(s)")
+                self._condition.notify_all()
+
+    def _replay(self) -> tuple[list[tuple[int, str, Optional[dict]]], int]:
+        """Records in the journal without a commit marker, minus those already in the collection,
+        and the highest seq the journal mentions"""
+        if not os.path.exists(self.journal_path):
+            return [], 0
+        records, committed = {}, set()
+        with open(self.journal_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # A torn last line from a crash mid-write; its submit never returned
+                    continue
+                if entry["op"] == "add":
+                    records[entry["seq"]] = (entry["seq"], entry["description"], entry.get("metadata"))
+                else:
+                    committed.update(entry["seqs"])
+        last_seq = max([*records, *committed], default=0)
+        pending = [record for seq, record in sorted(records.items()) if seq not in committed]
+
+        calendar_ids = [metadata["calendar_id"] for _, _, metadata in pending if metadata and metadata.get("calendar_id")]
+        if calendar_ids:
+            found = get_collection().get(where={"calendar_id": {"$in": calendar_ids}}, include=["metadatas"])
+            stored = {metadata["calendar_id"] for metadata in found["metadatas"] if metadata}
+            pending = [record for record in pending if not (record[2] and record[2].get("calendar_id") in stored)]
+        return pending, last_seq
+
+    def _append_journal(self, entry: dict):
+        self._journal.write(json.dumps(entry) + "\n")
+        self._journal.flush()
+        os.fsync(self._journal.fileno())
+
+    def submit(self, description: str, metadata: Optional[dict] = None):
+        """Durably queue a record for the collection and return without waiting for the write"""
+        self.start()
+        with self._condition:
+            seq = self._next_seq
+            self._next_seq += 1
+            self._append_journal({"op": "add", "seq": seq, "description": description, "metadata": metadata})
+            self._pending.append((seq, description, metadata))
+            self._condition.notify_all()
+
+    def pending(self) -> int:
+        with self._condition:
+            return len(self._pending) + self._in_flight
+
+    def pending_records(self) -> list[tuple[str, Optional[dict]]]:
+        """(description, metadata) of every record not yet in the collection, including the batch being written"""
+        with self._condition:
+            return [(description, metadata) for _, description, metadata in self._batch + self._pending]
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending and not self._stopping:
+                    self._condition.wait()
+                if not self._pending and self._stopping:
+                    return
+                # Give concurrent submits a moment to join the batch
+                deadline = time.monotonic() + self.max_batch_delay
+                while len(self._pending) < self.batch_size and not self._stopping:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                batch = self._pending[:self.batch_size]
+                del self._pending[:self.batch_size]
+                self._in_flight = len(batch)
+                self._batch = batch
+
+            try:
+                metadatas = [metadata for _, _, metadata in batch]
+                with span("write_behind.batch", records=len(batch)):
+                    self.writer(
+                        [description for _, description, _ in batch],
+                        self.path,
+                        metadatas=metadatas if any(metadatas) else None,
+                    )
+            except Exception as e:
+                logger.error(f"Write-behind batch of {len(batch)} record(s) failed, retrying: {e}")
+                with self._condition:
+                    self._pending[:0] = batch
+                    self._in_flight = 0
+                    self._batch = []
+                    self._condition.notify_all()
+                    if self._stopping:
+                        # Left in the journal for the next start
+                        return
+                time.sleep(RETRY_DELAY)
+                continue
+
+            with self._condition:
+                self._append_journal({"op": "commit", "seqs": [seq for seq, _, _ in batch]})
+                self._in_flight = 0
+                self._batch = []
+                self.written += len(batch)
+                if not self._pending:
+                    # Everything journaled is committed, so the journal can start over
+                    self._journal.truncate(0)
+                self._condition.notify_all()
+            logger.info(f"Persisted {len(batch)} event record(s) in the background")
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every submitted record is in the collection; False on timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while self._pending or self._in_flight:
+                if self._thread is None or not self._thread.is_alive():
+                    return False
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+        return True
+
+    def close(self, timeout: Optional[float] = None):
+        """Flush, stop the worker and close the journal; unwritten records stay journaled"""
+        with self._condition:
+            if self._thread is None:
+                return
+            self._stopping = True
+            self._condition.notify_all()
+        self._thread.join(timeout)
+        with self._condition:
+            if self._thread.is_alive():
+                # The batch in flight still journals its commit marker; a later close finishes the job
+                logger.warning(
+                    f"Write-behind worker still busy after {timeout}s, {self._in_flight + len(self._pending)} "
+                    f"record(s) in flight; leaving {self.journal_path} open"
+                )
+                return
+            self._journal.close()
+            self._thread = None
+        if self._pending:
+            logger.warning(f"{len(self._pending)} record(s) left in {self.journal_path} for the next start")
+
+
+_queues = {}
+_queues_lock = threading.Lock()
+
+
+def open_write_behind(path: str, journal_path: str = JOURNAL_PATH) -> WriteBehindQueue:
+    """Process-wide queue for `path`, closed (and so flushed) at interpreter exit"""
+    with _queues_lock:
+        if path not in _queues:
+            queue = WriteBehindQueue(path, journal_path)
+            atexit.register(queue.close)
+            _queues[path] = queue
+        return _queues[path]